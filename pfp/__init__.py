@@ -4,19 +4,14 @@ import os
 import six
 import sys
 
-import py010parser.c_parser
-
 import pfp.interp
 from pfp.bitwrap import BitwrappedStream
 import pfp.fuzz
 
 
-pfp.fuzz.init()
-
-
 __version__ = "{{VERSION}}"
 
-PARSER = py010parser.c_parser.CParser()
+PARSER = pfp.interp.create_parser()
 
 
 def parse(
@@ -31,6 +26,8 @@ def parse(
     keep_successful=False,
     printf=True,
     generate=True,
+    lazy_unpack=True,
+    profiler=None,
 ):
     """Parse the data stream using the supplied template. The data stream
     WILL NOT be automatically closed.
@@ -45,6 +42,8 @@ def parse(
     :int3: if debugger breaks are allowed while interpreting the template (true)
     :keep_successful: return any succesfully parsed data instead of raising an error. If an error occurred and ``keep_successful`` is True, then ``_pfp__error`` will be contain the exception object
     :printf: if ``False``, all calls to ``Printf`` (:any:`pfp.native.compat_interface.Printf`) will be noops. (default=``True``)
+    :lazy_unpack: if ``True``, packed fields are only unpacked when their ``_`` attribute is first accessed (see :any:`pfp.interp.PfpInterp.set_lazy_unpack`). (default=``True``)
+    :profiler: a :any:`pfp.profiler.TemplateProfiler` that times the handled template nodes (see :any:`pfp.interp.PfpInterp.set_profiler`). (default=``None``)
     :returns: pfp DOM
     """
     if data is None and data_file is None:
@@ -81,6 +80,10 @@ def parse(
     if interp is None:
         interp = pfp.interp.PfpInterp(debug=debug, parser=PARSER, int3=int3, generate=generate)
 
+    interp.set_lazy_unpack(lazy_unpack)
+    if profiler is not None:
+        interp.set_profiler(profiler)
+
     # so we can consume single bits at a time
     data = BitwrappedStream(data, generate=generate)
 
@@ -100,11 +103,13 @@ def parse(
     return dom
 
 
-def create_interp(template_file=None, template=None):
+def create_interp(template_file=None, template=None, generate=True, cpp_output=None):
     """Create an Interp instance with the template preloaded
 
     :template: template contents (str)
     :template_file: template file path
+    :generate: if the interpreter generates C++ code while parsing (true)
+    :cpp_output: the path that generated C++ code is written to (defaults to ``sys.argv[2]``)
     :returns: Interp
     """
     if template is None and template_file is None:
@@ -124,6 +129,8 @@ def create_interp(template_file=None, template=None):
                 "Could not open template file '{}'".format(template_file)
             )
 
-    interp = pfp.interp.PfpInterp(parser=PARSER)
+    interp = pfp.interp.PfpInterp(
+        parser=PARSER, generate=generate, cpp_output=cpp_output
+    )
     interp.load_template(template)
     return interp
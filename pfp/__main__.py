@@ -3,12 +3,14 @@
 
 
 """
-Run pfp on input data using a specified 010 Editor template for parsing
+Run pfp on input data using a specified 010 Editor template for parsing.
+Use ``pfp serve`` to start a parse server instead (see pfp.serve).
 """
 
 
 import argparse
 import os
+import json
 import pfp
 import sys
 
@@ -29,6 +31,21 @@ def parse_args(argv):
         help="Show offsets in the parsed data of parsed fields",
     )
 
+    parser.add_argument(
+        "-f", "--format",
+        choices=["text", "ndjson"],
+        default="text",
+        help="The output format. 'ndjson' writes one JSON record (path, "
+        "offset, width, type and value) per field, see pfp.export",
+    )
+
+    parser.add_argument(
+        "--leaves-only",
+        action="store_true",
+        default=False,
+        help="Only export fields without children (ndjson format)",
+    )
+
     parser.add_argument(
         "-k", "--keep",
         default=False,
@@ -36,14 +53,102 @@ def parse_args(argv):
         help="Keep successfully parsed data on error",
     )
 
+    parser.add_argument(
+        "--batch",
+        metavar="DIR|@FILELIST",
+        default=None,
+        help="Parse all files in a directory, or all files listed in a file "
+        "(one path per line), loading the template only once. One JSON result "
+        "line is printed per file and a summary is printed to stderr",
+    )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="The number of worker processes to use with --batch",
+    )
+
+    parser.add_argument(
+        "-o", "--output-dir",
+        default=None,
+        help="With --batch, write the parsed output of each file (in the "
+        "selected --format) to this directory",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="Print the time spent and the bytes consumed per template "
+        "line, node type and struct type to stderr, see pfp.profiler",
+    )
+
+    parser.add_argument(
+        "--profile-folded",
+        metavar="FILE",
+        default=None,
+        help="Write the profiled template stacks to FILE in the folded "
+        "format of flamegraph.pl",
+    )
+
     parser.add_argument(
         "input",
+        nargs="?",
         type=argparse.FileType("rb"),
-        default=sys.stdin,
+        default=None,
         help="The input data stream or file to parse. Use '-' for piped data",
     )
 
-    return parser.parse_args(argv[1:])
+    args = parser.parse_args(argv[1:])
+    if args.batch is None and args.input is None:
+        parser.error("an input file or --batch is required")
+    if args.batch is not None and args.input is not None:
+        parser.error("an input file can't be used with --batch")
+    if args.batch is not None and (args.profile or args.profile_folded):
+        parser.error("profiling can't be used with --batch")
+    return args
+
+
+def run_batch(args):
+    """Parse all inputs of ``args.batch``, see :any:`pfp.batch`
+
+    :returns: The exit code, ``1`` if any input failed to parse
+    """
+    import pfp.batch as batch
+
+    runner = batch.BatchRunner(
+        template_file=args.template,
+        output_format=args.format,
+        output_dir=args.output_dir,
+        keep_successful=args.keep,
+        show_offsets=args.show_offsets,
+        leaves_only=args.leaves_only,
+    )
+    for result in runner.run(batch.collect_inputs(args.batch), jobs=args.jobs):
+        sys.stdout.write(json.dumps(result, sort_keys=True) + "\n")
+        sys.stdout.flush()
+
+    summary = runner.summary()
+    sys.stderr.write(
+        "{files} files, {ok} ok, {failed} failed in {seconds:.2f}s "
+        "({files_per_second:.1f} files/s, {mb_per_second:.2f} MB/s)\n".format(
+            mb_per_second=summary["bytes_per_second"] / (1024.0 * 1024.0),
+            **summary
+        )
+    )
+    return 1 if summary["failed"] > 0 else 0
+
+
+def write_profile(args, profiler):
+    """Write the results of ``profiler`` as selected by ``args.profile`` and
+    ``args.profile_folded``, see :any:`pfp.profiler`
+    """
+    if args.profile:
+        sys.stderr.write(profiler.report())
+    if args.profile_folded is not None:
+        with open(args.profile_folded, "w") as f:
+            profiler.write_folded(f)
 
 
 def main(argv=None):
@@ -55,14 +160,51 @@ def main(argv=None):
     if argv is None:
         argv = sys.argv
 
+    if len(argv) > 1 and argv[1] == "serve":
+        import pfp.serve as serve
+
+        return serve.main(argv[2:])
+
     args = parse_args(argv)
-    dom = pfp.parse(
-        template_file=args.template,
-        data=args.input,
-        keep_successful=args.keep,
-    )
-    print(dom._pfp__show(include_offset=args.show_offsets))
+    if args.batch is not None:
+        return run_batch(args)
+
+    profiler = None
+    if args.profile or args.profile_folded is not None:
+        from pfp.profiler import TemplateProfiler
+
+        profiler = TemplateProfiler()
+
+    # the fields are only exported once the input is parsed, which never
+    # happens when the C++ code is generated
+    generate = args.format != "ndjson"
+    interp = None
+    if not generate:
+        interp = pfp.interp.PfpInterp(
+            parser=pfp.PARSER, generate=False, cpp_output=os.devnull
+        )
+
+    try:
+        dom = pfp.parse(
+            template_file=args.template,
+            data=args.input,
+            interp=interp,
+            keep_successful=args.keep,
+            generate=generate,
+            profiler=profiler,
+        )
+    finally:
+        # generating the C++ code exits once the template is done
+        if profiler is not None:
+            write_profile(args, profiler)
+
+    if args.format == "ndjson":
+        from pfp.export import write_ndjson
+
+        write_ndjson(dom, sys.stdout, leaves_only=args.leaves_only)
+    else:
+        print(dom._pfp__show(include_offset=args.show_offsets))
 
 
 if __name__ == "__main__":
-    main(sys.argv)
+    sys.exit(main(sys.argv))
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+This module parses many input files with a single template (see the
+``--batch`` option of ``pfp``). Each worker process creates one
+:any:`pfp.interp.PfpInterp` and loads the template once, so the cost of
+starting Python, defining the natives and parsing the predefines and the
+template is paid once per worker instead of once per file.
+
+Example: ::
+
+    runner = BatchRunner(template_file="png.bt", output_format="ndjson",
+                         output_dir="out")
+    for result in runner.run(collect_inputs("corpus/"), jobs=8):
+        print(result)
+    print(runner.summary())
+"""
+
+import multiprocessing
+import os
+import time
+
+import six
+
+import pfp
+import pfp.bitwrap as bitwrap
+import pfp.export
+import pfp.interp
+
+
+OUTPUT_EXTENSIONS = {"text": ".txt", "ndjson": ".ndjson"}
+"""The extensions of the per-file output files, by output format"""
+
+
+def collect_inputs(spec):
+    """Return the list of input paths described by ``spec``: either a
+    directory (all files in it, recursively), or ``@path`` of a file that
+    lists one input path per line. Empty lines and lines starting with
+    ``#`` in a file list are ignored.
+    """
+    if spec.startswith("@"):
+        with open(os.path.expanduser(spec[1:]), "r") as f:
+            lines = [line.strip() for line in f]
+        return [line for line in lines if line != "" and not line.startswith("#")]
+
+    spec = os.path.expanduser(spec)
+    if not os.path.isdir(spec):
+        raise ValueError("Not a directory or @filelist: {!r}".format(spec))
+
+    res = []
+    for dirpath, dirnames, filenames in os.walk(spec):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            res.append(os.path.join(dirpath, filename))
+    return res
+
+
+def _output_names(paths):
+    """Return the names of the per-file output files (without extension),
+    relative to the output directory. The directory structure below the
+    common directory of the inputs is kept.
+    """
+    if len(paths) == 0:
+        return []
+    common = os.path.dirname(os.path.commonprefix([os.path.abspath(x) for x in paths]))
+    return [os.path.relpath(os.path.abspath(x), common) for x in paths]
+
+
+# the state of a worker process, see _init_worker
+_WORKER = None
+
+
+def _init_worker(options):
+    global _WORKER
+    _WORKER = _Worker(**options)
+
+
+def _parse_one(job):
+    return _WORKER.parse(*job)
+
+
+class _Worker(object):
+    """Parses files with a reused interpreter that has the template loaded
+    """
+
+    def __init__(
+        self,
+        template,
+        template_file,
+        output_format,
+        output_dir,
+        keep_successful,
+        show_offsets,
+        leaves_only,
+    ):
+        self.template_file = template_file
+        self.output_format = output_format
+        self.output_dir = output_dir
+        self.keep_successful = keep_successful
+        self.show_offsets = show_offsets
+        self.leaves_only = leaves_only
+
+        self.interp = pfp.interp.PfpInterp(
+            parser=pfp.PARSER, generate=False, cpp_output=os.devnull
+        )
+        self.interp.load_template(template)
+
+    def parse(self, path, output_name):
+        """Parse the file at ``path`` and write its output
+
+        :returns: A result dict (see :any:`BatchRunner.run`)
+        """
+        start = time.time()
+        res = {
+            "path": path,
+            "ok": False,
+            "size": 0,
+            "seconds": 0.0,
+            "error": None,
+            "output": None,
+        }
+
+        try:
+            with open(path, "rb") as f:
+                res["size"] = os.fstat(f.fileno()).st_size
+                dom = self.interp.parse(
+                    bitwrap.BitwrappedStream(f, generate=False),
+                    orig_filename=self.template_file,
+                    keep_successful=self.keep_successful,
+                    printf=False,
+                )
+            if dom._pfp__error is not None:
+                res["error"] = _format_error(dom._pfp__error)
+            res["output"] = self._write_output(dom, output_name)
+            res["ok"] = res["error"] is None
+        except Exception as e:
+            res["error"] = _format_error(e)
+
+        res["seconds"] = time.time() - start
+        return res
+
+    def _write_output(self, dom, output_name):
+        if self.output_dir is None or self.output_format == "none":
+            return None
+
+        path = os.path.join(
+            self.output_dir, output_name + OUTPUT_EXTENSIONS[self.output_format]
+        )
+        dirname = os.path.dirname(path)
+        if not os.path.exists(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # created by another worker in the meantime
+                if not os.path.isdir(dirname):
+                    raise
+
+        with open(path, "w") as f:
+            if self.output_format == "ndjson":
+                pfp.export.write_ndjson(dom, f, leaves_only=self.leaves_only)
+            else:
+                f.write(dom._pfp__show(include_offset=self.show_offsets))
+                f.write("\n")
+        return path
+
+
+def _format_error(e):
+    return "{}: {}".format(e.__class__.__name__, e)
+
+
+class BatchRunner(object):
+    """Parses a list of input files with one template, optionally in a
+    pool of worker processes, and keeps statistics of the results.
+    """
+
+    def __init__(
+        self,
+        template=None,
+        template_file=None,
+        output_format="none",
+        output_dir=None,
+        keep_successful=False,
+        show_offsets=False,
+        leaves_only=False,
+    ):
+        """
+        :param str template: The template contents
+        :param str template_file: The template path, if ``template`` is not given
+        :param str output_format: ``"text"`` (the output of ``_pfp__show``),
+            ``"ndjson"`` (see :any:`pfp.export.write_ndjson`) or ``"none"``
+        :param str output_dir: The directory that per-file outputs are
+            written to. No outputs are written if ``None``.
+        :param bool keep_successful: See :any:`pfp.parse`
+        :param bool show_offsets: Include offsets in the text output
+        :param bool leaves_only: Only export fields without children in the
+            ndjson output
+        """
+        if template is None:
+            with open(os.path.expanduser(template_file), "r") as f:
+                template = f.read()
+        if output_format not in list(OUTPUT_EXTENSIONS) + ["none"]:
+            raise ValueError("Unknown output format {!r}".format(output_format))
+
+        self.options = {
+            "template": template,
+            "template_file": template_file or "string",
+            "output_format": output_format,
+            "output_dir": output_dir,
+            "keep_successful": keep_successful,
+            "show_offsets": show_offsets,
+            "leaves_only": leaves_only,
+        }
+
+        self.num_ok = 0
+        self.num_failed = 0
+        self.num_bytes = 0
+        self.start_time = None
+        self.end_time = None
+
+    def run(self, paths, jobs=1, chunksize=8):
+        """Parse all ``paths`` and yield a result dict for each of them, as
+        they complete. Results have the keys ``path``, ``ok``, ``size``,
+        ``seconds``, ``error`` (``None`` or a string) and ``output`` (the
+        path of the written output file, or ``None``).
+
+        :param int jobs: The number of worker processes. With ``1``, files
+            are parsed in this process.
+        :param int chunksize: The number of files sent to a worker at a time
+        """
+        jobs_args = list(zip(paths, _output_names(paths)))
+        self.start_time = time.time()
+
+        if jobs <= 1:
+            worker = _Worker(**self.options)
+            results = six.moves.map(lambda args: worker.parse(*args), jobs_args)
+            for result in results:
+                yield self._record(result)
+        else:
+            pool = multiprocessing.Pool(
+                jobs, initializer=_init_worker, initargs=(self.options,)
+            )
+            try:
+                for result in pool.imap_unordered(
+                    _parse_one, jobs_args, chunksize
+                ):
+                    yield self._record(result)
+                pool.close()
+            except BaseException:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+
+        self.end_time = time.time()
+
+    def _record(self, result):
+        if result["ok"]:
+            self.num_ok += 1
+        else:
+            self.num_failed += 1
+        self.num_bytes += result["size"]
+        return result
+
+    def summary(self):
+        """Return a dict with the number of parsed, successful and failed
+        files, the elapsed time and the throughput
+        """
+        end_time = self.end_time if self.end_time is not None else time.time()
+        elapsed = end_time - (self.start_time or end_time)
+        total = self.num_ok + self.num_failed
+        return {
+            "files": total,
+            "ok": self.num_ok,
+            "failed": self.num_failed,
+            "bytes": self.num_bytes,
+            "seconds": elapsed,
+            "files_per_second": total / elapsed if elapsed > 0 else 0.0,
+            "bytes_per_second": self.num_bytes / elapsed if elapsed > 0 else 0.0,
+        }
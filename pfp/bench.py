@@ -0,0 +1,549 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+This module contains benchmarks of pfp. Results are printed (or written
+with ``-o``) as JSON. ::
+
+    python -m pfp.bench startup -n 10
+    python -m pfp.bench suite -o current.json --compare baseline.json
+    python -m pfp.bench compare baseline.json current.json
+
+The ``startup`` benchmark measures what a short-lived pfp invocation
+pays before it parses any data: ``import pfp``, defining the natives and
+loading a template. Each run is a new Python process started in an empty
+temporary directory, so nothing cached in the current directory (such as
+PLY parser tables) is reused between runs.
+
+The ``suite`` benchmark runs every template in ``templates/`` against the
+seed files in ``testcases/`` (``png.bt`` and ``png-orig.bt`` use
+``testcases/png``). It measures template load time, parse and build
+throughput, ``mutate`` and ``changeset_mutate`` throughput and the peak
+memory of parsing (see :any:`bench_template`). Mutations are seeded, so
+runs are reproducible. Compared to a stored baseline, metrics that are
+worse by more than a threshold are reported as regressions, and the exit
+code is ``1``.
+"""
+
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import six
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import pfp
+import pfp.bitwrap as bitwrap
+import pfp.export
+import pfp.fuzz
+import pfp.fuzz.rand as rand
+import pfp.interp
+
+
+# run in a new process, prints the timings of a cold start as JSON
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.time()
+import pfp
+imported = time.time()
+pfp.interp.PfpInterp.define_natives()
+natives = time.time()
+interp = pfp.interp.PfpInterp(parser=pfp.PARSER, generate=False)
+interp.load_template(sys.argv[1])
+loaded = time.time()
+interp = pfp.interp.PfpInterp(parser=pfp.PARSER, generate=False)
+interp.load_template(sys.argv[1])
+reloaded = time.time()
+json.dump({
+    "import": imported - start,
+    "natives": natives - imported,
+    "load_template": loaded - natives,
+    "load_template_warm": reloaded - loaded,
+}, sys.stdout)
+"""
+
+STARTUP_TEMPLATE = """
+typedef struct {
+    uchar type;
+    uint length;
+    uchar data[length];
+} CHUNK;
+
+while (!FEof()) {
+    CHUNK chunk;
+}
+"""
+"""The template loaded by the startup benchmark"""
+
+
+def _pfp_path():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _summarize(samples):
+    samples = sorted(samples)
+    return {
+        "min": samples[0],
+        "median": samples[len(samples) // 2],
+        "max": samples[-1],
+    }
+
+
+def bench_startup(runs=5, template=STARTUP_TEMPLATE, python=None):
+    """Measure the cold start of ``runs`` new Python processes
+
+    :param int runs: The number of processes to start
+    :param str template: The template to load
+    :param str python: The Python executable (defaults to this one)
+    :returns: A dict of measurement name to ``min``/``median``/``max``
+        seconds. ``process`` is the total run time of a process, including
+        the startup of Python itself.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [_pfp_path()] + [x for x in [env.get("PYTHONPATH")] if x]
+    )
+
+    samples = {}
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for _ in range(runs):
+            start = time.time()
+            output = subprocess.check_output(
+                [python or sys.executable, "-c", _STARTUP_SCRIPT, template],
+                cwd=tmpdir,
+                env=env,
+            )
+            end = time.time()
+
+            timings = json.loads(output.decode("utf-8"))
+            timings["process"] = end - start
+            for name, seconds in timings.items():
+                samples.setdefault(name, []).append(seconds)
+
+            # start each run without the files of the previous one
+            for filename in os.listdir(tmpdir):
+                os.unlink(os.path.join(tmpdir, filename))
+    finally:
+        shutil.rmtree(tmpdir)
+
+    return dict((name, _summarize(x)) for name, x in samples.items())
+
+
+METRICS = (
+    ("load_seconds", False),
+    ("parse_mb_per_second", True),
+    ("parse_fields_per_second", True),
+    ("build_mb_per_second", True),
+    ("mutate_per_second", True),
+    ("changeset_mutate_per_second", True),
+    ("peak_memory_bytes", False),
+)
+"""The ``(name, higher_is_better)`` metrics of each template in the results
+of the ``suite`` benchmark that are compared against a baseline"""
+
+
+def find_corpus(templates_dir, testcases_dir, pattern="*"):
+    """Return a sorted list of ``(name, template_path, input_paths)``
+    tuples, one for each template that has seed files
+
+    :param str pattern: Only include templates whose name (the file name
+        without ``.bt``) matches this glob pattern
+    """
+    res = []
+    for template_path in sorted(glob.glob(os.path.join(templates_dir, "*.bt"))):
+        name = os.path.basename(template_path)[: -len(".bt")]
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+
+        fmt = name[: -len("-orig")] if name.endswith("-orig") else name
+        inputs_dir = os.path.join(testcases_dir, fmt)
+        if not os.path.isdir(inputs_dir):
+            continue
+        inputs = sorted(
+            x
+            for x in glob.glob(os.path.join(inputs_dir, "*"))
+            if os.path.isfile(x)
+        )
+        if len(inputs) > 0:
+            res.append((name, template_path, inputs))
+    return res
+
+
+def _parse(interp, template_path, data):
+    return interp.parse(
+        bitwrap.BitwrappedStream(six.BytesIO(data), generate=False),
+        orig_filename=template_path,
+        keep_successful=True,
+        printf=False,
+    )
+
+
+def _format_error(e):
+    return "{}: {}".format(e.__class__.__name__, e).splitlines()[0]
+
+
+def _rate(amount, seconds):
+    return amount / seconds if seconds > 0 else None
+
+
+def bench_template(template_path, inputs, repeat=5, mutations=20, memory=True):
+    """Benchmark one template against its seed files. Templates often fail
+    on some inputs. Whatever was parsed before the error is still measured,
+    and the number of failed inputs is reported as ``errors``.
+
+    :param int repeat: Load the template and parse and build all inputs
+        this many times, keeping the fastest run
+    :param int mutations: The number of mutations per input, for both
+        ``mutate`` and ``changeset_mutate``
+    :param bool memory: Measure the peak memory of parsing all inputs (with
+        ``tracemalloc``, when available)
+    :returns: A dict of results, see :any:`METRICS`
+    """
+    with open(template_path, "r") as f:
+        template = f.read()
+    datas = []
+    for path in inputs:
+        with open(path, "rb") as f:
+            datas.append(f.read())
+    num_bytes = sum(len(x) for x in datas)
+
+    load_seconds = None
+    for _ in six.moves.range(repeat):
+        start = timeit.default_timer()
+        interp = pfp.interp.PfpInterp(
+            parser=pfp.PARSER, generate=False, cpp_output=os.devnull
+        )
+        interp.load_template(template)
+        seconds = timeit.default_timer() - start
+        load_seconds = min(seconds, load_seconds or seconds)
+
+    parse_seconds = build_seconds = None
+    for _ in six.moves.range(repeat):
+        doms = []
+        errors = []
+        seconds = 0.0
+        for path, data in zip(inputs, datas):
+            start = timeit.default_timer()
+            try:
+                dom = _parse(interp, template_path, data)
+            except Exception as e:
+                errors.append((path, e))
+                continue
+            finally:
+                seconds += timeit.default_timer() - start
+            doms.append(dom)
+            if dom._pfp__error is not None:
+                errors.append((path, dom._pfp__error))
+        parse_seconds = min(seconds, parse_seconds or seconds)
+
+        # the first build of a freshly parsed dom
+        start = timeit.default_timer()
+        built = 0
+        for dom in doms:
+            try:
+                built += len(dom._pfp__build())
+            except Exception as e:
+                errors.append((None, e))
+        seconds = timeit.default_timer() - start
+        build_seconds = min(seconds, build_seconds or seconds)
+
+    num_fields = sum(
+        sum(1 for _ in pfp.export.iter_records(dom)) for dom in doms
+    )
+
+    res = {
+        "template": os.path.basename(template_path),
+        "inputs": len(inputs),
+        "bytes": num_bytes,
+        "fields": num_fields,
+        "errors": len(set(path for path, e in errors if path is not None)),
+        "load_seconds": load_seconds,
+        "parse_seconds": parse_seconds,
+        "parse_mb_per_second": _rate(num_bytes / 1e6, parse_seconds),
+        "parse_fields_per_second": _rate(num_fields, parse_seconds),
+        "build_seconds": build_seconds,
+        "build_mb_per_second": _rate(built / 1e6, build_seconds),
+        "first_error": _format_error(errors[0][1]) if len(errors) > 0 else None,
+    }
+
+    for name, mutate in (
+        ("mutate", _run_mutate),
+        ("changeset_mutate", _run_changeset_mutate),
+    ):
+        seconds = 0.0
+        count = 0
+        for dom in doms:
+            rand.seed(0)
+            start = timeit.default_timer()
+            try:
+                count += mutate(dom, mutations)
+            except Exception as e:
+                res.setdefault(name + "_error", _format_error(e))
+            seconds += timeit.default_timer() - start
+        res[name + "_per_second"] = _rate(count, seconds)
+
+    del doms
+    res["peak_memory_bytes"] = None
+    if memory and tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            doms = []
+            for data in datas:
+                try:
+                    doms.append(_parse(interp, template_path, data))
+                except Exception:
+                    pass
+            res["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return res
+
+
+def _run_mutate(dom, num):
+    count = 0
+    for mutated in pfp.fuzz.mutate(dom, "basic", num=num, start=0):
+        mutated._pfp__build()
+        count += 1
+    return count
+
+
+def _run_changeset_mutate(dom, num):
+    count = 0
+    for data in pfp.fuzz.changeset_mutate(dom, "basic", num=num, start=0):
+        count += 1
+    return count
+
+
+def bench_suite(templates_dir, testcases_dir, pattern="*", log=None, **kwargs):
+    """Run :any:`bench_template` for every template of :any:`find_corpus`
+
+    :param function log: Called with a progress message for each template
+    :returns: A dict of template name to results
+    """
+    # define the natives and parse the predefines before the load time of
+    # the first template is measured
+    pfp.interp.PfpInterp(parser=pfp.PARSER, generate=False).load_template("")
+
+    res = {}
+    for name, template_path, inputs in find_corpus(
+        templates_dir, testcases_dir, pattern
+    ):
+        if log is not None:
+            log("{} ({} inputs)".format(name, len(inputs)))
+        res[name] = bench_template(template_path, inputs, **kwargs)
+    return res
+
+
+def compare(baseline, current, threshold=0.2):
+    """Compare the results of two ``suite`` runs (the ``results`` of the
+    reports)
+
+    :param float threshold: The relative change of a metric, in its worse
+        direction, that is a regression
+    :returns: A tuple of a list of ``(template, metric, baseline value,
+        current value, relative change)`` rows and the list of rows that are
+        regressions
+    """
+    rows = []
+    regressions = []
+    for name in sorted(set(baseline) & set(current)):
+        for metric, higher_is_better in METRICS:
+            old = baseline[name].get(metric)
+            new = current[name].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / float(old)
+            row = (name, metric, old, new, change)
+            rows.append(row)
+
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(row)
+    return rows, regressions
+
+
+def _format_comparison(rows, regressions):
+    lines = []
+    for row in rows:
+        lines.append(
+            "{:<16} {:<28} {:>14.4g} {:>14.4g} {:>+8.1%}{}".format(
+                *(row + (" REGRESSION" if row in regressions else "",))
+            )
+        )
+    lines.append("{} regressions".format(len(regressions)))
+    return "\n".join(lines)
+
+
+def _environment():
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+    }
+
+
+def _load_report(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    """Run a benchmark and write its results as JSON
+
+    :param list argv: The arguments (defaults to ``sys.argv[1:]``)
+    :returns: The exit code, ``1`` if a comparison found regressions
+    """
+    repo_dir = _pfp_path()
+
+    output_parser = argparse.ArgumentParser(add_help=False)
+    output_parser.add_argument(
+        "-o", "--output",
+        default=None,
+        help="Write the results to this file instead of stdout",
+    )
+
+    parser = argparse.ArgumentParser(
+        "python -m pfp.bench", description="Benchmarks of pfp"
+    )
+    subparsers = parser.add_subparsers(dest="benchmark")
+
+    startup = subparsers.add_parser(
+        "startup",
+        parents=[output_parser],
+        help="Measure import and template load times of new processes",
+    )
+    startup.add_argument(
+        "-n", "--runs",
+        type=int,
+        default=5,
+        help="The number of processes to start",
+    )
+
+    suite = subparsers.add_parser(
+        "suite",
+        parents=[output_parser],
+        help="Measure parse, build and mutate throughput of all templates",
+    )
+    suite.add_argument(
+        "--templates",
+        default=os.path.join(repo_dir, "templates"),
+        help="The directory of the templates",
+    )
+    suite.add_argument(
+        "--testcases",
+        default=os.path.join(repo_dir, "testcases"),
+        help="The directory with a directory of seed files per format",
+    )
+    suite.add_argument(
+        "-k", "--pattern",
+        default="*",
+        help="Only run templates whose name matches this glob pattern",
+    )
+    suite.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=5,
+        help="Load the template and parse and build all inputs this many "
+        "times, keeping the fastest run",
+    )
+    suite.add_argument(
+        "-m", "--mutations",
+        type=int,
+        default=20,
+        help="The number of mutations per input",
+    )
+    suite.add_argument(
+        "--no-memory",
+        action="store_true",
+        default=False,
+        help="Do not measure peak memory",
+    )
+    suite.add_argument(
+        "--compare",
+        metavar="BASELINE",
+        default=None,
+        help="Compare the results against a previously written report",
+    )
+    suite.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="The relative change of a metric that is a regression",
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare two reports of the suite benchmark"
+    )
+    compare_parser.add_argument("baseline", help="The baseline report")
+    compare_parser.add_argument("current", help="The current report")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="The relative change of a metric that is a regression",
+    )
+
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.benchmark == "compare":
+        rows, regressions = compare(
+            _load_report(args.baseline)["results"],
+            _load_report(args.current)["results"],
+            args.threshold,
+        )
+        print(_format_comparison(rows, regressions))
+        return 1 if len(regressions) > 0 else 0
+
+    if args.benchmark == "startup":
+        results = bench_startup(runs=args.runs)
+    elif args.benchmark == "suite":
+        results = bench_suite(
+            args.templates,
+            args.testcases,
+            pattern=args.pattern,
+            log=lambda msg: sys.stderr.write(msg + "\n"),
+            repeat=args.repeat,
+            mutations=args.mutations,
+            memory=not args.no_memory,
+        )
+    else:
+        parser.error("a benchmark is required")
+
+    report = {
+        "benchmark": args.benchmark,
+        "environment": _environment(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if args.benchmark == "suite" and args.compare is not None:
+        rows, regressions = compare(
+            _load_report(args.compare)["results"], results, args.threshold
+        )
+        sys.stderr.write(_format_comparison(rows, regressions) + "\n")
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
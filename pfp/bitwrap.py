@@ -57,6 +57,9 @@ class BitwrappedStream(object):
     closed = True
     exc_count = 0
 
+    READ_AHEAD_SIZE = 0x1000
+    """The number of bytes buffered by :any:`peek` for later lookahead reads"""
+
     def error(self):
         self.exc_count += 1
 
@@ -70,6 +73,13 @@ class BitwrappedStream(object):
         self._bits = collections.deque()
         self._generate = generate
 
+        # incremented on every write so that cached views of the
+        # stream's data can be invalidated
+        self.write_count = 0
+
+        # (start, data, write_count) of the bytes buffered by peek()
+        self._window = None
+
         self.closed = False
 
         # assume that bitfields end on an even boundary,
@@ -143,6 +153,35 @@ class BitwrappedStream(object):
 
         return res
 
+    def peek(self, pos, num):
+        """Return ``num`` bytes at ``pos`` without changing the position
+        of the stream or marking the bytes as consumed. Reads are answered
+        from a window of at least ``READ_AHEAD_SIZE`` buffered bytes, which
+        is only refreshed when a read falls outside of it or the stream has
+        been written to.
+
+        :pos: the absolute offset to read from
+        :num: number of bytes to read
+        :returns: the read bytes, which may be short if EOF has been reached
+        """
+        if self._generate:
+            self.error()
+            return b"\x00" * max(0, min(num, 100))
+
+        window = self._window
+        if window is not None and window[2] == self.write_count:
+            start, data = window[0], window[1]
+            if start <= pos and pos + num <= start + len(data):
+                return data[pos - start:pos - start + num]
+
+        curr_pos = self._stream.tell()
+        self._stream.seek(pos, 0)
+        data = utils.binary(self._stream.read(max(num, self.READ_AHEAD_SIZE)))
+        self._stream.seek(curr_pos, 0)
+
+        self._window = (pos, data, self.write_count)
+        return data[:num]
+
     def read_bits(self, num):
         """Read ``num`` number of bits from the stream
 
@@ -172,6 +211,7 @@ class BitwrappedStream(object):
         :data: the data to write to the stream
         :returns: None
         """
+        self.write_count += 1
         if self.padded:
             # flush out any remaining bits first
             if len(self._bits) > 0:
@@ -191,6 +231,7 @@ class BitwrappedStream(object):
         Add the bits to the existing unflushed bits and write
         complete bytes to the stream.
         """
+        self.write_count += 1
         for bit in bits:
             self._bits.append(bit)
 
@@ -255,6 +296,19 @@ class BitwrappedStream(object):
 
         return size
 
+    def replace_stream(self, stream):
+        """Continue with the byte stream ``stream`` at the current position,
+        e.g. after all of the data has been replaced. The previous byte
+        stream is neither modified nor closed. Unflushed bits are discarded.
+
+        :stream: The new byte stream
+        """
+        pos = self.tell()
+        self._stream = stream
+        self._window = None
+        self.write_count += 1
+        self.seek(pos, 0)
+
     def unconsumed_ranges(self):
         """Return an IntervalTree of unconsumed ranges, of the format
         (start, end] with the end value not being included
@@ -0,0 +1,519 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+This module contains a streaming checksum engine for the 010 ``Checksum``
+family of functions (see :any:`pfp.native.compat_tools`). All algorithms
+share a ``hashlib``-like interface (``update``/``digest``/``hexdigest``),
+and data can be fed directly from a stream in fixed-size chunks so that
+large ranges never have to be loaded into memory.
+"""
+
+import binascii
+import hashlib
+import re
+import struct
+import zlib
+
+import six
+
+import pfp.utils as utils
+
+
+CHECKSUM_BYTE = 0
+CHECKSUM_SHORT_LE = 1
+CHECKSUM_SHORT_BE = 2
+CHECKSUM_INT_LE = 3
+CHECKSUM_INT_BE = 4
+CHECKSUM_INT64_LE = 5
+CHECKSUM_INT64_BE = 6
+CHECKSUM_SUM8 = 7
+CHECKSUM_SUM16 = 8
+CHECKSUM_SUM32 = 9
+CHECKSUM_SUM64 = 10
+CHECKSUM_CRC16 = 11
+CHECKSUM_CRCCCITT = 12
+CHECKSUM_CRC32 = 13
+CHECKSUM_ADLER32 = 14
+CHECKSUM_MD2 = 15
+CHECKSUM_MD4 = 16
+CHECKSUM_MD5 = 17
+CHECKSUM_RIPEMD160 = 18
+CHECKSUM_SHA1 = 19
+CHECKSUM_SHA256 = 20
+CHECKSUM_SHA384 = 21
+CHECKSUM_SHA512 = 22
+CHECKSUM_TIGER = 23
+CHECKSUM_CRC8 = 24
+
+CHUNK_SIZE = 0x10000
+"""The number of bytes read from a stream at once"""
+
+
+def _to_bytes(data):
+    """Return ``data`` (``bytes``, ``bytearray``, ``memoryview`` or the
+    ``str`` read from a string-backed stream) as ``bytes``
+    """
+    if isinstance(data, six.string_types):
+        data = utils.binary(data)
+    return bytes(data)
+
+
+class ChecksumError(Exception):
+    """Raised when an algorithm is unknown or not supported by this
+    Python build (E.g. MD4 with OpenSSL 3)"""
+
+
+class ChecksumBase(object):
+    """The base class for all checksum algorithms"""
+
+    digest_size = 8
+    """The size of the result in bytes"""
+
+    def update(self, data):
+        """Add ``data`` to the checksum"""
+        raise NotImplementedError()
+
+    def intdigest(self):
+        """Return the checksum as an integer"""
+        raise NotImplementedError()
+
+    def digest(self):
+        """Return the checksum as big-endian bytes"""
+        hex_val = "{:0{}x}".format(self.intdigest(), self.digest_size * 2)
+        return binascii.unhexlify(hex_val)
+
+    def hexdigest(self):
+        """Return the checksum as an upper-case hex string"""
+        return utils.string(binascii.hexlify(self.digest())).upper()
+
+
+class Sum(ChecksumBase):
+    """Sums the data as a sequence of unsigned words. A trailing partial
+    word is padded with zero bytes.
+    """
+
+    _FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+    def __init__(self, word_size=1, endian="<", result_bits=64):
+        self.word_size = word_size
+        self.endian = endian
+        self.mask = (1 << result_bits) - 1
+        self.digest_size = result_bits // 8
+        self._format = self._FORMATS[word_size]
+        self._total = 0
+        self._leftover = b""
+
+    def update(self, data):
+        data = _to_bytes(data)
+        if len(self._leftover) > 0:
+            data = self._leftover + data
+
+        count = len(data) // self.word_size
+        if count > 0:
+            fmt = "{}{}{}".format(self.endian, count, self._format)
+            self._total += sum(struct.unpack_from(fmt, data))
+        self._leftover = data[count * self.word_size :]
+
+    def intdigest(self):
+        total = self._total
+        if len(self._leftover) > 0:
+            padded = self._leftover + b"\x00" * (
+                self.word_size - len(self._leftover)
+            )
+            total += struct.unpack(self.endian + self._format, padded)[0]
+        return total & self.mask
+
+
+def _reflect(val, width):
+    res = 0
+    for _ in six.moves.range(width):
+        res = (res << 1) | (val & 1)
+        val >>= 1
+    return res
+
+
+_CRC_TABLES = {}
+
+
+def crc_table(width, poly, reflect):
+    """Return the (cached) 256-entry lookup table for the CRC with the
+    provided width and polynomial (in normal, MSB-first form)
+    """
+    key = (width, poly, reflect)
+    res = _CRC_TABLES.get(key)
+    if res is not None:
+        return res
+
+    mask = (1 << width) - 1
+    res = []
+    if reflect:
+        poly = _reflect(poly, width)
+        for idx in six.moves.range(256):
+            crc = idx
+            for _ in six.moves.range(8):
+                crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+            res.append(crc)
+    else:
+        top_bit = 1 << (width - 1)
+        for idx in six.moves.range(256):
+            crc = idx << (width - 8)
+            for _ in six.moves.range(8):
+                crc = ((crc << 1) ^ poly) if crc & top_bit else (crc << 1)
+            res.append(crc & mask)
+
+    _CRC_TABLES[key] = res
+    return res
+
+
+class Crc(ChecksumBase):
+    """A table-driven CRC of 8 to 64 bits. The standard CRC-32 and the
+    CCITT (XMODEM) polynomials use the C implementations in ``binascii``.
+    """
+
+    def __init__(self, width, poly, init, reflect, xorout=0):
+        """
+        :param int width: The width of the CRC in bits
+        :param int poly: The polynomial in normal (MSB-first) form
+        :param int init: The initial value of the CRC register
+        :param bool reflect: If the input and output are reflected
+        :param int xorout: The value the final register is XOR'd with
+        """
+        self.width = width
+        self.mask = (1 << width) - 1
+        self.poly = poly & self.mask
+        self.reflect = reflect
+        self.xorout = xorout
+        self.digest_size = (width + 7) // 8
+        self.crc = init & self.mask
+
+        self._fast = None
+        if reflect and width == 32 and self.poly == 0x04C11DB7:
+            self._fast = self._update_crc32
+        elif not reflect and width == 16 and self.poly == 0x1021:
+            self._fast = self._update_hqx
+        else:
+            self._table = crc_table(width, self.poly, reflect)
+
+    def _update_crc32(self, data):
+        # binascii works with the final (inverted) value
+        self.crc = (binascii.crc32(data, self.crc ^ 0xFFFFFFFF) & 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+    def _update_hqx(self, data):
+        self.crc = binascii.crc_hqx(data, self.crc)
+
+    def update(self, data):
+        data = _to_bytes(data)
+        if self._fast is not None:
+            return self._fast(data)
+
+        crc = self.crc
+        table = self._table
+        if self.reflect:
+            for byte in bytearray(data):
+                crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+        else:
+            shift = self.width - 8
+            mask = self.mask
+            for byte in bytearray(data):
+                crc = table[((crc >> shift) ^ byte) & 0xFF] ^ ((crc << 8) & mask)
+        self.crc = crc
+
+    def intdigest(self):
+        return self.crc ^ self.xorout
+
+
+class Adler32(ChecksumBase):
+    """Adler-32, using ``zlib``"""
+
+    digest_size = 4
+
+    def __init__(self, init=1):
+        self.value = init & 0xFFFFFFFF
+
+    def update(self, data):
+        self.value = zlib.adler32(_to_bytes(data), self.value) & 0xFFFFFFFF
+
+    def intdigest(self):
+        return self.value
+
+
+class Hash(ChecksumBase):
+    """Cryptographic hashes provided by ``hashlib``"""
+
+    def __init__(self, name):
+        try:
+            self._hash = hashlib.new(name)
+        except ValueError:
+            raise ChecksumError("hash algorithm {!r} is not available".format(name))
+        self.digest_size = self._hash.digest_size
+
+    def update(self, data):
+        self._hash.update(_to_bytes(data))
+
+    def digest(self):
+        return self._hash.digest()
+
+    def intdigest(self):
+        return int(self._hash.hexdigest(), 16)
+
+
+# (width, poly, init, reflect, xorout)
+CRC_PARAMS = {
+    CHECKSUM_CRC8: (8, 0x07, 0x00, False, 0),
+    CHECKSUM_CRC16: (16, 0x8005, 0x0000, True, 0),
+    CHECKSUM_CRCCCITT: (16, 0x1021, 0xFFFF, False, 0),
+    CHECKSUM_CRC32: (32, 0x04C11DB7, 0xFFFFFFFF, True, 0xFFFFFFFF),
+}
+"""The default parameters for the CRC algorithms"""
+
+# (word size, endian, result bits)
+SUM_PARAMS = {
+    CHECKSUM_BYTE: (1, "<", 64),
+    CHECKSUM_SHORT_LE: (2, "<", 64),
+    CHECKSUM_SHORT_BE: (2, ">", 64),
+    CHECKSUM_INT_LE: (4, "<", 64),
+    CHECKSUM_INT_BE: (4, ">", 64),
+    CHECKSUM_INT64_LE: (8, "<", 64),
+    CHECKSUM_INT64_BE: (8, ">", 64),
+    CHECKSUM_SUM8: (1, "<", 8),
+    CHECKSUM_SUM16: (1, "<", 16),
+    CHECKSUM_SUM32: (1, "<", 32),
+    CHECKSUM_SUM64: (1, "<", 64),
+}
+
+HASH_NAMES = {
+    CHECKSUM_MD2: "md2",
+    CHECKSUM_MD4: "md4",
+    CHECKSUM_MD5: "md5",
+    CHECKSUM_RIPEMD160: "ripemd160",
+    CHECKSUM_SHA1: "sha1",
+    CHECKSUM_SHA256: "sha256",
+    CHECKSUM_SHA384: "sha384",
+    CHECKSUM_SHA512: "sha512",
+    CHECKSUM_TIGER: "tiger",
+}
+
+
+def new(alg, crc_poly=-1, crc_init=-1):
+    """Create a new checksum object for one of the ``CHECKSUM_*`` constants
+
+    :param int alg: The algorithm
+    :param int crc_poly: A custom polynomial for the CRC algorithms, -1 for the default
+    :param int crc_init: A custom initial value for the CRC and Adler-32 algorithms, -1 for the default
+    :returns: A :any:`ChecksumBase` instance
+    :raises ChecksumError: If the algorithm is unknown or unavailable
+    """
+    if alg in SUM_PARAMS:
+        return Sum(*SUM_PARAMS[alg])
+
+    if alg in CRC_PARAMS:
+        width, poly, init, reflect, xorout = CRC_PARAMS[alg]
+        if crc_poly != -1:
+            poly = crc_poly
+        if crc_init != -1:
+            init = crc_init
+        return Crc(width, poly, init, reflect, xorout)
+
+    if alg == CHECKSUM_ADLER32:
+        return Adler32(1 if crc_init == -1 else crc_init)
+
+    if alg in HASH_NAMES:
+        return Hash(HASH_NAMES[alg])
+
+    raise ChecksumError("unknown checksum algorithm {!r}".format(alg))
+
+
+def parse_ignore(ignore):
+    """Parse a string of byte ranges to ignore, E.g. ``"0-3, 8-0Bh"``. Ranges
+    are inclusive and relative to the start of the checksummed data. Numbers
+    may be decimal, ``0x`` prefixed or ``h`` suffixed hex.
+
+    :returns: A sorted list of ``(start, end)`` tuples, with ``end`` being exclusive
+    """
+    res = []
+    for part in re.split(r"[,;\s]+", utils.string(ignore or "").strip()):
+        if part == "":
+            continue
+        bounds = part.split("-", 1)
+        start = _parse_num(bounds[0])
+        end = _parse_num(bounds[-1])
+        res.append((start, end + 1))
+    return sorted(res)
+
+
+def _parse_num(num):
+    num = num.strip().lower()
+    if num.endswith("h"):
+        return int(num[:-1], 16)
+    return int(num, 0)
+
+
+def _included_ranges(size, ignore):
+    """Yield the ``(offset, length)`` of the ranges within ``size`` bytes
+    that are not ignored
+    """
+    pos = 0
+    for start, end in ignore:
+        start = max(start, pos)
+        if start >= size:
+            break
+        if start > pos:
+            yield pos, start - pos
+        pos = max(pos, end)
+    if pos < size:
+        yield pos, size - pos
+
+
+def update_from_data(csum, data, ignore=None):
+    """Add ``data`` to the checksum ``csum``, skipping ``ignore`` ranges
+    (see :any:`parse_ignore`)
+    """
+    if not ignore:
+        csum.update(data)
+        return csum
+
+    view = memoryview(_to_bytes(data))
+    for offset, length in _included_ranges(len(view), ignore):
+        csum.update(view[offset : offset + length].tobytes())
+    return csum
+
+
+def update_from_stream(csum, stream, start, size, ignore=None, chunk_size=CHUNK_SIZE):
+    """Add ``size`` bytes at offset ``start`` of ``stream`` to the checksum
+    ``csum``, reading ``chunk_size`` bytes at a time. Bitwrapped streams are
+    read from the underlying byte stream directly. The position of the
+    stream is not restored.
+    """
+    # reading through the bitwrapped stream would mark the range as consumed
+    raw = getattr(stream, "_stream", stream)
+
+    ranges = [(0, size)] if not ignore else _included_ranges(size, ignore)
+    for offset, length in ranges:
+        raw.seek(start + offset, 0)
+        while length > 0:
+            # string-backed streams return str
+            chunk = utils.binary(raw.read(min(chunk_size, length)))
+            if not chunk:
+                return csum
+            csum.update(chunk)
+            length -= len(chunk)
+    return csum
+
+
+# --------------------
+# combining checksums
+# --------------------
+
+_CRC32_POLY = 0xEDB88320  # reflected 0x04C11DB7
+
+
+def _multmodp(a, b):
+    """Multiply ``a`` and ``b`` modulo the CRC-32 polynomial (reflected)"""
+    m = 1 << 31
+    p = 0
+    while True:
+        if a & m:
+            p ^= b
+            if (a & (m - 1)) == 0:
+                break
+        m >>= 1
+        b = (b >> 1) ^ _CRC32_POLY if b & 1 else b >> 1
+    return p
+
+
+def _build_x2n_table():
+    res = []
+    p = 1 << 30  # x^1
+    res.append(p)
+    for _ in six.moves.range(1, 32):
+        p = _multmodp(p, p)
+        res.append(p)
+    return res
+
+
+# x^(2^n) modulo the CRC-32 polynomial
+_X2N_TABLE = _build_x2n_table()
+
+
+def _x2nmodp(n, k):
+    """Return x^(n * 2^k) modulo the CRC-32 polynomial"""
+    p = 1 << 31  # x^0
+    while n:
+        if n & 1:
+            p = _multmodp(_X2N_TABLE[k & 31], p)
+        n >>= 1
+        k += 1
+    return p
+
+
+def crc32_combine(crc1, crc2, len2):
+    """Return the CRC-32 of two concatenated blocks of data, given the
+    CRC-32 of each block and the length of the second one. This takes
+    O(log(len2)) steps and does not need the data (see zlib's
+    ``crc32_combine``).
+    """
+    return _multmodp(_x2nmodp(len2, 3), crc1) ^ (crc2 & 0xFFFFFFFF)
+
+
+_ADLER_BASE = 65521
+
+
+def adler32_combine(adler1, adler2, len2):
+    """Return the Adler-32 of two concatenated blocks of data, given the
+    Adler-32 of each block and the length of the second one (see zlib's
+    ``adler32_combine``).
+    """
+    rem = len2 % _ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (rem * sum1) % _ADLER_BASE
+    sum1 += (adler2 & 0xFFFF) + _ADLER_BASE - 1
+    sum2 += (
+        ((adler1 >> 16) & 0xFFFF)
+        + ((adler2 >> 16) & 0xFFFF)
+        + _ADLER_BASE
+        - rem
+    )
+    if sum1 >= _ADLER_BASE:
+        sum1 -= _ADLER_BASE
+    if sum1 >= _ADLER_BASE:
+        sum1 -= _ADLER_BASE
+    if sum2 >= (_ADLER_BASE << 1):
+        sum2 -= _ADLER_BASE << 1
+    if sum2 >= _ADLER_BASE:
+        sum2 -= _ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+SUMMARIES = {
+    "length": (len, lambda len1, len2_, len2: len1 + len2_),
+    "crc32": (lambda data: binascii.crc32(data) & 0xFFFFFFFF, crc32_combine),
+    "adler32": (lambda data: zlib.adler32(data) & 0xFFFFFFFF, adler32_combine),
+}
+"""Checksums that can be combined without the data, used to cache
+checksums of fields (see :any:`pfp.fields.Field._pfp__summary`). Maps the
+name to ``(func(data), combine(value1, value2, len2))``"""
+
+
+def summarize(kind, data):
+    """Return the ``(length, value)`` summary of ``data`` for the ``kind``
+    of checksum in :any:`SUMMARIES`
+    """
+    data = _to_bytes(data)
+    return (len(data), SUMMARIES[kind][0](data))
+
+
+def combine_summaries(kind, summaries):
+    """Combine a sequence of ``(length, value)`` summaries of consecutive
+    blocks of data into a single summary
+    """
+    combine = SUMMARIES[kind][1]
+    res = None
+    for length, value in summaries:
+        if res is None:
+            res = (length, value)
+        else:
+            res = (res[0] + length, combine(res[1], value, length))
+    if res is None:
+        res = summarize(kind, b"")
+    return res
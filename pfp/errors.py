@@ -30,6 +30,13 @@ class UnmodifiableConst(PfpError):
     pass
 
 
+class UnpackLimitExceeded(PfpError):
+    """Raised when the unpacked data of a packed field is larger than
+    the limit set with :any:`pfp.interp.PfpInterp.set_unpack_limits`"""
+
+    pass
+
+
 class CoordError(PfpError):
     """Base class for pfp exceptions"""
 
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+This module flattens parsed DOMs into columnar records, for loading
+field-level data into analysis tools instead of scraping the text output of
+:any:`pfp.fields.Field._pfp__show`. Each field becomes one record with the
+columns in :any:`COLUMNS`: ::
+
+    dom = pfp.parse(data=open("input.png", "rb"), template_file="png.bt")
+
+    # newline-delimited JSON, streamed to the file one record at a time
+    with open("input.ndjson", "w") as f:
+        pfp.export.write_ndjson(dom, f)
+
+    # a dict of column lists, e.g. for pyarrow.Table.from_pydict
+    columns = pfp.export.to_columns(dom, split_values=True)
+
+    # a NumPy record array (requires numpy)
+    records = pfp.export.to_numpy(dom)
+
+The DOM is walked iteratively, so deeply nested DOMs do not hit the
+recursion limit and no text rendering is ever built in memory.
+"""
+
+import collections
+import json
+
+import six
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import pfp.errors as errors
+import pfp.fields as fields
+import pfp.utils as utils
+
+
+COLUMNS = ("path", "offset", "width", "type", "value")
+"""The columns of an exported record"""
+
+SPLIT_VALUE_COLUMNS = ("int_value", "float_value", "bytes_value")
+"""The typed columns that replace the ``value`` column when values are
+split (see :any:`to_columns`)"""
+
+
+Record = collections.namedtuple("Record", COLUMNS)
+"""A single exported field. ``value`` is an ``int`` or ``float`` for numeric
+fields, ``bytes`` for strings and arrays with raw data, and ``None`` for
+structs, unions and arrays of structs."""
+
+
+def _type_name(field):
+    if isinstance(field, fields.Array):
+        field_cls = field.field_cls
+        return "{}[]".format(
+            field_cls.__name__
+            if type(field_cls) is type
+            else field_cls._typedef_name
+        )
+    if isinstance(field, fields.NumberBase):
+        return field._pfp__cls_name()
+    return field.__class__.__name__
+
+
+def _value(field):
+    if isinstance(field, fields.NumberBase):
+        return field._pfp__value
+    if isinstance(field, fields.String):
+        return utils.binary(field._pfp__value)
+    if isinstance(field, fields.Array):
+        raw = field._pfp__raw_view()
+        if raw is not None:
+            return bytes(raw)
+    return None
+
+
+def _children(field):
+    """Return a list of ``(path suffix, child)`` tuples for the children of
+    ``field`` that are exported as separate records
+    """
+    if isinstance(field, fields.Struct):
+        return [
+            ("." + (child._pfp__name or ""), child)
+            for child in field._pfp__children
+        ]
+    if isinstance(field, fields.Array) and field._pfp__raw_view() is None:
+        return [
+            ("[{}]".format(idx), item) for idx, item in enumerate(field.items)
+        ]
+    return []
+
+
+def iter_records(dom, leaves_only=False, path=None):
+    """Yield a :any:`Record` for every field of ``dom`` in the order the
+    fields were declared (depth first). The root of the DOM itself is not
+    exported. Paths are dotted like :any:`pfp.fields.Field._pfp__path`, and
+    items of arrays are named ``name[idx]``.
+
+    :param pfp.fields.Field dom: The parsed DOM, or any field in it
+    :param bool leaves_only: Only export fields without exported children
+        (numbers, strings and arrays with raw data)
+    :param str path: The path of ``dom`` if it is not the DOM itself,
+        defaults to its :any:`pfp.fields.Field._pfp__path`
+    """
+    if isinstance(dom, fields.Dom):
+        stack = [
+            (suffix[1:], child) for suffix, child in reversed(_children(dom))
+        ]
+    else:
+        stack = [(dom._pfp__path() if path is None else path, dom)]
+
+    while len(stack) > 0:
+        path, field = stack.pop()
+        children = _children(field)
+
+        if len(children) == 0 or not leaves_only:
+            yield Record(
+                path,
+                field._pfp__offset,
+                field._pfp__width(),
+                _type_name(field),
+                _value(field) if len(children) == 0 else None,
+            )
+
+        for suffix, child in reversed(children):
+            stack.append((path + suffix, child))
+
+
+def json_record(record):
+    """Return the :any:`Record` as a JSON-serializable dict. ``bytes``
+    values are converted to ``ISO-8859-1`` decoded strings, so each
+    character is one byte of the value.
+    """
+    res = record._asdict()
+    if isinstance(res["value"], bytes):
+        res["value"] = utils.string(res["value"])
+    return res
+
+
+def write_ndjson(dom, stream, leaves_only=False):
+    """Write the records of ``dom`` (see :any:`iter_records`) to the text
+    ``stream`` as newline-delimited JSON objects (see :any:`json_record`).
+
+    :returns: The number of records written
+    """
+    encoder = json.JSONEncoder(separators=(",", ":"))
+    count = 0
+    for record in iter_records(dom, leaves_only=leaves_only):
+        stream.write(encoder.encode(json_record(record)))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+def to_columns(dom, leaves_only=False, split_values=False):
+    """Return the records of ``dom`` (see :any:`iter_records`) as an
+    ordered dict of column name to list of values.
+
+    :param bool split_values: Replace the mixed-type ``value`` column
+        with the typed columns in :any:`SPLIT_VALUE_COLUMNS`, which are
+        ``None`` where the value has a different type. Columnar formats such
+        as Arrow need a single type per column.
+    """
+    names = list(COLUMNS[:-1])
+    names += list(SPLIT_VALUE_COLUMNS) if split_values else ["value"]
+    res = collections.OrderedDict((name, []) for name in names)
+
+    paths, offsets, widths, types = [res[name] for name in COLUMNS[:-1]]
+    for record in iter_records(dom, leaves_only=leaves_only):
+        paths.append(record.path)
+        offsets.append(record.offset)
+        widths.append(record.width)
+        types.append(record.type)
+
+        value = record.value
+        if not split_values:
+            res["value"].append(value)
+            continue
+        res["int_value"].append(
+            value if isinstance(value, six.integer_types) else None
+        )
+        res["float_value"].append(value if isinstance(value, float) else None)
+        res["bytes_value"].append(value if isinstance(value, bytes) else None)
+
+    return res
+
+
+def to_numpy(dom, leaves_only=False):
+    """Return the records of ``dom`` (see :any:`iter_records`) as a NumPy
+    record array. ``offset`` and ``width`` are 64-bit integers, the other
+    columns are Python objects.
+    """
+    if numpy is None:
+        raise errors.PfpError("the numpy module is not available")
+
+    records = list(iter_records(dom, leaves_only=leaves_only))
+    dtype = [
+        ("path", object),
+        ("offset", numpy.int64),
+        ("width", numpy.int64),
+        ("type", object),
+        ("value", object),
+    ]
+    return numpy.rec.array(records, dtype=dtype)
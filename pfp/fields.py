@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+import collections
 import contextlib
+import fnmatch
 from intervaltree import IntervalTree, Interval
 import json
 import math
@@ -12,6 +14,7 @@ import struct
 import pfp.errors as errors
 import pfp.utils as utils
 import pfp.bitwrap as bitwrap
+import pfp.checksum as checksum
 import pfp.functions as functions
 
 
@@ -19,6 +22,28 @@ BIG_ENDIAN = ">"
 LITTLE_ENDIAN = "<"
 
 
+_STRUCTS = {}
+
+
+def get_struct(endian, fmt):
+    """Return the (cached) precompiled ``struct.Struct`` for the endianness
+    and format character of a numeric field
+    """
+    key = endian + fmt
+    res = _STRUCTS.get(key)
+    if res is None:
+        res = _STRUCTS[key] = struct.Struct(key)
+    return res
+
+
+def is_bitfield(field):
+    """Return True if the field is a bitfield. Unlike ``getattr(field,
+    "bitsize", None)``, this never falls back to the variable lookup of
+    :any:`Struct.__getattr__`.
+    """
+    return isinstance(field, NumberBase) and field.bitsize is not None
+
+
 def true():
     res = Int()
     res._pfp__value = 1
@@ -65,6 +90,23 @@ def get_str(field):
     return utils.string(res)
 
 
+def get_bytes(field):
+    """Return the value of a string-like field (char arrays, strings and
+    chars) as ``bytes``, without converting it to a text string first.
+    Other fields and values are converted with :any:`get_str`.
+    """
+    if isinstance(field, Array) and field.is_stringable():
+        return field._array_to_bytes()
+    elif isinstance(field, String):
+        return field._pfp__value
+    elif isinstance(field, Char):
+        return six.int2byte(field._pfp__value & 0xFF)
+    elif isinstance(field, bytes):
+        return field
+
+    return utils.binary(get_str(field))
+
+
 def inherit_hash(cls):
     cls.__hash__ = Field.__hash__
     return cls
@@ -72,6 +114,7 @@ def inherit_hash(cls):
 
 PYVAL = get_value
 PYSTR = get_str
+PYBYTES = get_bytes
 
 
 class BitfieldRW(object):
@@ -231,6 +274,215 @@ class BitfieldRW(object):
         return stream.read_bits(num)
 
 
+class LeafIndex(object):
+    """An index of the leaf fields of a field (see :any:`Field._pfp__leaves`)
+    that can be queried by class, path and metadata.
+
+    Paths can either be the full path of a field (``root.chunk[1].length``,
+    see :any:`Field._pfp__path`) or its *type path*, which is the name of the
+    parent's class followed by the name of the field (``PNG_CHUNK.length``).
+    Exact paths and classes are answered from lookup tables that are built
+    on first use; globs (``PNG_CHUNK.*``) are matched against the candidates.
+    """
+
+    METADATA = {
+        "watch": lambda f: len(f._pfp__watch_fields) > 0,
+        "watched": lambda f: len(f._pfp__watchers) > 0,
+        "packed": lambda f: f._pfp__pack_type is not None,
+    }
+    """Predicates for the metadata that can be queried"""
+
+    def __init__(self, leaves):
+        self.leaves = leaves
+        self._by_cls = None
+        self._by_path = None
+
+    def __len__(self):
+        return len(self.leaves)
+
+    @staticmethod
+    def type_path(field):
+        """Return the type path of the field (E.g. ``PNG_CHUNK.length``)
+        """
+        parent = field._pfp__parent
+        if isinstance(parent, Array):
+            parent = parent._pfp__parent
+        if parent is None:
+            return field._pfp__name
+        return "{}.{}".format(parent.__class__.__name__, field._pfp__name)
+
+    def by_cls(self, cls):
+        """Return all leaves that are instances of ``cls``, which may be a
+        class or a class name
+        """
+        if self._by_cls is None:
+            self._by_cls = {}
+            for leaf in self.leaves:
+                for leaf_cls in leaf.__class__.__mro__:
+                    if leaf_cls is object:
+                        break
+                    self._by_cls.setdefault(leaf_cls, []).append(leaf)
+                    self._by_cls.setdefault(leaf_cls.__name__, []).append(leaf)
+        return self._by_cls.get(cls, [])
+
+    def by_path(self, path):
+        """Return all leaves whose full path or type path is ``path``
+        """
+        if self._by_path is None:
+            self._by_path = {}
+            for leaf in self.leaves:
+                self._by_path.setdefault(leaf._pfp__path(), []).append(leaf)
+                type_path = self.type_path(leaf)
+                if type_path is not None:
+                    self._by_path.setdefault(type_path, []).append(leaf)
+        return self._by_path.get(path, [])
+
+    def query(self, cls=None, path=None, metadata=None):
+        """Return the leaves that match all of the provided criteria, in DOM
+        order.
+
+        :param cls: A field class or class name. Subclasses also match
+        :param str path: A full path or type path, optionally containing glob characters (``*?[``)
+        :param metadata: A metadata name (or list of names) from :any:`LeafIndex.METADATA`
+        """
+        is_glob = path is not None and any(c in path for c in "*?[")
+
+        if cls is not None:
+            res = self.by_cls(cls)
+            if path is not None and not is_glob:
+                matching = set(id(x) for x in self.by_path(path))
+                res = [x for x in res if id(x) in matching]
+        elif path is not None and not is_glob:
+            res = self.by_path(path)
+        else:
+            res = self.leaves
+
+        if is_glob:
+            res = [
+                x for x in res
+                if fnmatch.fnmatchcase(x._pfp__path(), path)
+                or fnmatch.fnmatchcase(self.type_path(x) or "", path)
+            ]
+
+        if metadata is not None:
+            if isinstance(metadata, six.string_types):
+                metadata = [metadata]
+            for name in metadata:
+                res = list(filter(self.METADATA[name], res))
+
+        return list(res)
+
+
+class UndoLog(object):
+    """A transactional undo log for field values. While the log is
+    recording (see :any:`UndoLog.recording`), every field that is modified
+    saves its previous state the first time it is written to. :any:`UndoLog.rollback`
+    then restores those states without triggering any events.
+
+    Unlike :any:`Field._pfp__snapshot`, the cost of saving and restoring
+    only depends on the number of fields that changed, not on the size of
+    the tree: ::
+
+        undo = UndoLog()
+        with undo.recording():
+            dom.chunks[3].length = 0xffffffff
+        output = dom._pfp__build()
+        undo.rollback()
+    """
+
+    active = None
+    """The log that is currently recording, or ``None``"""
+
+    def __init__(self):
+        self.entries = []
+        self._recorded = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @contextlib.contextmanager
+    def recording(self):
+        """Record the previous states of all fields modified within the
+        context. Recording logs may be nested, in which case only the
+        innermost log is recorded to.
+        """
+        prev = UndoLog.active
+        UndoLog.active = self
+        try:
+            yield self
+        finally:
+            UndoLog.active = prev
+
+    def record(self, field):
+        """Save the state of ``field`` if it has not been saved since the
+        last rollback
+        """
+        key = id(field)
+        if key in self._recorded:
+            return
+        self._recorded.add(key)
+        self.entries.append((field, field._pfp__save_state()))
+
+    def rollback(self):
+        """Restore all recorded fields to their state before the first
+        recorded change, in reverse order, and clear the log
+        """
+        for field, state in reversed(self.entries):
+            field._pfp__load_state(state)
+        self.entries = []
+        self._recorded = set()
+
+
+class UnpackCache(object):
+    """Keeps track of the packed fields whose data has been unpacked (see
+    :any:`Field._`), and the size of their unpacked data. If ``max_size`` is
+    set, the unpacked data of the least recently unpacked fields is dropped
+    once the total size exceeds it, to be unpacked again the next time it is
+    accessed (see :any:`Field._pfp__evict_unpacked`).
+    """
+
+    def __init__(self, max_size=None):
+        """
+        :param int max_size: The maximum total size of the unpacked data to keep, or ``None``
+        """
+        self.max_size = max_size
+        self.size = 0
+        # id(field) -> (field, size), least recently unpacked first
+        self._fields = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._fields)
+
+    def add(self, field, size):
+        """Record that ``field`` has ``size`` bytes of unpacked data,
+        evicting the unpacked data of other fields if needed
+        """
+        self.discard(field)
+        self._fields[id(field)] = (field, size)
+        self.size += size
+        self.evict(keep=field)
+
+    def discard(self, field):
+        """Stop tracking ``field``"""
+        entry = self._fields.pop(id(field), None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def evict(self, keep=None):
+        """Evict the unpacked data of the least recently unpacked fields
+        (other than ``keep``) until the total size is at most ``max_size``
+        """
+        if self.max_size is None:
+            return
+        for field, size in list(self._fields.values()):
+            if self.size <= self.max_size:
+                break
+            if field is keep:
+                continue
+            self.discard(field)
+            field._pfp__evict_unpacked()
+
+
 class Field(object):
     """Core class for all fields used in the Pfp DOM.
     
@@ -259,6 +511,15 @@ class Field(object):
     _pfp__watch_fields = []
     """All fields that this field is watching"""
 
+    _pfp__leaf_cache = None
+    _pfp__leaf_index_cache = None
+    _pfp__summary_cache = None
+
+    # see Dom._pfp__build - the (offset, width) of the field in the last
+    # build, and (for containers) the children that changed since then
+    _pfp__built_at = None
+    _pfp__dirty = None
+
     def __init__(self, stream=None, metadata_processor=None):
         super(Field, self).__init__()
         self._pfp__name = None
@@ -280,15 +541,100 @@ class Field(object):
         self._pfp__no_unpack = False
         self._pfp__parsed_packed = None
         self._pfp__metadata_processor = metadata_processor
-        self._ = None
+
+        # see Field._
+        self._pfp__unpacked = None
+        self._pfp__packed_data = None
+        # see _pfp__unpack_data
+        self._pfp__unpack_settings = None
+        self._pfp__unpack_cache = None
 
         self._pfp__array_idx = None
 
         self._pfp__snapshot_stack = []
 
+        # see _pfp__leaves
+        self._pfp__leaf_cache = None
+        self._pfp__leaf_index_cache = None
+
+        # see _pfp__summary
+        self._pfp__summary_cache = None
+
         if stream is not None:
             self._pfp__parse(stream, save_offset=True)
 
+    def _pfp__leaves(self):
+        """Return the list of leaf fields of this field, as used when
+        choosing fields to mutate (see :any:`pfp.fuzz.StratGroup.which`). Packed
+        fields return the leaves of the unpacked data. The returned list should
+        not be modified.
+        """
+        if self._ is not None:
+            return self._._pfp__leaves()
+        return [self]
+
+    def _pfp__leaf_index(self):
+        """Return a :any:`LeafIndex` of the leaves of this field. The index
+        is cached until the structure of the field changes.
+        """
+        leaves = self._pfp__leaves()
+        index = self._pfp__leaf_index_cache
+        if index is None or index.leaves is not leaves:
+            index = self._pfp__leaf_index_cache = LeafIndex(leaves)
+        return index
+
+    def _pfp__invalidate_leaves(self):
+        """Mark the cached leaves of this field and its parents as stale. Must
+        be called whenever children are added or replaced.
+
+        A valid cache implies that all of the children's caches are also valid,
+        which means we can stop at the first parent that is already invalid.
+        """
+        self._pfp__leaf_cache = None
+        parent = self._pfp__parent
+        while parent is not None and parent._pfp__leaf_cache is not None:
+            parent._pfp__leaf_cache = None
+            parent = parent._pfp__parent
+
+    def _pfp__summary(self, kind):
+        """Return the cached ``(length, value)`` summary of the built field
+        for one of the combinable checksums in :any:`pfp.checksum.SUMMARIES`
+        (``"length"``, ``"crc32"`` or ``"adler32"``).
+
+        Summaries of structs and arrays are combined from the summaries of
+        their children, so after a change only the fields along the path
+        to the changed field are rebuilt and hashed again.
+        """
+        cache = self._pfp__summary_cache
+        if cache is None:
+            cache = self._pfp__summary_cache = {}
+        res = cache.get(kind)
+        if res is None:
+            res = cache[kind] = self._pfp__compute_summary(kind)
+        return res
+
+    def _pfp__compute_summary(self, kind):
+        return checksum.summarize(kind, self._pfp__build())
+
+    def _pfp__invalidate_summary(self):
+        """Discard the cached summaries and widths of this field and all of
+        its parents. Called whenever the built data of the field may have
+        changed.
+        """
+        field = self
+        field._pfp__summary_cache = None
+        # a container that changed itself must rewrite all of its children
+        field._pfp__dirty = None
+
+        parent = field._pfp__parent
+        while parent is not None:
+            parent._pfp__summary_cache = None
+            dirty = parent._pfp__dirty
+            if dirty is not None:
+                dirty[id(field)] = field
+            field = parent
+            parent = field._pfp__parent
+
     def _pfp__get_class(self):
         """Return the class for this field. This would be used for things like
         integer promotion and type casting.
@@ -337,6 +683,29 @@ class Field(object):
         """
         if hasattr(self, "_pfp__value"):
             self._pfp__value = self._pfp__snapshot_stack.pop()
+            self._pfp__invalidate_summary()
+
+    def _pfp__record_undo(self):
+        """Save the current state of the field in the active :any:`UndoLog`
+        (if any). Must be called before the field's value is changed.
+        Temporary fields that are not part of a DOM (e.g. the return values
+        of functions) are not recorded.
+        """
+        if UndoLog.active is not None and self._pfp__parent is not None:
+            UndoLog.active.record(self)
+
+    def _pfp__save_state(self):
+        """Return the state of the field that is saved by :any:`UndoLog`
+        """
+        return getattr(self, "_pfp__value", None)
+
+    def _pfp__load_state(self, state):
+        """Restore a state returned by :any:`Field._pfp__save_state` without
+        triggering any events
+        """
+        if hasattr(self, "_pfp__value"):
+            self._pfp__value = state
+            self._pfp__invalidate_summary()
 
     def _pfp__process_metadata(self):
         """Process the metadata once the entire struct has been
@@ -415,8 +784,11 @@ class Field(object):
         if self._pfp__pack_type is None:
             return
 
+        generate = self._pfp__interp._generate
         tmp_stream = six.BytesIO()
-        self._._pfp__build(bitwrap.BitwrappedStream(tmp_stream))
+        self._._pfp__build(
+            bitwrap.BitwrappedStream(tmp_stream, generate=generate)
+        )
         raw_data = tmp_stream.getvalue()
 
         unpack_func = self._pfp__packer
@@ -440,7 +812,7 @@ class Field(object):
             res = res._pfp__build()
 
         io_stream = six.BytesIO(res)
-        tmp_stream = bitwrap.BitwrappedStream(io_stream)
+        tmp_stream = bitwrap.BitwrappedStream(io_stream, generate=generate)
 
         self._pfp__no_unpack = True
         self._pfp__parse(tmp_stream)
@@ -452,6 +824,22 @@ class Field(object):
         """
         return self._pfp__pack_type is not None
 
+    @property
+    def _(self):
+        """The unpacked data of a packed field (see :any:`Field._pfp__set_packer`),
+        or ``None``. Unless lazy unpacking is disabled (see
+        :any:`pfp.interp.PfpInterp.set_lazy_unpack`), the packed data is only
+        unpacked and parsed when this is first accessed.
+        """
+        if self._pfp__packed_data is not None:
+            self._pfp__unpack_now()
+        return self._pfp__unpacked
+
+    @_.setter
+    def _(self, value):
+        self._pfp__packed_data = None
+        self._pfp__unpacked = value
+
     def _pfp__unpack_data(self, raw_data):
         """Means that the field has already been parsed normally,
         and that it now needs to be unpacked.
@@ -463,6 +851,32 @@ class Field(object):
         if self._pfp__no_unpack:
             return
 
+        interp = self._pfp__interp
+        if self._pfp__unpacked is not None:
+            self._pfp__unpack_cache.discard(self)
+
+        # the endianness and bitfield settings in effect now are used when
+        # the data is unpacked later, and the unpacked data is tracked by
+        # the cache of this parse, even if the interpreter parsed other
+        # data in the meantime
+        self._pfp__unpacked = None
+        self._pfp__packed_data = raw_data
+        self._pfp__unpack_settings = interp._get_parse_settings()
+        self._pfp__unpack_cache = interp.get_unpack_cache()
+        self._pfp__invalidate_leaves()
+
+        if not interp.get_lazy_unpack():
+            self._pfp__unpack_now()
+
+    def _pfp__unpack_now(self):
+        """Unpack and parse the packed data saved by
+        :any:`Field._pfp__unpack_data`
+        """
+        raw_data = self._pfp__packed_data
+        self._pfp__packed_data = None
+        interp = self._pfp__interp
+        max_size = interp.get_max_unpack_size()
+
         unpack_func = self._pfp__packer
         unpack_args = []
         if self._pfp__packer is not None:
@@ -473,25 +887,61 @@ class Field(object):
             unpack_func = self._pfp__unpack
             unpack_args = [raw_data]
 
-        # does not need to be converted to a char array
-        if not isinstance(unpack_func, functions.NativeFunction):
-            io_stream = bitwrap.BitwrappedStream(six.BytesIO(raw_data))
-            unpack_args[-1] = Array(len(raw_data), Char, io_stream)
+        # streaming native packers (see pfp.native.packers.streaming) are
+        # decompressed as the packed type is parsed
+        codec = getattr(getattr(unpack_func, "func", None), "stream_codec", None)
+        if codec is not None:
+            import pfp.native.packers
 
-        res = unpack_func.call(
-            unpack_args, *self._pfp__pack_func_call_info, no_cast=True
+            io_stream = pfp.native.packers.DecompressingStream(
+                codec, raw_data, max_size=max_size
+            )
+        else:
+            # does not need to be converted to a char array
+            if not isinstance(unpack_func, functions.NativeFunction):
+                io_stream = bitwrap.BitwrappedStream(six.BytesIO(raw_data))
+                unpack_args[-1] = Array(len(raw_data), Char, io_stream)
+
+            res = unpack_func.call(
+                unpack_args, *self._pfp__pack_func_call_info, no_cast=True
+            )
+            if isinstance(res, Array):
+                res = res._pfp__build()
+            if max_size is not None and len(res) > max_size:
+                raise errors.UnpackLimitExceeded(
+                    "unpacked data is larger than {} bytes".format(max_size)
+                )
+
+            io_stream = six.BytesIO(res)
+        tmp_stream = bitwrap.BitwrappedStream(
+            io_stream, generate=self._pfp__interp._generate
         )
-        if isinstance(res, Array):
-            res = res._pfp__build()
 
-        io_stream = six.BytesIO(res)
-        tmp_stream = bitwrap.BitwrappedStream(io_stream)
+        settings = self._pfp__unpack_settings
+        tmp_stream.padded = settings[1]
 
-        tmp_stream.padded = self._pfp__interp.get_bitfield_padded()
+        curr_settings = interp._get_parse_settings()
+        interp._set_parse_settings(settings)
+        try:
+            unpacked = self._pfp__pack_type(tmp_stream)
+        finally:
+            interp._set_parse_settings(curr_settings)
+        self._pfp__unpacked = self._pfp__parsed_packed = unpacked
+        self._pfp__invalidate_leaves()
 
-        self._ = self._pfp__parsed_packed = self._pfp__pack_type(tmp_stream)
+        unpacked._pfp__watch(self)
+        self._pfp__unpack_cache.add(self, tmp_stream.tell())
 
-        self._._pfp__watch(self)
+    def _pfp__evict_unpacked(self):
+        """Drop the unpacked data, keeping the packed data so that it is
+        unpacked again the next time ``_`` is accessed. References to the
+        dropped unpacked fields will no longer update this field.
+        """
+        if self._pfp__unpacked is None:
+            return
+        self._pfp__unpacked = self._pfp__parsed_packed = None
+        self._pfp__packed_data = self._pfp__build()
+        self._pfp__invalidate_leaves()
 
     def _pfp__handle_updated(self, watched_field):
         """Handle the watched field that was updated
@@ -505,7 +955,7 @@ class Field(object):
 
         # notice the use of _is_ here - 'is' != '=='. '==' uses
         # the __eq__ operator, while is compares id(object) results
-        if watched_field is self._:
+        if watched_field is self._pfp__unpacked:
             self._pfp__pack_data()
         elif self._pfp__update_func is not None:
             self._pfp__update_func.call(
@@ -522,14 +972,115 @@ class Field(object):
             self._pfp__parent._pfp__notify_update(self)
 
     def _pfp__width(self):
-        """Return the width of the field (sizeof)
+        """Return the width of the field (sizeof). The width is cached along
+        with the summaries of the field (see :any:`Field._pfp__summary`) until
+        the field or one of its children changes.
+        """
+        cache = self._pfp__summary_cache
+        if cache is None:
+            cache = self._pfp__summary_cache = {}
+        res = cache.get("width")
+        if res is None:
+            res = cache["width"] = self._pfp__compute_width()
+        return res
+
+    def _pfp__compute_width(self):
+        """Measure the width of the field by building it
         """
         raw_output = six.BytesIO()
-        output = bitwrap.BitwrappedStream(raw_output)
+        output = bitwrap.BitwrappedStream(raw_output, generate=False)
         self._pfp__build(output)
         output.flush()
         return len(raw_output.getvalue())
 
+    def _pfp__has_bitfields(self):
+        """Return True if the field is or contains a bitfield. Bitfields
+        share bytes with their neighbors and can only be built into a
+        stream. The result is cached along with the width of the field.
+        """
+        cache = self._pfp__summary_cache
+        if cache is None:
+            cache = self._pfp__summary_cache = {}
+        res = cache.get("bitfields")
+        if res is None:
+            res = cache["bitfields"] = self._pfp__compute_has_bitfields()
+        return res
+
+    def _pfp__compute_has_bitfields(self):
+        return False
+
+    def _pfp__build_into(self, buf, offset, save_offset=False):
+        """Write the built field into the ``bytearray`` ``buf`` at
+        ``offset``. Containers write each of their children in place, so no
+        intermediate ``bytes`` objects are created for them (see
+        :any:`Field._pfp__build_buffer`).
+
+        :returns: The offset after the written data
+        """
+        if save_offset:
+            self._pfp__offset = offset
+        data = self._pfp__build()
+        end = offset + len(data)
+        buf[offset:end] = data
+        return end
+
+    def _pfp__rebuild_into(self, buf, offset, full=False, save_offset=False):
+        """Like :any:`Field._pfp__build_into`, but containers only write
+        the children that changed since the last rebuild (see
+        :any:`Dom._pfp__build`). The changed children are recorded by
+        :any:`Field._pfp__invalidate_summary`.
+
+        :param bool full: Write all fields, e.g. into a new buffer
+        :returns: The offset after the field
+        """
+        end = self._pfp__rebuild_changed_into(buf, offset, full, save_offset)
+        self._pfp__built_at = (offset, end - offset)
+        return end
+
+    def _pfp__rebuild_changed_into(self, buf, offset, full, save_offset):
+        return self._pfp__build_into(buf, offset, save_offset)
+
+    def _pfp__rebuild_children_into(
+        self, children, buf, offset, full, save_offset
+    ):
+        """Rebuild the changed ``children`` of a container that starts at
+        ``offset``. If the container changed itself or a changed child
+        changed its width, all of the children are written.
+        """
+        dirty = self._pfp__dirty
+        self._pfp__dirty = {}
+
+        if not full and dirty is not None:
+            for child in six.itervalues(dirty):
+                built_at = child._pfp__built_at
+                if built_at is None or child._pfp__width() != built_at[1]:
+                    break
+            else:
+                for child in six.itervalues(dirty):
+                    child._pfp__rebuild_into(buf, child._pfp__built_at[0])
+                return offset + self._pfp__width()
+
+        if save_offset:
+            self._pfp__offset = offset
+        for child in children:
+            offset = child._pfp__rebuild_into(buf, offset, True, save_offset)
+        return offset
+
+    def _pfp__build_buffer(self, save_offset=False):
+        """Build the field in two passes: the exact size is taken from the
+        cached widths of the fields (see :any:`Field._pfp__width`), then
+        every field is written into one preallocated ``bytearray`` with
+        :any:`Field._pfp__build_into`. Must not be used for fields that
+        contain bitfields.
+
+        :returns: The built data as ``bytes``
+        """
+        buf = bytearray(self._pfp__width())
+        end = self._pfp__build_into(buf, 0, save_offset)
+        if end != len(buf):
+            del buf[end:]
+        return bytes(buf)
+
     def _pfp__freeze(self):
         """Freeze the field so that it cannot be modified (const)
         """
@@ -552,10 +1103,14 @@ class Field(object):
         """
         if self._pfp__frozen:
             raise errors.UnmodifiableConst()
+        self._pfp__record_undo()
         self._pfp__value = get_value(new_val)
         return self._pfp__notify_parent()
 
     def _pfp__notify_parent(self):
+        # the value of this field changed, even if nothing is notified
+        self._pfp__invalidate_summary()
+
         if self._pfp__no_notify:
             return []
 
@@ -809,6 +1364,35 @@ class Struct(Field):
             for child in self._pfp__children:
                 child._pfp__restore_snapshot(recurse=recurse)
 
+    def _pfp__compute_summary(self, kind):
+        return checksum.combine_summaries(
+            kind, [child._pfp__summary(kind) for child in self._pfp__children]
+        )
+
+    def _pfp__compute_width(self):
+        # bitfields share bytes with their neighbors
+        for child in self._pfp__children:
+            if is_bitfield(child):
+                return super(Struct, self)._pfp__compute_width()
+        return sum(child._pfp__width() for child in self._pfp__children)
+
+    def _pfp__leaves(self):
+        """Return the leaves of all children, in order. The result is cached
+        and only rebuilt after a child has been added or replaced (see
+        :any:`Field._pfp__invalidate_leaves`), reusing the cached leaves
+        of unchanged children.
+        """
+        if self._ is not None:
+            return self._._pfp__leaves()
+
+        res = self._pfp__leaf_cache
+        if res is None:
+            res = []
+            for child in self._pfp__children:
+                res.extend(child._pfp__leaves())
+            self._pfp__leaf_cache = res
+        return res
+
     def _pfp__process_fields_metadata(self):
         """Tell each child to process its metadata
         """
@@ -881,6 +1465,9 @@ class Struct(Field):
             res._pfp__prev_sibling = self._pfp__children[-2]
             self._pfp__children[-2]._pfp__next_sibling = res
 
+        self._pfp__invalidate_leaves()
+        self._pfp__invalidate_summary()
+
         return res
 
     def _pfp__handle_non_consecutive_duplicate(self, name, child, insert=True):
@@ -998,6 +1585,9 @@ class Struct(Field):
         if save_offset and stream is not None:
             self._pfp__offset = stream.tell()
 
+        if stream is None and not self._pfp__has_bitfields():
+            return self._pfp__build_buffer(save_offset)
+
         # returns either num bytes written or total data
         res = utils.binary("") if stream is None else 0
 
@@ -1008,6 +1598,24 @@ class Struct(Field):
 
         return res
 
+    def _pfp__build_into(self, buf, offset, save_offset=False):
+        if save_offset:
+            self._pfp__offset = offset
+        for child in self._pfp__children:
+            offset = child._pfp__build_into(buf, offset, save_offset)
+        return offset
+
+    def _pfp__rebuild_changed_into(self, buf, offset, full, save_offset):
+        return self._pfp__rebuild_children_into(
+            self._pfp__children, buf, offset, full, save_offset
+        )
+
+    def _pfp__compute_has_bitfields(self):
+        for child in self._pfp__children:
+            if child._pfp__has_bitfields():
+                return True
+        return False
+
     def __getattr__(self, name):
         """Custom __getattr__ for quick access to the children"""
         children_map = super(Struct, self).__getattribute__(
@@ -1039,6 +1647,7 @@ class Struct(Field):
                 children_map[name]._pfp__set_value(value)
             else:
                 children_map[name] = value
+                self._pfp__invalidate_leaves()
                 self._pfp__notify_parent()
             return children_map[name]
         else:
@@ -1090,14 +1699,17 @@ class Union(Struct):
     _pfp__size = 0
     _pfp__show_name = "union"
 
+    # set while the other children are decoded after a child changed
+    _pfp__updating = False
+
     def __init__(self, stream=None, metadata_processor=None):
-        """Init the union and its buff stream
+        """Init the union and its shared buffer
         """
         super(Union, self).__init__(metadata_processor=metadata_processor)
 
         if stream is not None:
             self._pfp__offset = stream.tell()
-        self._pfp__buff = six.BytesIO()
+        self._pfp__buff = bytearray()
 
     def _pfp__add_child(self, name, child, stream=None):
         """Add a child to the Union field
@@ -1107,10 +1719,7 @@ class Union(Struct):
         :returns: The resulting field
         """
         res = super(Union, self)._pfp__add_child(name, child)
-        self._pfp__buff.seek(0, 0)
-        child._pfp__build(stream=self._pfp__buff)
-        size = len(self._pfp__buff.getvalue())
-        self._pfp__buff.seek(0, 0)
+        size = self._pfp__write_buff(child)
 
         if stream is not None:
             curr_pos = stream.tell()
@@ -1118,59 +1727,186 @@ class Union(Struct):
 
         return res
 
+    def _pfp__write_buff(self, child):
+        """Write ``child`` over the start of the buffer that is shared by
+        all children (the memory of the union). Children without bitfields
+        are written in place, without building them into a stream.
+
+        :returns: The size of the child
+        """
+        buff = self._pfp__buff
+        if child._pfp__has_bitfields():
+            data = child._pfp__build()
+            size = len(data)
+            buff[:size] = data
+        else:
+            size = child._pfp__width()
+            if len(buff) < size:
+                buff.extend(bytearray(size - len(buff)))
+            child._pfp__build_into(buff, 0)
+
+        self._pfp__size = max(self._pfp__size, size)
+        return size
+
     def _pfp__notify_update(self, child=None):
         """Handle a child with an updated value
         """
-        if getattr(self, "_pfp__union_update_other_children", True):
-            self._pfp__union_update_other_children = False
+        if not self._pfp__updating and child is not None:
+            self._pfp__updating = True
+            try:
+                self._pfp__update_other_children(child)
+            finally:
+                self._pfp__updating = False
 
-            new_data = child._pfp__build()
-            new_stream = bitwrap.BitwrappedStream(six.BytesIO(new_data))
-            for other_child in self._pfp__children:
-                if other_child is child:
-                    continue
+        super(Union, self)._pfp__notify_update(child=child)
 
-                if (
-                    isinstance(other_child, Array)
-                    and other_child.is_stringable()
-                ):
-                    other_child._pfp__set_value(new_data)
-                else:
-                    other_child._pfp__parse(new_stream)
-                new_stream.seek(0)
+    def _pfp__update_other_children(self, child):
+        """Write the updated ``child`` into the shared buffer and decode the
+        other children from it again. Children that end before the first
+        byte that changed are left alone.
+        """
+        buff = self._pfp__buff
+        old_data = bytes(buff)
+        self._pfp__record_undo()
+        self._pfp__write_buff(child)
+        if buff == old_data:
+            return
 
-            self._pfp__no_update_other_children = True
+        first_changed = 0
+        max_same = min(len(buff), len(old_data))
+        while first_changed < max_same and (
+            buff[first_changed] == old_data[first_changed]
+        ):
+            first_changed += 1
 
-        super(Union, self)._pfp__notify_update(child=child)
+        data = bytes(buff)
+        new_stream = None
+        for other_child in self._pfp__children:
+            if other_child is child:
+                continue
+            if other_child._pfp__width() <= first_changed:
+                continue
+
+            if self._pfp__decode_child(other_child, data, 0) is None:
+                if new_stream is None:
+                    new_stream = bitwrap.BitwrappedStream(six.BytesIO(data))
+                new_stream.seek(0)
+                self._pfp__record_undo_tree(other_child)
+                other_child._pfp__parse(new_stream)
+                other_child._pfp__invalidate_summary()
+
+    def _pfp__record_undo_tree(self, field):
+        """Record the undo state of ``field`` and of all fields within it,
+        before it is parsed again
+        """
+        field._pfp__record_undo()
+        if isinstance(field, Struct):
+            for child in field._pfp__children:
+                self._pfp__record_undo_tree(child)
+        elif isinstance(field, Array) and field._pfp__raw_view() is None:
+            for item in field.items:
+                self._pfp__record_undo_tree(item)
+
+    def _pfp__decode_child(self, child, data, offset):
+        """Decode ``child`` from ``data`` at ``offset`` without a stream.
+        Numbers, arrays with raw data, and structs of those are supported.
+
+        :returns: The offset after the child, or None if the child must be
+            parsed from a stream
+        """
+        if isinstance(child, NumberBase):
+            if is_bitfield(child):
+                return None
+            end = offset + child.width
+            child._pfp__record_undo()
+            child._pfp__parse_bytes(data[offset:end])
+        elif isinstance(child, Array):
+            raw = child._pfp__raw_view()
+            if raw is None:
+                return None
+            # arrays in unions keep their size
+            end = offset + len(raw)
+            child._pfp__record_undo()
+            child._pfp__write_raw(0, data[offset:end])
+        elif isinstance(child, Struct) and not isinstance(child, Union):
+            end = offset
+            for sub_child in child._pfp__children:
+                end = self._pfp__decode_child(sub_child, data, end)
+                if end is None:
+                    return None
+        else:
+            return None
+
+        child._pfp__invalidate_summary()
+        return end
 
     def _pfp__parse(self, stream, save_offset=False):
-        """Parse the incoming stream
+        """Parse the incoming stream. Each child is parsed from the start
+        of the union, then the largest extent is read into the shared
+        buffer.
 
         :stream: Input stream to be parsed
         :returns: Number of bytes parsed
         """
+        start = stream.tell()
         if save_offset:
-            self._pfp__offset = stream.tell()
+            self._pfp__offset = start
 
         max_res = 0
         for child in self._pfp__children:
-            child_res = child._pfp__parse(stream, save_offset)
+            stream.seek(start, 0)
+            child._pfp__parse(stream, save_offset)
+            child_res = stream.tell() - start
             if child_res > max_res:
                 max_res = child_res
-
-            # rewind the stream
-            stream.seek(child_res, -1)
         self._pfp__size = max_res
 
-        self._pfp__buff = six.BytesIO(stream.read(self._pfp__size))
+        stream.seek(start, 0)
+        self._pfp__buff = bytearray(stream.read(self._pfp__size))
         return max_res
 
+    def _pfp__save_state(self):
+        return (bytes(self._pfp__buff), self._pfp__size)
+
+    def _pfp__load_state(self, state):
+        buff, self._pfp__size = state
+        self._pfp__buff = bytearray(buff)
+        self._pfp__invalidate_summary()
+
+    def _pfp__compute_summary(self, kind):
+        # children overlap, the union has to be built
+        return checksum.summarize(kind, self._pfp__build())
+
+    def _pfp__compute_width(self):
+        if self._pfp__has_bitfields():
+            return Field._pfp__compute_width(self)
+        return max([child._pfp__width() for child in self._pfp__children] + [0])
+
+    def _pfp__build_into(self, buf, offset, save_offset=False):
+        """All children are written at the same offset; bytes of later
+        children overwrite those of earlier children
+        """
+        if save_offset:
+            self._pfp__offset = offset
+        end = offset
+        for child in self._pfp__children:
+            end = max(end, child._pfp__build_into(buf, offset, save_offset))
+        return end
+
+    def _pfp__rebuild_changed_into(self, buf, offset, full, save_offset):
+        # the children overlap, so all of them are written again in order
+        self._pfp__dirty = None
+        return self._pfp__build_into(buf, offset, save_offset)
+
     def _pfp__build(self, stream=None, save_offset=False):
         """Build the union and write the result into the stream.
 
         :stream: None
         :returns: None
         """
+        if stream is None and not self._pfp__has_bitfields():
+            return self._pfp__build_buffer(save_offset)
+
         max_size = -1
         if stream is None:
             core_stream = six.BytesIO()
@@ -1203,11 +1939,10 @@ class Union(Struct):
             "_pfp__children_map"
         )
 
-        if name in children_map:
-            field = getattr(self, name)
-            # back to the start of the buffer
-            self._pfp__buff.seek(0, 0)
-            field._pfp__build(stream=self._pfp__buff)
+        # values are written through _pfp__notify_update, new fields
+        # replace the memory of the union
+        if name in children_map and isinstance(value, Field):
+            self._pfp__write_buff(children_map[name])
 
         return res
 
@@ -1223,6 +1958,9 @@ class Dom(Struct):
         self._pfp__error = None
         self._pfp__types = None
 
+        # the output of the last build, see _pfp__build
+        self._pfp__last_build = None
+
     def __getattr__(self, attr_name):
         """Custom getattr for Dom class so types can also be
         accessed"""
@@ -1236,6 +1974,23 @@ class Dom(Struct):
     """The result of an interpreted template"""
 
     def _pfp__build(self, stream=None, save_offset=False):
+        """Build the DOM. Without a ``stream``, the output of the last build
+        is kept, and only the byte ranges of fields that changed since then
+        are written again (see :any:`Field._pfp__rebuild_into`). All fields
+        are written if the size of the output changed; fields that changed
+        their size without changing the size of the output cause all of
+        their siblings to be written.
+        """
+        if stream is None and not self._pfp__has_bitfields():
+            width = self._pfp__width()
+            buf = self._pfp__last_build
+            full = save_offset or buf is None or len(buf) != width
+            if full:
+                buf = self._pfp__last_build = bytearray(width)
+            self._pfp__rebuild_into(buf, 0, full, save_offset)
+            return bytes(buf)
+
+        self._pfp__last_build = None
         if stream is None:
             io_stream = six.BytesIO()
             tmp_stream = bitwrap.BitwrappedStream(io_stream)
@@ -1343,15 +2098,22 @@ class NumberBase(Field):
                 # reverse the data
                 data = data[::-1]
 
+        return self._pfp__parse_bytes(data, set_val=set_val)
+
+    def _pfp__parse_bytes(self, data, set_val=True):
+        """Unpack the value of this numeric field from ``data``
+
+        :param bytes data: At least ``width`` bytes
+        :param bool set_val: If False, return the value instead of setting it
+        :returns: The number of bytes parsed, or the value if ``set_val`` is False
+        """
         if len(data) < self.width:
             raise errors.PrematureEOF()
 
-        val = struct.unpack(
-            "{}{}".format(self.endian, self.format), data
-        )[0]
+        val = get_struct(self.endian, self.format).unpack_from(data)[0]
 
         if set_val:
-            self._pfp__data = data
+            self._pfp__data = data[:self.width]
             self._pfp__value = val
             return self.width
         else:
@@ -1370,9 +2132,7 @@ class NumberBase(Field):
             self._pfp__offset = stream.tell()
 
         if ignore_bitfields or self.bitsize is None:
-            data = struct.pack(
-                "{}{}".format(self.endian, self.format), self._pfp__value
-            )
+            data = get_struct(self.endian, self.format).pack(self._pfp__value)
             if stream is not None:
                 stream.write(data)
                 return len(data)
@@ -1402,6 +2162,17 @@ class NumberBase(Field):
                 # TODO this can't be right....
                 return bits
 
+    def _pfp__build_into(self, buf, offset, save_offset=False):
+        if save_offset:
+            self._pfp__offset = offset
+        get_struct(self.endian, self.format).pack_into(
+            buf, offset, self._pfp__value
+        )
+        return offset + self.width
+
+    def _pfp__compute_has_bitfields(self):
+        return self.bitsize is not None
+
     def _dom_class(self, obj1, obj2):
         """Return the dominating numeric class between the two
 
@@ -1677,6 +2448,7 @@ class IntBase(NumberBase):
             raise errors.UnmodifiableConst()
 
         promoted = self._pfp__promote(new_val)
+        self._pfp__record_undo()
         self._pfp__value = promoted
 
         return self._pfp__notify_parent()
@@ -2087,9 +2859,9 @@ class Array(Field):
     width = -1
     """The number of items of the array. ``len(array_field)`` also works"""
 
-    raw_data = None
-    """The raw data of the array. Note that this will only be
-    set if the array's items are a core type (E.g. Int, Char, etc)"""
+    _pfp__raw_bytes = None
+    _pfp__raw_buffer = None
+    _pfp__views = None
 
     field_cls = None
     """The class for items in the array"""
@@ -2100,9 +2872,14 @@ class Array(Field):
     def __init__(self, width, field_cls, stream=None, metadata_processor=None):
         """ Create an array field of size "width" from the stream
         """
+        # array classes created by the interpreter are named after the
+        # declared field (see pfp.interp.PfpInterp._handle_array_decl), which
+        # is needed to name the items while parsing
+        name = self._pfp__name
         super(Array, self).__init__(
             stream=None, metadata_processor=metadata_processor
         )
+        self._pfp__name = name
 
         self.width = width
         self.field_cls = field_cls
@@ -2110,6 +2887,9 @@ class Array(Field):
         self.raw_data = None
         self.implicit = False
 
+        # idx -> the field returned by __getitem__ for arrays with raw data
+        self._pfp__views = {}
+
         self._pfp__snapshot_raw_stack = []
 
         if stream is not None:
@@ -2117,7 +2897,45 @@ class Array(Field):
         else:
             if width is not None:
                 for x in six.moves.range(self.width):
-                    self.items.append(self.field_cls())
+                    item = self.field_cls()
+                    item._pfp__parent = self
+                    self.items.append(item)
+
+    @property
+    def raw_data(self):
+        """The raw data of the array. Note that this will only be
+        set if the array's items are a core type (E.g. Int, Char, etc)
+
+        Element writes modify a ``bytearray`` copy of the data in place
+        (see :any:`Array._pfp__write_raw`); the ``bytes`` returned here are
+        recreated from it on the next access after a write.
+        """
+        res = self._pfp__raw_bytes
+        if res is None and self._pfp__raw_buffer is not None:
+            res = self._pfp__raw_bytes = bytes(self._pfp__raw_buffer)
+        return res
+
+    @raw_data.setter
+    def raw_data(self, value):
+        self._pfp__raw_bytes = value
+        self._pfp__raw_buffer = None
+
+    def _pfp__write_raw(self, offset, data=None, value=None):
+        """Overwrite the raw data at ``offset`` in place, either with the
+        ``data`` bytes or by packing the item ``value`` into it. Does not
+        record undo state or notify anyone.
+        """
+        buf = self._pfp__raw_buffer
+        if buf is None:
+            buf = self._pfp__raw_buffer = bytearray(self._pfp__raw_bytes)
+        if data is not None:
+            buf[offset : offset + len(data)] = data
+        else:
+            field_cls = self.field_cls
+            get_struct(field_cls.endian, field_cls.format).pack_into(
+                buf, offset, value
+            )
+        self._pfp__raw_bytes = None
 
     def _pfp__snapshot(self, recurse=True):
         """Save off the current value of the field
@@ -2133,22 +2951,106 @@ class Array(Field):
         """Restore the snapshotted value without triggering any events
         """
         super(Array, self)._pfp__restore_snapshot(recurse=recurse)
-        self.raw_data = self._pfp__snapshot_raw_stack.pop()
+        raw_data = self._pfp__snapshot_raw_stack.pop()
+        if (raw_data is None) != (self._pfp__raw_view() is None):
+            self._pfp__invalidate_leaves()
+        self.raw_data = raw_data
+        self._pfp__invalidate_summary()
 
         if recurse:
             for item in self.items:
                 item._pfp__restore_snapshot(recurse=recurse)
 
+    def _pfp__save_state(self):
+        items = list(self.items) if self.raw_data is None else None
+        return (self.raw_data, self.width, items)
+
+    def _pfp__load_state(self, state):
+        raw_data, width, items = state
+        changed = (raw_data is None) != (self._pfp__raw_view() is None)
+        if items is not None:
+            changed = changed or len(items) != len(self.items) or any(
+                a is not b for a, b in zip(items, self.items)
+            )
+            self.items[:] = items
+        if changed:
+            self._pfp__invalidate_leaves()
+        self.raw_data = raw_data
+        self.width = width
+        self._pfp__invalidate_summary()
+
+    def _pfp__compute_summary(self, kind):
+        if (
+            self._pfp__raw_view() is not None
+            or self._pfp__pack_type is not None
+        ):
+            return super(Array, self)._pfp__compute_summary(kind)
+        return checksum.combine_summaries(
+            kind, [item._pfp__summary(kind) for item in self.items]
+        )
+
+    def _pfp__compute_width(self):
+        raw = self._pfp__raw_view()
+        if raw is not None:
+            return len(raw)
+        for item in self.items:
+            if is_bitfield(item):
+                return super(Array, self)._pfp__compute_width()
+        return sum(item._pfp__width() for item in self.items)
+
+    def _pfp__leaves(self):
+        """Arrays with raw data are a single leaf, otherwise the leaves
+        of all items are returned (and cached, see :any:`Struct._pfp__leaves`)
+        """
+        if self._ is not None:
+            return self._._pfp__leaves()
+        if self._pfp__raw_view() is not None:
+            return [self]
+
+        res = self._pfp__leaf_cache
+        if res is None:
+            res = []
+            for item in self.items:
+                res.extend(item._pfp__leaves())
+            self._pfp__leaf_cache = res
+        return res
+
     def append(self, item):
         # TODO check for consistent type
         item._pfp__parent = self
         self.items.append(item)
         self.width = len(self.items)
+        self._pfp__invalidate_leaves()
+        self._pfp__invalidate_summary()
 
     def is_stringable(self):
         # TODO WChar
         return self.field_cls in [Char, UChar]
 
+    def _array_to_bytes(self):
+        """Return the data of a stringable array as ``bytes``. Arrays with
+        ``raw_data`` return all of it, otherwise the value is null-terminated.
+
+        The data of arrays made of individual items is kept in a single
+        buffer, which is cached along with the summaries of the array (see
+        :any:`Field._pfp__summary`) and so is rebuilt only after an element
+        has been written.
+        """
+        if self.raw_data is not None:
+            return self.raw_data
+
+        cache = self._pfp__summary_cache
+        if cache is None:
+            cache = self._pfp__summary_cache = {}
+        res = cache.get("str")
+        if res is None:
+            data = bytes(
+                bytearray(PYVAL(item) & 0xFF for item in self.items)
+            )
+            null_idx = data.find(b"\x00")
+            res = cache["str"] = data if null_idx == -1 else data[:null_idx]
+        return res
+
     def _array_to_str(self, max_len=-1):
         if not self.is_stringable():
             return None
@@ -2158,17 +3060,9 @@ class Array(Field):
                 return PYSTR(self.raw_data)[:max_len]
             return self.raw_data
 
-        res = ""
-        for item in self.items:
-            if max_len != -1 and len(res) >= max_len:
-                break
-
-            # null-terminate string
-            if PYVAL(item) == 0:
-                break
-
-            # TODO WChar
-            res += chr(PYVAL(item))
+        res = utils.string(self._array_to_bytes())
+        if max_len != -1:
+            return res[:max_len]
         return res
 
     def __eq__(self, other):
@@ -2182,6 +3076,7 @@ class Array(Field):
         return not self.__eq__(other)
 
     def _pfp__set_value(self, value):
+        self._pfp__record_undo()
         is_string_type = False
 
         if isinstance(value, String):
@@ -2195,8 +3090,9 @@ class Array(Field):
                     break
 
         if is_string_type and self.is_stringable():
-            self.raw_data = value
+            self.raw_data = utils.binary(value)
             self.width = len(value)
+            self._pfp__invalidate_leaves()
             return self._pfp__notify_parent()
 
         if value.__class__ not in [list, tuple]:
@@ -2220,6 +3116,7 @@ class Array(Field):
             if not isinstance(item, Field):
                 new_item = self.field_cls()
                 new_item._pfp__set_value(item)
+                new_item._pfp__parent = self
                 item = new_item
             self.items[idx] = item
 
@@ -2228,6 +3125,7 @@ class Array(Field):
         # see #54 - make sure raw_data is set to None if overwriting with
         # a new array/list/set/tuple
         self.raw_data = None
+        self._pfp__invalidate_leaves()
 
         return self._pfp__notify_parent()
 
@@ -2239,6 +3137,9 @@ class Array(Field):
         if self.width is None:
             return
 
+        self._pfp__invalidate_leaves()
+        self._pfp__invalidate_summary()
+
         # will always be known widths for these field types
         if issubclass(self.field_cls, NumberBase):
             length = self.field_cls.width * PYVAL(self.width)
@@ -2253,6 +3154,9 @@ class Array(Field):
             for x in six.moves.range(PYVAL(self.width)):
                 field = self.field_cls(stream)
                 field._pfp__name = "{}[{}]".format(self._pfp__name, x)
+                # changes to the items must reach the watchers of the array
+                # (see Field._pfp__invalidate_summary)
+                field._pfp__parent = self
                 # field._pfp__parse(stream, save_offset)
                 self.items.append(field)
 
@@ -2282,57 +3186,118 @@ class Array(Field):
                 return len(self.raw_data)
         return res
 
+    def _pfp__build_into(self, buf, offset, save_offset=False):
+        if save_offset:
+            self._pfp__offset = offset
+
+        raw = self._pfp__raw_view()
+        if raw is not None:
+            end = offset + len(raw)
+            buf[offset:end] = raw
+            return end
+
+        for item in self.items:
+            offset = item._pfp__build_into(buf, offset, save_offset)
+        return offset
+
+    def _pfp__rebuild_changed_into(self, buf, offset, full, save_offset):
+        if self._pfp__raw_view() is not None:
+            return self._pfp__build_into(buf, offset, save_offset)
+        return self._pfp__rebuild_children_into(
+            self.items, buf, offset, full, save_offset
+        )
+
+    def _pfp__compute_has_bitfields(self):
+        if self._pfp__raw_view() is not None:
+            return False
+        for item in self.items:
+            if item._pfp__has_bitfields():
+                return True
+        return False
+
     def _pfp__handle_updated(self, watched_field):
         if (
-            self.raw_data is not None
+            self._pfp__raw_view() is not None
             and watched_field._pfp__name is not None
             and watched_field._pfp__name.startswith(self._pfp__name)
             and watched_field._pfp__array_idx is not None
         ):
-            data = watched_field._pfp__build()
             offset = watched_field.width * watched_field._pfp__array_idx
-            self.raw_data = (
-                self.raw_data[0:offset]
-                + data
-                + self.raw_data[offset + len(data) :]
-            )
+            self._pfp__record_undo()
+            if watched_field.__class__ is self.field_cls:
+                self._pfp__write_raw(offset, value=watched_field._pfp__value)
+            else:
+                self._pfp__write_raw(offset, data=watched_field._pfp__build())
+            self._pfp__invalidate_summary()
         else:
             super(Array, self)._pfp__handle_updated(watched_field)
 
+    def _pfp__set_raw_range(self, offset, data):
+        """Replace the raw bytes of the array at byte ``offset`` with
+        ``data`` as a single update. The array must have raw data (see
+        :any:`Array.raw_data`) and ``data`` must fit within it.
+        """
+        end = offset + len(data)
+        if offset < 0 or end > len(self._pfp__raw_view()):
+            raise IndexError(end)
+
+        self._pfp__record_undo()
+        self._pfp__write_raw(offset, data=data)
+        self._pfp__invalidate_summary()
+        self._pfp__notify_update(self)
+
+    def _pfp__raw_view(self):
+        """Return the raw data without copying it: the in-place buffer if
+        an element has been written, else the ``bytes``, or ``None``
+        """
+        buf = self._pfp__raw_buffer
+        if buf is not None:
+            return buf
+        return self._pfp__raw_bytes
+
     def __getitem__(self, idx):
-        if self.raw_data is None:
+        raw = self._pfp__raw_view()
+        if raw is None:
             return self.items[idx]
-        else:
-            if self.width < 0 or idx + 1 > self.width:
-                raise IndexError(idx)
-            width = self.field_cls.width
-            offset = width * idx
-            data = self.raw_data[offset : offset + width]
-
-            stream = bitwrap.BitwrappedStream(six.BytesIO(data))
-            res = self.field_cls(stream)
+
+        field_cls = self.field_cls
+        width = field_cls.width
+        count = len(raw) // width
+        if idx < 0:
+            idx += count
+        if idx < 0 or idx >= count:
+            raise IndexError(idx)
+
+        # the same field is returned for each index, its value is
+        # refreshed from the raw data
+        res = self._pfp__views.get(idx)
+        if res is None:
+            res = field_cls()
             res._pfp__watch(self)
             res._pfp__parent = self
             res._pfp__array_idx = idx
             res._pfp__name = "{}[{}]".format(self._pfp__name, idx)
-            return res
+            self._pfp__views[idx] = res
+
+        res._pfp__value = get_struct(
+            field_cls.endian, field_cls.format
+        ).unpack_from(raw, width * idx)[0]
+        return res
 
     def __setitem__(self, idx, value):
-        if isinstance(value, Field):
-            if self.raw_data is None:
-                self.items[idx] = value
-            else:
-                if self.width < 0 or idx + 1 > self.width:
-                    raise IndexError(idx)
-                data = value._pfp__build()
-                offset = self.field_cls.width * idx
-                self.raw_data = (
-                    self.raw_data[0:offset]
-                    + data
-                    + self.raw_data[offset + self.field_cls.width :]
-                )
+        if isinstance(value, Field) and self._pfp__raw_view() is None:
+            self._pfp__record_undo()
+            self.items[idx] = value
+            self._pfp__invalidate_leaves()
+            self._pfp__invalidate_summary()
         else:
-            self[idx]._pfp__set_value(value)
+            # values written to arrays with raw data are converted to the
+            # item type and packed in place (see _pfp__handle_updated)
+            item = self[idx]
+            item._pfp__set_value(value)
+            # the item may not know that it belongs to this array
+            if item._pfp__parent is not self:
+                self._pfp__invalidate_summary()
 
         self._pfp__notify_update(self)
 
@@ -2374,8 +3339,9 @@ class Array(Field):
         return "\n".join(res)
 
     def __len__(self):
-        if self.raw_data is not None:
-            return int(len(self.raw_data) / self.field_cls.width)
+        raw = self._pfp__raw_view()
+        if raw is not None:
+            return int(len(raw) / self.field_cls.width)
         else:
             return len(self.items)
 
@@ -2408,7 +3374,14 @@ class String(Field):
         """Set the value of the String, taking into account
         escaping and such as well
         """
-        if not isinstance(new_val, Field):
+        if isinstance(new_val, Array) and new_val.is_stringable():
+            # a char array ends at its null terminator when it is used as a
+            # string, also if its data was read in one piece (e.g. ReadBytes)
+            data = new_val._array_to_str()
+            if not isinstance(data, (bytes, bytearray)):
+                data = utils.binary(data)
+            new_val = bytes(data).split(b"\x00", 1)[0]
+        elif not isinstance(new_val, Field):
             new_val = utils.binary(new_val)
         return super(String, self)._pfp__set_value(new_val)
 
@@ -2422,6 +3395,9 @@ class String(Field):
         if save_offset:
             self._pfp__offset = stream.tell()
 
+        if self._pfp__parse_peeked(stream):
+            return
+
         res = utils.binary("")
         while True:
             byte = utils.binary(stream.read(self.read_size))
@@ -2434,6 +3410,46 @@ class String(Field):
             res += byte
         self._pfp__value = res
 
+    def _pfp__parse_peeked(self, stream):
+        """Find the terminator in the read-ahead window of the stream (see
+        :any:`pfp.bitwrap.BitwrappedStream.peek`) instead of reading one
+        character at a time.
+
+        :returns: False if the stream can't be peeked into
+        """
+        if (
+            getattr(stream, "peek", None) is None
+            or not stream.padded
+            or len(stream._bits) > 0
+        ):
+            return False
+
+        start = stream.tell()
+        chunk_size = stream.READ_AHEAD_SIZE
+        data = b""
+        search_start = 0
+        while True:
+            chunk = stream.peek(start + len(data), chunk_size)
+            data += chunk
+
+            idx = data.find(self.terminator, search_start)
+            while idx != -1 and idx % self.read_size != 0:
+                idx = data.find(self.terminator, idx + 1)
+            if idx != -1:
+                break
+
+            if len(chunk) < chunk_size:
+                # consume what is left, the same as a byte-by-byte parse
+                stream.read(len(data))
+                raise errors.PrematureEOF()
+
+            # the terminator may straddle the chunks
+            search_start = len(data) - len(data) % self.read_size
+
+        stream.read(idx + self.read_size)
+        self._pfp__value = data[:idx]
+        return True
+
     def _pfp__build(self, stream=None, save_offset=False):
         """Build the String field
 
@@ -2451,6 +3467,17 @@ class String(Field):
             stream.write(data)
             return len(data)
 
+    def _pfp__build_into(self, buf, offset, save_offset=False):
+        if save_offset:
+            self._pfp__offset = offset
+        end = offset + len(self._pfp__value)
+        buf[offset:end] = self._pfp__value
+        buf[end : end + 1] = b"\x00"
+        return end + 1
+
+    def _pfp__compute_width(self):
+        return len(self._pfp__value) + 1
+
     def __getitem__(self, idx):
         if idx < 0 or idx + 1 > len(self._pfp__value):
             raise IndexError(idx)
@@ -2469,9 +3496,11 @@ class String(Field):
         elif isinstance(val, int):
             val = utils.binary(chr(val))
 
+        self._pfp__record_undo()
         self._pfp__value = (
             self._pfp__value[0:idx] + val + self._pfp__value[idx + 1 :]
         )
+        self._pfp__invalidate_summary()
 
     def __add__(self, other):
         """Add two strings together. If other is not a String instance,
@@ -2497,10 +3526,12 @@ class String(Field):
         :returns: TODO
 
         """
+        self._pfp__record_undo()
         if isinstance(other, String):
             self._pfp__value += other._pfp__value
         else:
             self._pfp__value += utils.binary(PYSTR(other))
+        self._pfp__invalidate_summary()
         return self
 
     def __len__(self):
@@ -2513,6 +3544,10 @@ class WString(String):
     read_size = 2
     terminator = utils.binary("\x00\x00")
 
+    # the value is re-encoded when built
+    _pfp__build_into = Field._pfp__build_into
+    _pfp__compute_width = Field._pfp__compute_width
+
     def _pfp__parse(self, stream, save_offset=False):
         String._pfp__parse(self, stream, save_offset)
         self._pfp__value = utils.binary(self._pfp__value.decode("utf-16le"))
@@ -22,6 +22,7 @@ class Function(BaseFunction):
 
         self.name = None
         self.body = None
+        self.return_type = return_type
 
         # note that the _scope is determined by where the function is
         # declared, not where it is called from
@@ -56,14 +57,116 @@ class Function(BaseFunction):
         finally:
             self._scope.pop()
 
+        # char arrays returned as strings end at their null terminator
+        if (
+            isinstance(ret_val, pfp.fields.Array)
+            and ret_val.is_stringable()
+            and isinstance(self.return_type, type)
+            and issubclass(self.return_type, pfp.fields.String)
+        ):
+            res = self.return_type()
+            res._pfp__set_value(ret_val)
+            ret_val = res
+
         return ret_val
 
 
+def _to_int(field):
+    return pfp.fields.get_value(field)
+
+
+def _to_str(field):
+    return pfp.fields.get_str(field)
+
+
+def _to_float(field):
+    return float(pfp.fields.get_value(field))
+
+
+def _to_bytes(field):
+    return pfp.fields.get_bytes(field)
+
+
+def _to_field(field):
+    return field
+
+
+NATIVE_ARG_TYPES = {
+    int: _to_int,
+    float: _to_float,
+    str: _to_str,
+    bytes: _to_bytes,
+    None: _to_field,
+}
+"""Maps the types that may be used in the ``params`` of a native function
+(see :any:`pfp.native.native`) to the function that converts an argument
+to that type. ``None`` passes the argument (usually a field) through
+unchanged."""
+
+
+def compile_native_params(name, params):
+    """Return a function ``adapt(args, coord)`` that checks the number of
+    arguments passed to the native function ``name`` and converts them to
+    the Python types given in ``params``. Each item of ``params`` is either a
+    type from :any:`NATIVE_ARG_TYPES` (a required param) or a tuple of
+    ``(type, default)`` (an optional param).
+
+    The adapter is generated as Python source with one branch for each
+    valid number of arguments, so that a call does no more than one
+    conversion per argument.
+    """
+    namespace = {"errors": errors}
+    min_args = None
+    for idx, param in enumerate(params):
+        if isinstance(param, tuple):
+            param_type, default = param
+            namespace["d{}".format(idx)] = default
+            if min_args is None:
+                min_args = idx
+        else:
+            if min_args is not None:
+                raise ValueError(
+                    "Required params of native {!r} must come before optional params".format(
+                        name
+                    )
+                )
+            param_type = param
+        if param_type not in NATIVE_ARG_TYPES:
+            raise ValueError(
+                "Unsupported param type {!r} for native {!r}".format(
+                    param_type, name
+                )
+            )
+        namespace["c{}".format(idx)] = NATIVE_ARG_TYPES[param_type]
+
+    max_args = len(params)
+    if min_args is None:
+        min_args = max_args
+    if min_args == max_args:
+        namespace["expected"] = "{} args".format(max_args)
+    else:
+        namespace["expected"] = "{} to {} args".format(min_args, max_args)
+
+    lines = ["def adapt(args, coord):", "    num_args = len(args)"]
+    for num_args in six.moves.range(max_args, min_args - 1, -1):
+        values = ["c{0}(args[{0}])".format(x) for x in six.moves.range(num_args)]
+        values += ["d{}".format(x) for x in six.moves.range(num_args, max_args)]
+        lines.append("    if num_args == {}:".format(num_args))
+        lines.append("        return [{}]".format(", ".join(values)))
+    lines.append(
+        '    raise errors.InvalidArguments(coord, "{} args".format(num_args), expected)'
+    )
+
+    six.exec_("\n".join(lines), namespace)
+    return namespace["adapt"]
+
+
 class NativeFunction(BaseFunction):
     """A class for native functions"""
 
-    def __init__(self, name, func, ret, send_interp=False):
+    def __init__(self, name, func, ret, send_interp=False, params=None):
         """
+        :param params: The types of the params of the function, see :any:`compile_native_params`. If ``None``, the function is passed the argument fields as-is.
         """
         super(NativeFunction, self).__init__()
         self._pfp__name = name
@@ -71,27 +174,78 @@ class NativeFunction(BaseFunction):
         self.func = func
         self.ret = ret
         self.send_interp = send_interp
+        self.params = params
+
+        # argument conversion and return value wrapping are decided once,
+        # not on every call
+        self._adapt_args = None
+        if params is not None:
+            self._adapt_args = compile_native_params(name, params)
+        self._wrap_ret = self._compile_ret(ret, params is not None)
+
+    def _compile_ret(self, ret, typed):
+        """Return a function ``wrap(res, scope)`` that converts the return
+        value of the native function into a field of type ``ret``. Natives
+        with typed params are never passed fields they don't own (unless a
+        param's type is ``None``), so a result that already is a new ``ret``
+        field is returned as-is instead of being copied.
+        """
+
+        def wrap_value(res, scope):
+            res_field = ret()
+            res_field._pfp__set_value(res)
+            return res_field
+
+        if ret is pfp.fields.Array:
+
+            def wrap_array(res, scope):
+                if utils.is_str(res):
+                    tmp_stream = bitwrap.BitwrappedStream(six.BytesIO(res))
+                    return pfp.fields.Array(len(res), pfp.fields.Char, tmp_stream)
+                return wrap_value(res, scope)
+
+            return wrap_array
+
+        if utils.is_str(ret):
+
+            def wrap_type_name(res, scope):
+                # TODO should we do any type-checking here to make sure that the
+                # return value matches what is declared as the return type?
+                if scope.get_type(ret) is not None:
+                    return res
+                return wrap_value(res, scope)
+
+            return wrap_type_name
+
+        if typed and None not in self._param_types():
+
+            def wrap_owned_value(res, scope):
+                if res.__class__ is ret:
+                    return res
+                return wrap_value(res, scope)
+
+            return wrap_owned_value
+
+        return wrap_value
+
+    def _param_types(self):
+        return [
+            param[0] if isinstance(param, tuple) else param
+            for param in self.params
+        ]
 
     def call(self, args, ctxt, scope, stream, interp, coord, no_cast=False):
+        if self._adapt_args is not None:
+            args = self._adapt_args(args, coord)
+
         if self.send_interp:
             res = self.func(args, ctxt, scope, stream, coord, interp)
         else:
             res = self.func(args, ctxt, scope, stream, coord)
 
         if no_cast:
-            res_field = res
-        elif utils.is_str(res) and self.ret == pfp.fields.Array:
-            tmp_stream = bitwrap.BitwrappedStream(six.BytesIO(res))
-            res_field = pfp.fields.Array(len(res), pfp.fields.Char, tmp_stream)
-        elif utils.is_str(self.ret) and scope.get_type(self.ret) is not None:
-            # TODO should we do any type-checking here to make sure that the
-            # return value matches what is declared as the return type?
-            res_field = res
-        else:
-            res_field = self.ret()
-            res_field._pfp__set_value(res)
-
-        return res_field
+            return res
+        return self._wrap_ret(res, scope)
 
 
 class ParamClsWrapper(object):
@@ -8,19 +8,21 @@ when defining mutation strategies for pfp
 
 
 import contextlib
-import glob
-import os
 import six
 
 
-from pfp.fields import BitfieldRW, NumberBase
+from pfp.fields import BitfieldRW, NumberBase, UndoLog
 from pfp.bitwrap import BitwrappedStream
 from pfp.utils import timeit
+from pfp.fuzz import strats
+from pfp.fuzz.strats import StratGroup, FieldStrat
 
 
-get_strategy = None
-StratGroup = None
-FieldStrat = None
+STRATEGY_MODULES = ("basic", "feedback", "rand", "seeds")
+"""The modules in this package that are loaded by :any:`init`, which
+register the built-in strategies"""
+
+_initialized = False
 
 
 class Changer(object):
@@ -123,27 +125,84 @@ class Changer(object):
 
 
 def init():
-    global get_strategy
-    global StratGroup
-    global FieldStrat
-    import pfp.fuzz.strats
-
-    get_strategy = pfp.fuzz.strats.get_strategy
-    StratGroup = pfp.fuzz.strats.StratGroup
-    FieldStrat = pfp.fuzz.strats.FieldStrat
-
-    # load all of the built-in strategies
-    for strat_file in glob.glob(
-        os.path.join(os.path.dirname(__file__), "*.py")
-    ):
-        filename = os.path.basename(strat_file)
-        if filename in ["__init__.py", "base.py"]:
-            continue
-        mod_name = filename.replace(".py", "").replace(".pyc", "")
+    """Load the built-in strategies. This is done on first use (e.g. by
+    :any:`mutate`) instead of when pfp is imported.
+    """
+    global _initialized
+    if _initialized:
+        return
+
+    for mod_name in STRATEGY_MODULES:
         __import__("pfp.fuzz." + mod_name)
+    _initialized = True
+
+
+def get_strategy(name_or_cls):
+    """Return the strategy identified by its name, see
+    :any:`pfp.fuzz.strats.get_strategy`
+    """
+    init()
+    return strats.get_strategy(name_or_cls)
+
 
+def _mutation_range(num, start=None, stop=None):
+    """Yield the index of each mutation to perform. If neither ``start`` nor
+    ``stop`` is set, ``num`` mutations are drawn in sequence from the
+    shared random number generator.
+
+    Otherwise the generator runs in counter mode: it is reseeded before
+    each mutation with a seed derived from ``(rand.SEED, idx)`` (see
+    :any:`pfp.fuzz.rand.seed_index`), making mutation ``idx`` independent of
+    every mutation before it. Workers can split a range of indices without
+    coordinating, and a single mutation can be replayed from its index alone.
+    """
+    import pfp.fuzz.rand as rand
+
+    if start is None and stop is None:
+        for idx in six.moves.range(num):
+            yield idx
+        return
+
+    if start is None:
+        start = 0
+    if stop is None:
+        stop = start + num
+
+    for idx in six.moves.range(start, stop):
+        rand.seed_index(idx)
+        yield idx
+
+
+def _choose_fields(with_strats, at_once, scheduler=None):
+    """Return the indices into ``with_strats`` of the fields to mutate next,
+    modifying ``at_once`` number of fields OR ``len(with_strats)`` number of
+    fields, whichever is lower. The same idx is never picked twice.
+
+    Fields are chosen uniformly at random unless a
+    :any:`pfp.fuzz.feedback.FeedbackScheduler` is provided.
+    """
+    import pfp.fuzz.rand as rand
 
-def changeset_mutate(field, strat_name_or_cls, num=100, at_once=1, yield_changed=False, fields_to_modify=None, base_data=None):
+    if scheduler is not None:
+        return scheduler.choose(with_strats, at_once)
+
+    return rand.sample(
+        six.moves.range(len(with_strats)), min(len(with_strats), at_once),
+    )
+
+
+def _init_scheduler(feedback, scheduler):
+    """Return the scheduler to use, creating a default one if only a
+    ``feedback`` callback was provided.
+    """
+    if scheduler is None and feedback is not None:
+        import pfp.fuzz.feedback
+
+        scheduler = pfp.fuzz.feedback.FeedbackScheduler()
+    return scheduler
+
+
+def changeset_mutate(field, strat_name_or_cls, num=100, at_once=1, yield_changed=False, fields_to_modify=None, base_data=None, start=None, stop=None, feedback=None, scheduler=None):
     """Mutate the provided field (probably a Dom or struct instance) using the
     strategy specified with ``strat_name_or_class``, yielding ``num`` mutations
     that affect up to ``at_once`` fields at once.
@@ -161,12 +220,17 @@ def changeset_mutate(field, strat_name_or_cls, num=100, at_once=1, yield_changed
     :param bool use_changesets: If a performance optimization should be used that builds the full
        output once, and then replaced only the changed fields, including watchers, etc. **NOTE**
        this does not yet work fully with packed structures (https://pfp.readthedocs.io/en/latest/metadata.html#packer-metadata)
+    :param int start: The index of the first mutation (enables counter mode, see :any:`_mutation_range`)
+    :param int stop: The index after the last mutation (defaults to ``start + num``)
+    :param function feedback: Called with the modified data after each mutation is yielded. Its
+       result (a score, coverage bitmap or set of edges) is reported to the ``scheduler``
+    :param pfp.fuzz.feedback.FeedbackScheduler scheduler: Biases field selection toward fields
+       that earned rewards. A default one is created if only ``feedback`` is provided
     :returns: generator
     """
-    import pfp.fuzz.rand as rand
-
     init()
 
+    scheduler = _init_scheduler(feedback, scheduler)
     strat = get_strategy(strat_name_or_cls)
 
     if fields_to_modify is not None:
@@ -189,40 +253,43 @@ def changeset_mutate(field, strat_name_or_cls, num=100, at_once=1, yield_changed
     else:
         changer = Changer(field._pfp__build())
 
+    # only the fields that are changed (including watchers) are saved
+    # and restored
+    undo = UndoLog()
+
     count = 0
-    for x in six.moves.range(num):
+    for x in _mutation_range(num, start, stop):
         try:
-            idx_pool = set([x for x in six.moves.xrange(len(with_strats))])
             modified_fields = []
 
-            # modify `at_once` number of fields OR len(with_strats) number of fields,
-            # whichever is lower
             count = 0
-            for at_onces in six.moves.xrange(min(len(with_strats), at_once)):
-                count += 1
-                # we'll never pull the same idx from idx_pool more than once
-                # since we're removing the idx after choosing it
-                rand_idx = rand.sample(idx_pool, 1)[0]
-                idx_pool.remove(rand_idx)
-
-                rand_field, field_strat = with_strats[rand_idx]
+            rand_idxs = _choose_fields(with_strats, at_once, scheduler)
+            with undo.recording():
+                for rand_idx in rand_idxs:
+                    count += 1
+                    rand_field, field_strat = with_strats[rand_idx]
 
-                rand_field._pfp__snapshot()
-                mutated_fields = field_strat.mutate(rand_field)
-                modified_fields.append(rand_field)
-                modified_fields += mutated_fields
+                    mutated_fields = field_strat.mutate(rand_field)
+                    modified_fields.append(rand_field)
+                    modified_fields += mutated_fields
 
             with changer.change(modified_fields) as modified_data:
                 if yield_changed:
                     yield modified_data, modified_fields
                 else:
                     yield modified_data
+
+                if feedback is not None:
+                    scheduler.report(
+                        [with_strats[idx] for idx in rand_idxs],
+                        feedback(modified_data),
+                        data=modified_data,
+                    )
         finally:
-            for rand_field in modified_fields:
-                rand_field._pfp__restore_snapshot()
+            undo.rollback()
 
 
-def mutate(field, strat_name_or_cls, num=100, at_once=1, yield_changed=False):
+def mutate(field, strat_name_or_cls, num=100, at_once=1, yield_changed=False, start=None, stop=None, feedback=None, scheduler=None):
     """Mutate the provided field (probably a Dom or struct instance) using the
     strategy specified with ``strat_name_or_class``, yielding ``num`` mutations
     that affect up to ``at_once`` fields at once.
@@ -235,12 +302,17 @@ def mutate(field, strat_name_or_cls, num=100, at_once=1, yield_changed=False):
     :param int num: The number of mutations to yield
     :param int at_once: The number of fields to mutate at once
     :param bool yield_changed: Yield a list of fields changed along with the mutated dom
+    :param int start: The index of the first mutation (enables counter mode, see :any:`_mutation_range`)
+    :param int stop: The index after the last mutation (defaults to ``start + num``)
+    :param function feedback: Called with the mutated field after each mutation is yielded. Its
+       result (a score, coverage bitmap or set of edges) is reported to the ``scheduler``
+    :param pfp.fuzz.feedback.FeedbackScheduler scheduler: Biases field selection toward fields
+       that earned rewards. A default one is created if only ``feedback`` is provided
     :returns: generator
     """
-    import pfp.fuzz.rand as rand
-
     init()
 
+    scheduler = _init_scheduler(feedback, scheduler)
     strat = get_strategy(strat_name_or_cls)
     to_mutate = strat.which(field)
 
@@ -253,35 +325,35 @@ def mutate(field, strat_name_or_cls, num=100, at_once=1, yield_changed=False):
     # we don't need these ones anymore
     del to_mutate
 
-    count = 0
-    for x in six.moves.range(num):
-        # save the current value of all subfields without
-        # triggering events
-        field._pfp__snapshot(recurse=True)
+    # record the previous values of all fields that are changed by
+    # a mutation (see UndoLog)
+    undo = UndoLog()
 
+    count = 0
+    for x in _mutation_range(num, start, stop):
         try:
             chosen_fields = set()
-            idx_pool = set([x for x in six.moves.xrange(len(with_strats))])
 
-            # modify `at_once` number of fields OR len(with_strats) number of fields,
-            # whichever is lower
-            for at_onces in six.moves.xrange(min(len(with_strats), at_once)):
-                # we'll never pull the same idx from idx_pool more than once
-                # since we're removing the idx after choosing it
-                rand_idx = rand.sample(idx_pool, 1)[0]
-                idx_pool.remove(rand_idx)
+            rand_idxs = _choose_fields(with_strats, at_once, scheduler)
+            with undo.recording():
+                for rand_idx in rand_idxs:
+                    rand_field, field_strat = with_strats[rand_idx]
+                    chosen_fields.add(rand_field)
 
-                rand_field, field_strat = with_strats[rand_idx]
-                chosen_fields.add(rand_field)
-
-                field_strat.mutate(rand_field)
+                    field_strat.mutate(rand_field)
 
             if yield_changed:
                 yield field, chosen_fields
             else:
                 # yield back the original field
                 yield field
+
+            if feedback is not None:
+                scheduler.report(
+                    [with_strats[idx] for idx in rand_idxs],
+                    feedback(field),
+                    data=field,
+                )
         finally:
-            # restore the saved value of all subfields without
-            # triggering events
-            field._pfp__restore_snapshot(recurse=True)
+            # restore the saved values without triggering events
+            undo.rollback()
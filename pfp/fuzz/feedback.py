@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains a feedback-driven scheduler that can be used with
+:any:`pfp.fuzz.mutate` and :any:`pfp.fuzz.changeset_mutate` to bias which
+fields are mutated towards the fields (and field strategies) that have
+produced new behavior in a target.
+"""
+
+
+import binascii
+import bisect
+import hashlib
+import json
+import os
+import six
+
+
+import pfp.fuzz.rand as rand
+import pfp.utils as utils
+
+
+# maps every non-zero byte to 1 so that coverage bitmaps can be compared
+# as big integers
+_HIT_TABLE = utils.binary("\x00" + "\x01" * 0xff)
+
+
+class FeedbackScheduler(object):
+    """Chooses fields to mutate based on how productive they have been.
+
+    Every (field, field strategy) pair that is mutated is credited with the
+    reward of the resulting input. Rewards come from a feedback callback that
+    returns either:
+
+    * a number - a score for the input (higher is better)
+    * a ``set`` of edge/block ids (ints or strings) - the reward is the number of ids never seen before
+    * a coverage bitmap (``bytes``/``bytearray``) - the reward is the number of
+      map entries that were hit for the first time (AFL-style virgin map)
+    * ``None`` - no reward
+
+    The energy of a field is ``(reward + 1) / (trials + 1)``, with a lower bound
+    of ``min_energy`` so that unproductive fields are still occasionally chosen.
+    Field strategies have their own energy, and the chance of a field being
+    chosen is proportional to the product of the two.
+
+    Fields are keyed by their full path (see :any:`pfp.fields.Field._pfp__path`)
+    so that statistics remain valid when the seed is re-parsed in a later
+    campaign.
+    """
+
+    def __init__(self, min_energy=0.05, corpus_dir=None):
+        """
+        :param float min_energy: The lowest energy a field or field strategy can reach
+        :param str corpus_dir: If set, inputs that earned a reward will be saved into this directory
+        """
+        self.min_energy = min_energy
+        self.corpus_dir = corpus_dir
+
+        # key -> [trials, total reward]
+        self.field_stats = {}
+        self.strat_stats = {}
+
+        # index of saved inputs: sha1 -> [reward, [field paths]]
+        self.corpus = {}
+
+        self._seen_edges = set()
+        self._seen_bitmap = 0
+
+        self._with_strats = None
+        self._keys = None
+        self._cumulative = None
+
+    # --------------------
+    # choosing fields
+    # --------------------
+
+    def energy(self, stats, key):
+        """Return the energy of ``key`` in the ``stats`` dict
+        """
+        trials, reward = stats.get(key, (0, 0))
+        return max(self.min_energy, (reward + 1.0) / (trials + 1.0))
+
+    def choose(self, with_strats, count):
+        """Return ``count`` distinct indices into ``with_strats`` (a list of
+        ``(field, field_strat)`` tuples), chosen with a probability proportional
+        to their energy.
+        """
+        count = min(count, len(with_strats))
+        if count == 0:
+            return []
+
+        # computing the field paths is not free, only do it once for
+        # each list of fields
+        if with_strats is not self._with_strats:
+            self._with_strats = with_strats
+            self._keys = [
+                self._keys_for(field, strat) for field, strat in with_strats
+            ]
+            self._cumulative = None
+        if self._cumulative is None:
+            self._cumulative = self._build_cumulative(self._keys)
+
+        cumulative = self._cumulative
+        total = cumulative[-1]
+
+        res = []
+        chosen = set()
+        while len(res) < count:
+            idx = bisect.bisect_right(cumulative, rand.random() * total)
+            idx = min(idx, len(cumulative) - 1)
+            if idx in chosen:
+                # fall back to uniformly picking among the remaining
+                # indices if the weights are heavily skewed
+                if len(chosen) * 2 >= len(cumulative):
+                    remaining = [
+                        x for x in six.moves.range(len(cumulative))
+                        if x not in chosen
+                    ]
+                    res += rand.sample(remaining, count - len(res))
+                    break
+                continue
+            chosen.add(idx)
+            res.append(idx)
+
+        return res
+
+    def _keys_for(self, field, strat):
+        return (field._pfp__path(), strat.__class__.__name__)
+
+    def _build_cumulative(self, keys):
+        res = []
+        total = 0.0
+        for field_key, strat_key in keys:
+            total += self.energy(self.field_stats, field_key) * self.energy(
+                self.strat_stats, strat_key
+            )
+            res.append(total)
+        return res
+
+    # --------------------
+    # feedback
+    # --------------------
+
+    def reward(self, result):
+        """Convert the result of a feedback callback into a numeric reward,
+        updating the set of seen coverage.
+        """
+        if result is None:
+            return 0
+
+        if isinstance(result, (bytes, bytearray)):
+            hits = bytes(result).translate(_HIT_TABLE)
+            hits = int(binascii.hexlify(hits) or b"0", 16)
+            new = hits & ~self._seen_bitmap
+            self._seen_bitmap |= hits
+            return bin(new).count("1")
+
+        if isinstance(result, (set, frozenset, list, tuple)):
+            new = set(result) - self._seen_edges
+            self._seen_edges.update(new)
+            return len(new)
+
+        return max(0, result)
+
+    def report(self, mutated, result, data=None):
+        """Credit the fields and field strategies that were mutated with the
+        reward of ``result``.
+
+        :param list mutated: A list of ``(field, field_strat)`` tuples that were mutated
+        :param result: The value returned by the feedback callback (see :any:`FeedbackScheduler`)
+        :param data: The mutated input (``bytes``) or a field that can be built. Saved to the corpus if it earned a reward
+        :returns: The reward
+        """
+        reward = self.reward(result)
+
+        for field, strat in mutated:
+            field_key, strat_key = self._keys_for(field, strat)
+            for stats, key in (
+                (self.field_stats, field_key),
+                (self.strat_stats, strat_key),
+            ):
+                entry = stats.setdefault(key, [0, 0])
+                entry[0] += 1
+                entry[1] += reward
+
+        # energies changed, the weights need to be recomputed
+        self._cumulative = None
+
+        if reward > 0 and data is not None:
+            self.add_to_corpus(data, reward, [x[0]._pfp__path() for x in mutated])
+
+        return reward
+
+    # --------------------
+    # corpus index
+    # --------------------
+
+    def add_to_corpus(self, data, reward, field_paths):
+        """Record the input in the corpus index, saving it to
+        ``corpus_dir`` if it is set.
+        """
+        if hasattr(data, "_pfp__build"):
+            data = data._pfp__build()
+        data = utils.binary(bytes(data))
+
+        digest = hashlib.sha1(data).hexdigest()
+        self.corpus[digest] = [reward, field_paths]
+
+        if self.corpus_dir is not None:
+            if not os.path.exists(self.corpus_dir):
+                os.makedirs(self.corpus_dir)
+            with open(os.path.join(self.corpus_dir, digest), "wb") as f:
+                f.write(data)
+
+        return digest
+
+    def save(self, path):
+        """Save the field/strategy statistics and the corpus index to ``path``
+        as compact JSON.
+        """
+        info = {
+            "fields": self.field_stats,
+            "strats": self.strat_stats,
+            "corpus": self.corpus,
+            "edges": list(self._seen_edges),
+            "bitmap": "{:x}".format(self._seen_bitmap),
+        }
+        with open(path, "w") as f:
+            json.dump(info, f, separators=(",", ":"), sort_keys=True)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Load a scheduler that was saved with :any:`FeedbackScheduler.save`.
+        ``kwargs`` are passed to the constructor.
+        """
+        with open(path, "r") as f:
+            info = json.load(f)
+
+        res = cls(**kwargs)
+        res.field_stats = info.get("fields", {})
+        res.strat_stats = info.get("strats", {})
+        res.corpus = info.get("corpus", {})
+        res._seen_edges = set(info.get("edges", []))
+        res._seen_bitmap = int(info.get("bitmap", "0"), 16)
+        return res
@@ -1,20 +1,52 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+import binascii
+import hashlib
 import random as r
 import six
 
+import pfp.utils as utils
+
 RANDOM = r.Random()
 _randint = RANDOM.randint
 random = _random = RANDOM.random
 choice = _choice = RANDOM.choice
 sample = _sample = RANDOM.sample
 
+SEED = 0
+"""The base seed used to derive per-mutation seeds in counter mode. See
+:any:`seed_index`."""
+
 
 def seed(val):
+    global SEED
+    SEED = val
     RANDOM.seed(val)
 
 
+def index_seed(base, idx):
+    """Return the seed for mutation number ``idx`` derived from the
+    ``base`` seed. The result only depends on ``(base, idx)``, so it is
+    stable across processes and machines.
+    """
+    digest = hashlib.sha256(utils.binary("{}:{}".format(base, idx))).digest()
+    return int(binascii.hexlify(digest[:8]), 16)
+
+
+def seed_index(idx, base=None):
+    """Reseed the random number generator for mutation number ``idx``
+    (counter mode). Mutation ``idx`` can then be reproduced without
+    replaying any of the mutations before it.
+
+    :param int idx: The index of the mutation
+    :param base: The base seed (defaults to the last value passed to :any:`seed`)
+    """
+    if base is None:
+        base = SEED
+    RANDOM.seed(index_seed(base, idx))
+
+
 def randint(a, b=None):
     if b is None:
         return _randint(0, a)
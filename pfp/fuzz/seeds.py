@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains a persistent index of parsed seed layouts. Parsing a
+seed with a template is the most expensive step of a fuzzing session; the
+index stores the layout of the mutable leaf fields of each (template, seed)
+pair so that later sessions can recreate those fields directly from the seed
+bytes, without interpreting the template again.
+"""
+
+
+import hashlib
+import json
+import os
+import six
+
+
+import pfp.bitwrap as bitwrap
+import pfp.fields as fields
+import pfp.functions as functions
+import pfp.utils as utils
+
+
+LAYOUT_VERSION = 1
+
+
+def _base_cls(field):
+    """Return the class from :any:`pfp.fields` that the field's class is
+    derived from. Typedefs create new classes at runtime which won't exist
+    in a later session.
+    """
+    if isinstance(field, fields.Enum) and field.enum_cls is not None:
+        return _base_cls(field.enum_cls)
+
+    cls = field if isinstance(field, type) else field.__class__
+    for base in cls.__mro__:
+        if getattr(fields, base.__name__, None) is base:
+            return base
+    return None
+
+
+def _hash(data):
+    return hashlib.sha1(utils.binary(data)).hexdigest()
+
+
+class SeedIndex(object):
+    """A persistent, on-disk index of seed layouts, keyed by the hash of the
+    template and the hash of the seed data.
+
+    For each leaf field (see :any:`pfp.fuzz.strats.StratGroup.which`) the
+    path, offset, width, class and endianness is stored, as well as the
+    edges between watchers and watched fields and any packed fields.
+
+    Layouts whose leaves can't be recreated on their own (bitfields, packed
+    fields, or watchers that use template-defined functions or watch non-leaf
+    fields) are still recorded, but are marked as not rehydratable and the
+    seed will always be fully parsed.
+
+    Example: ::
+
+        index = SeedIndex("/path/to/index")
+        for mutated in index.changeset_mutate(template, seed_data, "basic", num=1000):
+            run_target(mutated)
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+
+    # --------------------
+    # PUBLIC
+    # --------------------
+
+    def layout_path(self, template, data):
+        """Return the path of the layout file for the template and seed data
+        """
+        return os.path.join(self.index_dir, _hash(template), _hash(data) + ".json")
+
+    def get_layout(self, template, data):
+        """Return the stored layout for the template and seed, or ``None``
+        """
+        path = self.layout_path(template, data)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r") as f:
+            layout = json.load(f)
+
+        if layout.get("version") != LAYOUT_VERSION:
+            return None
+        return layout
+
+    def add(self, template, data, dom):
+        """Record the layout of the parsed ``dom``
+
+        :returns: The layout
+        """
+        import pfp.fuzz.strats
+
+        leaves = pfp.fuzz.strats.StratGroup().which(dom)
+        layout = self.build_layout(leaves)
+
+        path = self.layout_path(template, data)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            json.dump(layout, f, separators=(",", ":"))
+
+        return layout
+
+    def leaf_fields(self, template, data, **parse_kwargs):
+        """Return the leaf fields for the seed ``data``. The fields are
+        recreated from the stored layout if possible, otherwise the seed
+        is parsed with :any:`pfp.parse` (using ``parse_kwargs``) and its
+        layout is added to the index. Unless ``generate`` is passed in
+        ``parse_kwargs``, the seed is parsed without generating C++ code.
+
+        :returns: A tuple of (list of leaf fields, True if the index was used)
+        """
+        layout = self.get_layout(template, data)
+        if layout is not None and layout["rehydratable"]:
+            return self.rehydrate(layout, data), True
+
+        import pfp
+        import pfp.fuzz.strats
+
+        parse_kwargs.setdefault("generate", False)
+
+        dom = pfp.parse(data=six.BytesIO(data), template=template, **parse_kwargs)
+        if layout is None:
+            self.add(template, data, dom)
+
+        return pfp.fuzz.strats.StratGroup().which(dom), False
+
+    def changeset_mutate(self, template, data, strat_name_or_cls, **kwargs):
+        """Run :any:`pfp.fuzz.changeset_mutate` on the leaf fields of the seed,
+        starting from the index when possible. Strategy-specific filtering
+        (``filter_fields``) is still applied. ``parse_kwargs`` may be passed
+        as a keyword argument to control parsing on an index miss.
+        """
+        import pfp.fuzz
+
+        parse_kwargs = kwargs.pop("parse_kwargs", {})
+        leaves, _ = self.leaf_fields(template, data, **parse_kwargs)
+
+        pfp.fuzz.init()
+        strat = pfp.fuzz.get_strategy(strat_name_or_cls)
+
+        return pfp.fuzz.changeset_mutate(
+            None,
+            strat_name_or_cls,
+            fields_to_modify=strat.filter_fields(leaves),
+            base_data=data,
+            **kwargs
+        )
+
+    # --------------------
+    # LAYOUTS
+    # --------------------
+
+    def build_layout(self, leaves):
+        """Return a JSON-serializable description of the leaf fields
+        """
+        leaf_idxs = dict((id(leaf), idx) for idx, leaf in enumerate(leaves))
+        rehydratable = True
+        records = []
+        watches = []
+        packers = []
+
+        for idx, leaf in enumerate(leaves):
+            record = {
+                "path": leaf._pfp__path(),
+                "offset": leaf._pfp__offset,
+            }
+
+            if isinstance(leaf, fields.Array):
+                base_cls = _base_cls(leaf.field_cls)
+                record["cls"] = "Array"
+                record["item_cls"] = getattr(base_cls, "__name__", None)
+                record["count"] = len(leaf)
+                record["width"] = len(leaf._pfp__build())
+                if base_cls is None:
+                    rehydratable = False
+            else:
+                base_cls = _base_cls(leaf)
+                record["cls"] = getattr(base_cls, "__name__", None)
+                record["width"] = len(leaf._pfp__build())
+                if isinstance(leaf, fields.NumberBase):
+                    record["endian"] = leaf.endian
+                    if leaf.bitsize is not None:
+                        record["bitsize"] = leaf.bitsize
+                        rehydratable = False
+                if base_cls is None:
+                    rehydratable = False
+
+            if leaf._pfp__pack_type is not None:
+                packers.append(
+                    {
+                        "path": record["path"],
+                        "pack_type": leaf._pfp__pack_type.__name__,
+                    }
+                )
+                rehydratable = False
+
+            for watcher in leaf._pfp__watchers:
+                if id(watcher) not in leaf_idxs:
+                    rehydratable = False
+
+            if len(leaf._pfp__watch_fields) > 0:
+                update_func = leaf._pfp__update_func
+                watched = [leaf_idxs.get(id(x)) for x in leaf._pfp__watch_fields]
+                watches.append(
+                    {
+                        "watcher": idx,
+                        "watched": watched,
+                        "update": getattr(update_func, "name", None),
+                    }
+                )
+                if not isinstance(
+                    update_func, functions.NativeFunction
+                ) or None in watched:
+                    rehydratable = False
+
+            records.append(record)
+
+        return {
+            "version": LAYOUT_VERSION,
+            "rehydratable": rehydratable,
+            "leaves": records,
+            "watches": watches,
+            "packers": packers,
+        }
+
+    def rehydrate(self, layout, data):
+        """Recreate the leaf fields described by ``layout`` from the seed
+        ``data``, including watcher relationships.
+        """
+        import pfp.interp
+
+        stream = bitwrap.BitwrappedStream(six.BytesIO(data), generate=False)
+        res = []
+        for record in layout["leaves"]:
+            stream.seek(record["offset"], 0)
+
+            if record["cls"] == "Array":
+                field = fields.Array(
+                    record["count"], getattr(fields, record["item_cls"]),
+                )
+                field._pfp__parse(stream, save_offset=True)
+            else:
+                field = getattr(fields, record["cls"])()
+                if "endian" in record:
+                    field.endian = record["endian"]
+                field._pfp__parse(stream, save_offset=True)
+
+            # the full path keeps the names of rehydrated fields consistent
+            # with the original ones (see FeedbackScheduler)
+            field._pfp__name = record["path"]
+            res.append(field)
+
+        pfp.interp.PfpInterp.define_natives()
+        natives = pfp.interp.PfpInterp._natives
+        for watch in layout["watches"]:
+            watcher = res[watch["watcher"]]
+            watched = [res[idx] for idx in watch["watched"]]
+            watcher._pfp__set_watch(
+                watched, natives[watch["update"]], None, None, None, None, None
+            )
+
+        return res
@@ -71,6 +71,12 @@ class StratGroup(object):
     to the :any:`pfp.fuzz.mutate() <pfp.fuzz.mutate>` function
     """
 
+    leaf_query = None
+    """Keyword arguments for :any:`pfp.fields.LeafIndex.query` used to restrict which
+    leaf fields are mutated. E.g. ``{"path": "PNG_CHUNK.length"}`` to only mutate the
+    ``length`` field of every ``PNG_CHUNK`` struct.
+    """
+
     def __init__(self):
         self._strats = {}
 
@@ -117,40 +123,18 @@ class StratGroup(object):
     def which(self, field):
         """Return a list of leaf fields that should be mutated. If the field
         passed in is a leaf field, it will be returned in a list.
+
+        Leaves come from the field's cached leaf index (see
+        :any:`pfp.fields.Field._pfp__leaf_index`), restricted by ``leaf_query``
+        if it is set, and are then passed through ``filter_fields``.
         """
-        try:
-            if (
-                not isinstance(field, (pfp.fields.Struct, pfp.fields.Array))
-                and field._ is None
-            ):
-                return [field]
-        except Exception as e:
-            print(field)
-            print(field.__class__)
-
-        iter_fields = []
-
-        # packed fields need to be checked first! Otherwise it may be a char array
-        # and the list of field.items will be returned
-        if field._ is not None:
-            iter_fields = field._._pfp__children
-
-        elif isinstance(field, pfp.fields.Struct):
-            iter_fields = field._pfp__children
-
-        elif isinstance(field, pfp.fields.Array):
-            if field.raw_data is not None:
-                return [field]
-            else:
-                iter_fields = field.items
-
-        res = []
-        for subfield in iter_fields:
-            res += self.which(subfield)
-
-        res = self.filter_fields(res)
-
-        return res
+        if self.leaf_query is not None:
+            leaves = field._pfp__leaf_index().query(**self.leaf_query)
+        else:
+            # the cached list must not be modified by filter_fields
+            leaves = list(field._pfp__leaves())
+
+        return self.filter_fields(leaves)
 
     def filter_fields(self, field_list):
         """Intented to be overridden. Should return a list of fields to
@@ -6,7 +6,6 @@ Python format parser
 
 import collections
 import copy
-import glob
 import logging
 import os
 import re
@@ -14,6 +13,7 @@ import six
 import sys
 import traceback
 import platform
+import weakref
 
 import py010parser
 import py010parser.c_parser
@@ -25,11 +25,32 @@ import pfp.errors as errors
 import pfp.fields as fields
 import pfp.functions as functions
 import pfp.native as native
+import pfp.search as search
 import pfp.utils as utils
 
 logging.basicConfig(level=logging.CRITICAL)
 
 
+def create_parser():
+    """Create a new ``py010parser`` parser that uses the lexer and parser
+    tables shipped with py010parser. By default, PLY looks for the tables as
+    top-level ``lextab``/``yacctab`` modules, and regenerates them (and
+    writes them into the current directory) when they are not found, which
+    takes most of a second.
+
+    :returns: :any:`py010parser.c_parser.CParser`
+    """
+    try:
+        import py010parser.lextab
+        import py010parser.yacctab
+    except ImportError:
+        return py010parser.c_parser.CParser()
+
+    return py010parser.c_parser.CParser(
+        lextab="py010parser.lextab", yacctab="py010parser.yacctab"
+    )
+
+
 class Decls(object):
     def __init__(self, decls, coord):
         self.decls = decls
@@ -647,6 +668,8 @@ class PfpInterp(object):
 
     _natives = {}
     _predefines = []
+    # parser -> the parsed predefines, see _parse_predefines
+    _predefines_cache = weakref.WeakKeyDictionary()
     _cpp = []
     _functions_cpp = []
     _read_funcs = set()
@@ -1077,7 +1100,7 @@ class PfpInterp(object):
         self._generates_cpp += cpp
 
     @classmethod
-    def add_native(cls, name, func, ret, interp=None, send_interp=False):
+    def add_native(cls, name, func, ret, interp=None, send_interp=False, params=None):
         """Add the native python function ``func`` into the pfp interpreter with the
         name ``name`` and return value ``ret`` so that it can be called from
         within a template script.
@@ -1105,6 +1128,7 @@ class PfpInterp(object):
         :param type(pfp.fields.Field) ret: The field class that the return value should be cast to.
         :param pfp.interp.PfpInterp interp: The specific pfp interpreter the function should be defined in.
         :param bool send_interp: If true, the current pfp interpreter will be added as an argument to the function.
+        :param list params: If set, the types of the params of the function (see :any:`pfp.functions.compile_native_params`). The function is then passed a list of converted Python values instead of fields.
         """
         if interp is None:
             natives = cls._natives
@@ -1112,7 +1136,9 @@ class PfpInterp(object):
             # the instance's natives
             natives = interp._natives
 
-        natives[name] = functions.NativeFunction(name, func, ret, send_interp)
+        natives[name] = functions.NativeFunction(
+            name, func, ret, send_interp, params=params
+        )
 
     @classmethod
     def add_predefine(cls, template):
@@ -1130,23 +1156,14 @@ class PfpInterp(object):
         if len(cls._natives) > 0:
             return
 
-        glob_pattern = os.path.join(
-            os.path.dirname(__file__), "native", "*.py"
-        )
-        for filename in glob.glob(glob_pattern):
-            basename = os.path.basename(filename).replace(".py", "")
-            if basename == "__init__":
-                continue
-
+        for basename in native.MODULES:
             try:
                 mod_base = __import__(
                     "pfp.native", globals(), locals(), fromlist=[basename]
                 )
             except Exception as e:
                 sys.stderr.write(
-                    "cannot import native module {} at '{}'".format(
-                        basename, filename
-                    )
+                    "cannot import native module {}".format(basename)
                 )
                 raise e
                 continue
@@ -1154,26 +1171,22 @@ class PfpInterp(object):
             mod = getattr(mod_base, basename)
             setattr(mod, "PYVAL", fields.get_value)
             setattr(mod, "PYSTR", fields.get_str)
+            setattr(mod, "PYBYTES", fields.get_bytes)
 
-    def __init__(self, debug=False, parser=None, int3=True, generate=True):
+    def __init__(
+        self, debug=False, parser=None, int3=True, generate=True, cpp_output=None
+    ):
         """Create a new instance of the ``PfpInterp`` class.
 
         :param bool debug: if debug output should be used (default=``False``)
         :param :any:`py010parser.c_parser.CParser` parser: The ``py010parser.c_parser.CParser`` to use (default=``None``)
         :param bool int3: If debug breakpoints (calls to :any:`pfp.native.dbg.int3` ``Int3()``) are active (default=``True``)
+        :param str cpp_output: The path the generated C++ code is written to (default=``sys.argv[2]``)
         """
         sys.setrecursionlimit(100000)
         self._generate = generate
-        self._global_locals = []
-        self._global_consts = []
-        self._globals = []
-        self._variable_types = {}
-        self._integer_ranges = [("1", "16")]
-        self._instances = ""
-        self._locals_stack = [[]]
-        self._incomplete_stack = [False]
-        self._incomplete = False
-        self._structs = set()
+        self._cpp_output = cpp_output
+        self._reset_cpp_state()
         self.__class__.define_natives()
 
         self._log = DebugLogger(debug)
@@ -1195,10 +1208,19 @@ class PfpInterp(object):
         self._ctxt = None
         self._scope = None
         self._coord = None
+        self._search = None
         self._orig_filename = None
+        # the (temporary) file name in the coords of the template's nodes
+        self._template_coord_file = None
+        self._profiler = None
+
+        # see set_lazy_unpack and set_unpack_limits
+        self._lazy_unpack = True
+        self._max_unpack_size = None
+        self._unpack_cache = fields.UnpackCache()
 
         if parser is None:
-            parser = py010parser.c_parser.CParser()
+            parser = create_parser()
         # this speeds things up a bit
         self._parser = parser
 
@@ -1259,6 +1281,35 @@ class PfpInterp(object):
     # PUBLIC
     # --------------------
 
+    def _reset_cpp_state(self):
+        """Reset everything that is collected while generating the C++ code,
+        so that each call to :any:`PfpInterp.parse` starts from scratch, even
+        if the interpreter (and its loaded template) is reused.
+        """
+        self._global_locals = []
+        self._global_consts = []
+        self._globals = []
+        self._variable_types = {}
+        self._integer_ranges = [("1", "16")]
+        self._instances = ""
+        self._locals_stack = [[]]
+        self._incomplete_stack = [False]
+        self._incomplete = False
+        self._structs = set()
+
+        self._cpp = []
+        self._functions_cpp = []
+        self._read_funcs = set()
+        self._fstat_funcs = set()
+        self._generates_cpp = ""
+        self._known_values = {}
+        self._defined = {"time": None}
+        self._declared = set()
+        self._to_define = {}
+        self._to_replace = []
+        self._is_substructunion = False
+        self._call_stack = [False]
+
     def load_template(self, template):
         """Load a template and all required predefines into this interpreter.
         Future calls to ``parse`` will not require the template to be parsed.
@@ -1266,6 +1317,7 @@ class PfpInterp(object):
         self._template = template
         self._template_lines = self._template.split("\n")
         self._ast = self._parse_string(template, predefines=True)
+        self._template_coord_file = self._get_coord_file(self._ast)
         self._dlog("parsed template into ast")
         self._ast_frozen = True
 
@@ -1299,14 +1351,25 @@ class PfpInterp(object):
         self._printf = printf
         self._orig_filename = orig_filename
         self._stream = stream
+        self._reset_cpp_state()
+        # the DOMs of previous parses keep their own cache (see
+        # fields.Field._pfp__unpack_data)
+        self._unpack_cache = fields.UnpackCache(self._unpack_cache.max_size)
 
         if not self._ast_frozen:
             self._template = template
             self._template_lines = self._template.split("\n")
             self._ast = self._parse_string(template, predefines)
+            self._template_coord_file = self._get_coord_file(self._ast)
             self._dlog("parsed template into ast")
 
-        res = self._run(keep_successful)
+        try:
+            res = self._run(keep_successful)
+        finally:
+            # the searched data (e.g. memory maps of the input) must not
+            # outlive the parse, interpreters can be reused for many inputs
+            if self._search is not None:
+                self._search.close()
         res._pfp__finalize()
         return res
 
@@ -1394,6 +1457,73 @@ class PfpInterp(object):
         """
         return self._padded_bitfield
 
+    def get_search(self):
+        """Return the :any:`pfp.search.SearchService` used by the ``Find*``
+        functions of this interpreter. Search state (cached data, patterns and
+        the current ``FindFirst``/``FindNext`` matches) is kept per interpreter.
+        The cached data and matches are dropped when :any:`PfpInterp.parse`
+        returns.
+        """
+        if self._search is None:
+            self._search = search.SearchService()
+        return self._search
+
+    def set_lazy_unpack(self, val):
+        """Set if the data of packed fields should only be unpacked when
+        the ``_`` attribute of the field is first accessed (the default),
+        instead of as soon as the field is parsed.
+
+        :val: True/False
+        :returns: None
+        """
+        self._lazy_unpack = val
+
+    def get_lazy_unpack(self):
+        """Return if packed fields are lazily unpacked
+
+        :returns: True/False
+        """
+        return self._lazy_unpack
+
+    def set_profiler(self, profiler):
+        """Set a :any:`pfp.profiler.TemplateProfiler` that times every
+        handled AST node, or ``None`` to disable profiling (the default).
+
+        :profiler: The profiler or None
+        :returns: None
+        """
+        self._profiler = profiler
+
+    def get_profiler(self):
+        """Return the profiler that was set with ``set_profiler``
+
+        :returns: The profiler or None
+        """
+        return self._profiler
+
+    def set_unpack_limits(self, max_size=None, max_total_size=None):
+        """Limit the memory used by the unpacked data of packed fields.
+
+        :param int max_size: Raise :any:`pfp.errors.UnpackLimitExceeded` if the unpacked data of a single field is larger than this
+        :param int max_total_size: Drop the unpacked data of the least recently unpacked fields once the total size of all unpacked data is larger than this. Dropped data is unpacked again when it is next accessed.
+        :returns: None
+        """
+        self._max_unpack_size = max_size
+        self._unpack_cache.max_size = max_total_size
+        self._unpack_cache.evict()
+
+    def get_max_unpack_size(self):
+        """Return the maximum size of the unpacked data of a packed field,
+        or ``None``
+        """
+        return self._max_unpack_size
+
+    def get_unpack_cache(self):
+        """Return the :any:`pfp.fields.UnpackCache` that tracks the unpacked
+        data of packed fields
+        """
+        return self._unpack_cache
+
     def get_bitfield_direction(self):
         """Return if the bitfield direction
 
@@ -1401,6 +1531,29 @@ class PfpInterp(object):
         """
         return self._bitfield_direction
 
+    def _get_parse_settings(self):
+        """Return the settings that numbers and bitfields are parsed with
+        (endianness, bitfield padding and bitfield direction), so that
+        they can be restored with :any:`PfpInterp._set_parse_settings`
+        """
+        return (
+            fields.NumberBase.endian,
+            self._padded_bitfield,
+            self._bitfield_direction,
+        )
+
+    def _set_parse_settings(self, settings):
+        """Restore settings returned by
+        :any:`PfpInterp._get_parse_settings`. Unlike
+        :any:`PfpInterp.set_bitfield_padded`, this does not change the
+        padding of the input stream.
+        """
+        (
+            fields.NumberBase.endian,
+            self._padded_bitfield,
+            self._bitfield_direction,
+        ) = settings
+
     def get_filename(self):
         """Return the filename of the data that is currently being
         parsed
@@ -1439,11 +1592,16 @@ class PfpInterp(object):
         else:
             self.CPP_ARGS = ""
 
-    def _parse_string(self, string, predefines=True):
-        if self.CPP_ARGS is None:
-            self.set_cpp_args()
-        exts = []
-        if predefines:
+    def _parse_predefines(self):
+        """Return the AST nodes of the predefines. The predefines are only
+        parsed (and preprocessed) once per parser. The scopes of the parser
+        after parsing them are saved and restored for later templates.
+        """
+        key = (len(self._predefines), self.CPP_ARGS)
+        cached = self._predefines_cache.get(self._parser)
+
+        if cached is None or cached[0] != key:
+            exts = []
             for idx, predefine in enumerate(self._predefines):
                 try:
                     ast = py010parser.parse_string(
@@ -1457,6 +1615,30 @@ class PfpInterp(object):
                     exts += ast.ext
                 except:
                     pass
+            cached = (
+                key,
+                exts,
+                copy.deepcopy(self._parser._scope_stack),
+                dict(self._parser._structs_with_params),
+            )
+            self._predefines_cache[self._parser] = cached
+
+        key, exts, scope_stack, structs_with_params = cached
+        self._parser._scope_stack = copy.deepcopy(scope_stack)
+        self._parser._structs_with_params = dict(structs_with_params)
+
+        # the C++ generation annotates the nodes it handles, which must not
+        # leak into other interpreters
+        if self._generate:
+            return copy.deepcopy(exts)
+        return list(exts)
+
+    def _parse_string(self, string, predefines=True):
+        if self.CPP_ARGS is None:
+            self.set_cpp_args()
+        exts = []
+        if predefines:
+            exts = self._parse_predefines()
 
         res = py010parser.parse_string(
             string,
@@ -1469,6 +1651,15 @@ class PfpInterp(object):
 
         return res
 
+    def _get_coord_file(self, ast):
+        """Return the file name in the coords of the last top-level node
+        of ``ast``, which is the template's (temporary) file name
+        """
+        for ext in reversed(ast.ext):
+            if ext.coord is not None:
+                return ext.coord.file
+        return None
+
     def _run(self, keep_successfull):
         """Interpret the parsed 010 AST
         :returns: PfpDom
@@ -1607,7 +1798,17 @@ class PfpInterp(object):
                 node.coord, node.__class__.__name__
             )
 
-        res = self._node_switch[node.__class__](node, scope, ctxt, stream)
+        if self._profiler is None:
+            res = self._node_switch[node.__class__](node, scope, ctxt, stream)
+        else:
+            self._profiler.enter(self, node, ctxt, stream)
+            try:
+                res = self._node_switch[node.__class__](
+                    node, scope, ctxt, stream
+                )
+            finally:
+                # control flow (break, return, ...) raises exceptions
+                self._profiler.exit()
 
         self._log.dec()
 
@@ -1738,7 +1939,9 @@ class PfpInterp(object):
             node.cpp = node.cpp.replace("/**/" + local + "()", local)
         node.cpp = node.cpp.replace("/**/", "")
 
-        outfile = open(sys.argv[2], "w")
+        outfile = open(
+            sys.argv[2] if self._cpp_output is None else self._cpp_output, "w"
+        )
         print(node.cpp, file=outfile)
         outfile.close()
         if self._generate:
@@ -3,7 +3,22 @@ import functools
 import pfp.interp
 
 
-def native(name, ret, interp=None, send_interp=False):
+MODULES = (
+    "compat_consts",
+    "compat_interface",
+    "compat_io",
+    "compat_math",
+    "compat_string",
+    "compat_tools",
+    "dbg",
+    "packers",
+    "watchers",
+)
+"""The modules in this package that define natives and predefines. They are
+imported by :any:`pfp.interp.PfpInterp.define_natives`."""
+
+
+def native(name, ret, interp=None, send_interp=False, params=None):
     """Used as a decorator to add the decorated function to the
     pfp interpreter so that it can be used from within scripts.
 
@@ -11,6 +26,7 @@ def native(name, ret, interp=None, send_interp=False):
     :param pfp.fields.Field ret: The return type of the function (a class)
     :param pfp.interp.PfpInterp interp: The specific interpreter to add the function to
     :param bool send_interp: If the current interpreter should be passed to the function.
+    :param list params: The types of the function's params. If set, the number of arguments is checked and each argument is converted to a plain Python value before the function is called (see :any:`pfp.functions.compile_native_params`).
 
     Examples:
 
@@ -37,6 +53,14 @@ def native(name, ret, interp=None, send_interp=False):
                 if interp._int3:
                     interp.debugger = PfpDbg(interp)
                     interp.debugger.cmdloop()
+
+        The code below declares the types of the params of a ``Max`` function. The
+        function receives Python ints, and the second param defaults to ``0``
+        if it isn't passed: ::
+
+            @native(name="Max", ret=pfp.fields.Int64, params=[int, (int, 0)])
+            def max_numbers(params, ctxt, scope, stream, coord):
+                return max(params[0], params[1])
     """
 
     def native_decorator(func):
@@ -45,7 +69,12 @@ def native(name, ret, interp=None, send_interp=False):
             return func(*args, **kwargs)
 
         pfp.interp.PfpInterp.add_native(
-            name, func, ret, interp=interp, send_interp=send_interp
+            name,
+            func,
+            ret,
+            interp=interp,
+            send_interp=send_interp,
+            params=params,
         )
         return native_wrapper
 
@@ -276,101 +276,104 @@ def OverwriteBytes(params, ctxt, scope, stream, coord):
     raise NotImplementedError()
 
 
-def _read_data(params, stream, cls, coord):
-    bits = stream._bits
-    curr_pos = stream.tell()
+READ_PARAMS = [(int, None), (None, None)]
+"""The params of the ``Read<type>`` functions: an optional ``int64 pos``,
+and the optional known values that the generator picks the value from
+(see ``Read<type>`` in bt.h). The known values are not used when parsing."""
 
-    if len(params) >= 1:
-        pos = PYVAL(params[0])
-        stream.seek(pos, 0)
-    elif len(params) > 1:
-        raise errors.InvalidArguments(
-            coord, "at most 1 arguments", "{} args".format(len(params))
-        )
 
-    res = cls(stream=stream)
+def _read_data(params, stream, cls, coord):
+    """Read a ``cls`` field at the ``pos`` param (see ``READ_PARAMS``) or at
+    the current position. The bytes are looked up with
+    :any:`pfp.bitwrap.BitwrappedStream.peek`, so the position of the stream
+    is never changed and consecutive lookahead reads are answered from the
+    stream's read-ahead window.
+    """
+    pos = params[0]
+    if pos is None:
+        pos = stream.tell()
 
-    # reset the stream
-    stream.seek(curr_pos, 0)
-    stream._bits = bits
+    res = cls()
+    res._pfp__offset = pos
+    res._pfp__parse_bytes(stream.peek(pos, cls.width))
 
     return res
 
 
 # char ReadByte( int64 pos=FTell() )
-@native(name="ReadByte", ret=pfp.fields.Char)
+@native(name="ReadByte", ret=pfp.fields.Char, params=READ_PARAMS)
 def ReadByte(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.Char, coord)
 
 
 # double ReadDouble( int64 pos=FTell() )
-@native(name="ReadDouble", ret=pfp.fields.Double)
+@native(name="ReadDouble", ret=pfp.fields.Double, params=READ_PARAMS)
 def ReadDouble(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.Double, coord)
 
 
 # float ReadFloat( int64 pos=FTell() )
-@native(name="ReadFloat", ret=pfp.fields.Float)
+@native(name="ReadFloat", ret=pfp.fields.Float, params=READ_PARAMS)
 def ReadFloat(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.Float, coord)
 
 
 # hfloat ReadHFloat( int64 pos=FTell() )
-@native(name="ReadHFloat", ret=pfp.fields.Float)
+@native(name="ReadHFloat", ret=pfp.fields.Float, params=READ_PARAMS)
 def ReadHFloat(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.Float, coord)
 
 
 # int ReadInt( int64 pos=FTell() )
-@native(name="ReadInt", ret=pfp.fields.Int)
+@native(name="ReadInt", ret=pfp.fields.Int, params=READ_PARAMS)
 def ReadInt(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.Int, coord)
 
 
 # int64 ReadInt64( int64 pos=FTell() )
-@native(name="ReadInt64", ret=pfp.fields.Int64)
+@native(name="ReadInt64", ret=pfp.fields.Int64, params=READ_PARAMS)
 def ReadInt64(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.Int64, coord)
 
 
 # int64 ReadQuad( int64 pos=FTell() )
-@native(name="ReadQuad", ret=pfp.fields.Int64)
+@native(name="ReadQuad", ret=pfp.fields.Int64, params=READ_PARAMS)
 def ReadQuad(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.Int64, coord)
 
 
 # short ReadShort( int64 pos=FTell() )
-@native(name="ReadShort", ret=pfp.fields.Short)
+@native(name="ReadShort", ret=pfp.fields.Short, params=READ_PARAMS)
 def ReadShort(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.Short, coord)
 
 
 # uchar ReadUByte( int64 pos=FTell() )
-@native(name="ReadUByte", ret=pfp.fields.UChar)
+@native(name="ReadUByte", ret=pfp.fields.UChar, params=READ_PARAMS)
 def ReadUByte(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.UChar, coord)
 
 
 # uint ReadUInt( int64 pos=FTell() )
-@native(name="ReadUInt", ret=pfp.fields.UInt)
+@native(name="ReadUInt", ret=pfp.fields.UInt, params=READ_PARAMS)
 def ReadUInt(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.UInt, coord)
 
 
 # uint64 ReadUInt64( int64 pos=FTell() )
-@native(name="ReadUInt64", ret=pfp.fields.UInt64)
+@native(name="ReadUInt64", ret=pfp.fields.UInt64, params=READ_PARAMS)
 def ReadUInt64(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.UInt64, coord)
 
 
 # uint64 ReadUQuad( int64 pos=FTell() )
-@native(name="ReadUQuad", ret=pfp.fields.UInt64)
+@native(name="ReadUQuad", ret=pfp.fields.UInt64, params=READ_PARAMS)
 def ReadUQuad(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.UInt64, coord)
 
 
 # ushort ReadUShort( int64 pos=FTell() )
-@native(name="ReadUShort", ret=pfp.fields.UShort)
+@native(name="ReadUShort", ret=pfp.fields.UShort, params=READ_PARAMS)
 def ReadUShort(params, ctxt, scope, stream, coord):
     return _read_data(params, stream, pfp.fields.UShort, coord)
 
@@ -411,22 +414,16 @@ def ReadBytes(params, ctxt, scope, stream, coord):
             coord, "n must be an integer", params[2].__class__.__name__
         )
 
-    bits = stream._bits
-    curr_pos = stream.tell()
-
     num_bytes = PYVAL(params[2])
     if params[0]._pfp__interp._generate:
         if num_bytes > 100:
             num_bytes = 100
 
-    vals = [
-        params[0].field_cls(stream) for x in six.moves.range(num_bytes)
-    ]
-
-    stream.seek(curr_pos, 0)
-    stream._bits = bits
+    data = stream.peek(PYVAL(params[1]), num_bytes)
+    if len(data) < num_bytes:
+        raise errors.PrematureEOF()
 
-    params[0]._pfp__set_value(vals)
+    params[0]._pfp__set_value(data)
 
 
 # char[] ReadString( int64 pos, int maxLen=-1 )
@@ -25,13 +25,9 @@ def _cmp(a, b):
 # http://www.sweetscape.com/010editor/manual/FuncString.htm
 
 # double Atof( const char s[] )
-@native(name="Atof", ret=pfp.fields.Double)
+@native(name="Atof", ret=pfp.fields.Double, params=[str])
 def Atof(params, ctxt, scope, stream, coord):
-    if len(params) < 1:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "one arg"
-        )
-    return float(PYSTR(params[0]))
+    return float(params[0])
 
 
 # int Atoi( const char s[] )
@@ -137,7 +133,7 @@ def IntToBinaryStr(params, ctxt, scope, stream, coord):
 
 
 # int Memcmp( const uchar s1[], const uchar s2[], int n )
-@native(name="Memcmp", ret=pfp.fields.Int)
+@native(name="Memcmp", ret=pfp.fields.Int, params=[bytes, bytes, int])
 def Memcmp(params, ctxt, scope, stream, coord):
     """
     int Memcmp( const uchar s1[], const uchar s2[], int n )
@@ -146,18 +142,8 @@ def Memcmp(params, ctxt, scope, stream, coord):
     s1 is less than s2, zero if they are equal, or a value greater than zero if
     s1 is greater than s2.
     """
-    if len(params) < 3:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "3 arguments",
-        )
-    s1 = PYSTR(params[0])
-    s2 = PYSTR(params[1])
-    n = PYVAL(params[2])
-
-    s1_sub = s1[:n]
-    s2_sub = s2[:n]
-
-    return _cmp(s1_sub, s2_sub)
+    s1, s2, n = params
+    return _cmp(s1[:n], s2[:n])
 
 
 # void Memcpy( uchar dest[], const uchar src[], int n, int destOffset=0, int srcOffset=0 )
@@ -198,6 +184,14 @@ def Memcpy(params, ctxt, scope, stream, coord):
             coord, src.__class__.__name__, "an array"
         )
 
+    if _can_copy_raw(dest, src):
+        width = dest.field_cls.width
+        data = src._pfp__build()[src_offset * width : (src_offset + n) * width]
+        if len(data) < n * width:
+            raise IndexError(src_offset + n - 1)
+        _write_raw(dest, dest_offset * width, data)
+        return
+
     count = 0
     while n > 0:
         val = dest.field_cls()
@@ -208,10 +202,59 @@ def Memcpy(params, ctxt, scope, stream, coord):
         n -= 1
 
 
+def _can_copy_raw(dest, src):
+    """Return True if the items of ``src`` can be copied into ``dest`` as
+    raw bytes, instead of one item at a time
+    """
+    if not issubclass(dest.field_cls, pfp.fields.NumberBase):
+        return False
+    if dest._pfp__raw_view() is None and not dest.is_stringable():
+        return False
+    return src.field_cls is dest.field_cls or (
+        src.is_stringable() and dest.is_stringable()
+    )
+
+
+def _write_raw(dest, offset, data):
+    """Overwrite the bytes of the array ``dest`` at ``offset`` with
+    ``data`` in a single update
+    """
+    if dest._pfp__raw_view() is not None:
+        dest._pfp__set_raw_range(offset, data)
+        return
+
+    # char arrays that weren't parsed from a stream (locals) hold
+    # individual items - replace them all at once with raw data
+    old_data = dest._pfp__build()
+    if offset < 0 or offset + len(data) > len(old_data):
+        raise IndexError(offset + len(data))
+    dest._pfp__set_value(
+        old_data[0:offset] + data + old_data[offset + len(data) :]
+    )
+
+
 # void Memset( uchar s[], int c, int n )
-@native(name="Memset", ret=pfp.fields.Void)
-def Memset(params, ctxt, scope, stream, coord):
-    raise NotImplementedError()
+@native(name="Memset", ret=pfp.fields.Void, send_interp=True)
+def Memset(params, ctxt, scope, stream, coord, interp):
+    if interp._generate:
+        return
+    if len(params) != 3:
+        raise errors.InvalidArguments(
+            coord, "{} args".format(len(params)), "3 arguments"
+        )
+
+    dest = params[0]
+    c = PYVAL(params[1])
+    n = PYVAL(params[2])
+
+    if not isinstance(dest, pfp.fields.Array) or not (
+        dest._pfp__raw_view() is not None or dest.is_stringable()
+    ):
+        raise errors.InvalidArguments(
+            coord, dest.__class__.__name__, "an array"
+        )
+
+    _write_raw(dest, 0, six.int2byte(c & 0xFF) * n)
 
 
 # string OleTimeToString( OLETIME ot, char format[] = "MM/dd/yyyy hh:mm:ss" )
@@ -285,48 +328,23 @@ def Strcat(params, ctxt, scope, stream, coord):
 
 
 # int Strchr( const char s[], char c )
-@native(name="Strchr", ret=pfp.fields.Int)
+@native(name="Strchr", ret=pfp.fields.Int, params=[bytes, int])
 def Strchr(params, ctxt, scope, stream, coord):
-    if len(params) != 2:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "2 arguments"
-        )
-
-    haystack = PYSTR(params[0])
-    needle = chr(PYVAL(params[1]))
-
-    try:
-        return haystack.index(needle)
-
-    # expected condition when the substring doesn't exist
-    except ValueError as e:
-        return -1
+    haystack, c = params
+    return haystack.find(six.int2byte(c & 0xFF))
 
 
 # int Strcmp( const char s1[], const char s2[] )
-@native(name="Strcmp", ret=pfp.fields.Int)
+@native(name="Strcmp", ret=pfp.fields.Int, params=[bytes, bytes])
 def Strcmp(params, ctxt, scope, stream, coord):
-    if len(params) != 2:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "2 arguments"
-        )
-    str1 = PYSTR(params[0])
-    str2 = PYSTR(params[1])
-
-    if params[0] is None or params[1] is None:
-        return 0
+    str1, str2 = params
     return _cmp(str1, str2)
 
 
 # void Strcpy( char dest[], const char src[] )
-@native(name="Strcpy", ret=pfp.fields.Void)
+@native(name="Strcpy", ret=pfp.fields.Void, params=[None, bytes])
 def Strcpy(params, ctxt, scope, stream, coord):
-    if len(params) != 2:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "2 arguments"
-        )
-
-    params[0]._pfp__set_value(PYSTR(params[1]))
+    params[0]._pfp__set_value(params[1])
 
 
 # char[] StrDel( const char str[], int start, int count )
@@ -336,16 +354,9 @@ def StrDel(params, ctxt, scope, stream, coord):
 
 
 # int Stricmp( const char s1[], const char s2[] )
-@native(name="Stricmp", ret=pfp.fields.Int)
+@native(name="Stricmp", ret=pfp.fields.Int, params=[bytes, bytes])
 def Stricmp(params, ctxt, scope, stream, coord):
-    if len(params) != 2:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "2 arguments"
-        )
-    str1 = PYSTR(params[0]).lower()
-    str2 = PYSTR(params[1]).lower()
-
-    return _cmp(str1, str2)
+    return _cmp(params[0].lower(), params[1].lower())
 
 
 # int StringToDosDate( string s, DOSDATE &d, char format[] = "MM/dd/yyyy" )
@@ -391,92 +402,49 @@ def StringToWString(params, ctxt, scope, stream, coord):
 
 
 # int Strlen( const char s[] )
-@native(name="Strlen", ret=pfp.fields.Int)
+@native(name="Strlen", ret=pfp.fields.Int, params=[bytes])
 def Strlen(params, ctxt, scope, stream, coord):
-    if len(params) != 1:
-        raise errors.InvalidArguments(
-            coord, "1 argument", "{} args".format(len(params))
-        )
-    val = params[0]
-    if isinstance(val, pfp.fields.Array):
-        val = val._array_to_str()
-    else:
-        val = PYVAL(val)
-    return len(val)
+    return len(params[0])
 
 
 # int Strncmp( const char s1[], const char s2[], int n )
-@native(name="Strncmp", ret=pfp.fields.Int)
+@native(name="Strncmp", ret=pfp.fields.Int, params=[bytes, bytes, int])
 def Strncmp(params, ctxt, scope, stream, coord):
-    if len(params) != 3:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "3 arguments"
-        )
-    max_chars = PYVAL(params[2])
-    str1 = PYSTR(params[0])[:max_chars]
-    str2 = PYSTR(params[1])[:max_chars]
+    max_chars = params[2]
+    str1 = params[0][:max_chars]
+    str2 = params[1][:max_chars]
 
     return _cmp(str1, str2)
 
 
 # void Strncpy( char dest[], const char src[], int n )
-@native(name="Strncpy", ret=pfp.fields.Void)
+@native(name="Strncpy", ret=pfp.fields.Void, params=[None, bytes, int])
 def Strncpy(params, ctxt, scope, stream, coord):
-    if len(params) != 3:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "3 arguments"
-        )
-
-    max_len = PYVAL(params[2])
-    params[0]._pfp__set_value(PYSTR(params[1])[:max_len])
+    dest, src, max_len = params
+    dest._pfp__set_value(src[:max_len])
 
 
 # int Strnicmp( const char s1[], const char s2[], int n )
-@native(name="Strnicmp", ret=pfp.fields.Int)
+@native(name="Strnicmp", ret=pfp.fields.Int, params=[bytes, bytes, int])
 def Strnicmp(params, ctxt, scope, stream, coord):
-    if len(params) != 3:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "3 arguments"
-        )
-    max_chars = PYVAL(params[2])
-    str1 = PYSTR(params[0])[:max_chars].lower()
-    str2 = PYSTR(params[1])[:max_chars].lower()
+    max_chars = params[2]
+    str1 = params[0][:max_chars].lower()
+    str2 = params[1][:max_chars].lower()
 
     return _cmp(str1, str2)
 
 
 # int Strstr( const char s1[], const char s2[] )
-@native(name="Strstr", ret=pfp.fields.Int)
+@native(name="Strstr", ret=pfp.fields.Int, params=[bytes, bytes])
 def Strstr(params, ctxt, scope, stream, coord):
-    if len(params) != 2:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "2 arguments"
-        )
-
-    haystack = PYSTR(params[0])
-    needle = PYSTR(params[1])
-
-    try:
-        return haystack.index(needle)
-
-    # expected condition when the substring doesn't exist
-    except ValueError as e:
-        return -1
+    haystack, needle = params
+    return haystack.find(needle)
 
 
 # char[] SubStr( const char str[], int start, int count=-1 )
-@native(name="SubStr", ret=pfp.fields.String)
+@native(name="SubStr", ret=pfp.fields.String, params=[bytes, int, (int, -1)])
 def SubStr(params, ctxt, scope, stream, coord):
-    if len(params) < 2:
-        raise errors.InvalidArguments(
-            coord, "2 arguments", "{} args".format(len(params))
-        )
-
-    string = PYSTR(params[0])
-    start = PYVAL(params[1])
-    count = -1
-    if len(params) > 2:
-        count = PYVAL(params[2])
+    string, start, count = params
     if count < 0:
         count = -1
 
@@ -493,13 +461,9 @@ def TimeTToString(params, ctxt, scope, stream, coord):
 
 
 # char ToLower( char c )
-@native(name="ToLower", ret=pfp.fields.Char)
+@native(name="ToLower", ret=pfp.fields.Char, params=[int])
 def ToLower(params, ctxt, scope, stream, coord):
-    if len(params) != 1:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "1 argument"
-        )
-    return ord(chr(PYVAL(params[0])).lower())
+    return ord(six.int2byte(params[0] & 0xFF).lower())
 
 
 # wchar_t ToLowerW( wchar_t c )
@@ -509,13 +473,9 @@ def ToLowerW(params, ctxt, scope, stream, coord):
 
 
 # char ToUpper( char c )
-@native(name="ToUpper", ret=pfp.fields.Char)
+@native(name="ToUpper", ret=pfp.fields.Char, params=[int])
 def ToUpper(params, ctxt, scope, stream, coord):
-    if len(params) != 1:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "1 argument"
-        )
-    return ord(chr(PYVAL(params[0])).upper())
+    return ord(six.int2byte(params[0] & 0xFF).upper())
 
 
 # void WMemcmp( const wchar_t s1[], const wchar_t s2[], int n )
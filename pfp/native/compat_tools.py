@@ -7,16 +7,18 @@ compatability with 010 editor functions. Some of these functions
 are nops, some are fully implemented.
 """
 
-import binascii
+import collections
 import re
 import six
 import sys
+import tempfile
 
 from pfp.native import native, predefine
+import pfp.checksum as checksum
 import pfp.errors as errors
 import pfp.fields
+from pfp.fields import PYVAL, PYSTR
 import pfp.utils as utils
-import zlib
 
 # http://www.sweetscape.com/010editor/manual/FuncTools.htm
 
@@ -89,24 +91,6 @@ def Checksum(params, ctxt, scope, stream, coord):
     """
     if params[0]._pfp__interp._generate:
         return 0
-    checksum_types = {
-        0: "CHECKSUM_BYTE",  # Treats the file as a set of unsigned bytes
-        1: "CHECKSUM_SHORT_LE",  # Treats the file as a set of unsigned little-endian shorts
-        2: "CHECKSUM_SHORT_BE",  # Treats the file as a set of unsigned big-endian shorts
-        3: "CHECKSUM_INT_LE",  # Treats the file as a set of unsigned little-endian ints
-        4: "CHECKSUM_INT_BE",  # Treats the file as a set of unsigned big-endian ints
-        5: "CHECKSUM_INT64_LE",  # Treats the file as a set of unsigned little-endian int64s
-        6: "CHECKSUM_INT64_BE",  # Treats the file as a set of unsigned big-endian int64s
-        7: "CHECKSUM_SUM8",  # Same as CHECKSUM_BYTE except result output as 8-bits
-        8: "CHECKSUM_SUM16",  # Same as CHECKSUM_BYTE except result output as 16-bits
-        9: "CHECKSUM_SUM32",  # Same as CHECKSUM_BYTE except result output as 32-bits
-        10: "CHECKSUM_SUM64",  # Same as CHECKSUM_BYTE
-        11: "CHECKSUM_CRC16",
-        12: "CHECKSUM_CRCCCITT",
-        13: _crc32,
-        14: _checksum_Adler32,
-        15: "CHECKSUM_CRC8",
-    }
 
     if len(params) < 1:
         raise errors.InvalidArguments(
@@ -114,54 +98,109 @@ def Checksum(params, ctxt, scope, stream, coord):
         )
 
     alg = PYVAL(params[0])
-    if alg not in checksum_types:
+    if alg in checksum.HASH_NAMES:
         raise errors.InvalidArguments(
-            coord, "checksum alg must be one of (0-14)", "{}".format(alg)
+            coord,
+            "checksum alg must be one of (0-14, 24)",
+            "{}".format(alg),
         )
 
+    start, size = _checksum_range(params, 1, stream)
+    try:
+        csum = _new_checksum(alg, params, 3)
+    except checksum.ChecksumError:
+        raise errors.InvalidArguments(
+            coord,
+            "checksum alg must be one of (0-14, 24)",
+            "{}".format(alg),
+        )
+
+    stream_pos = stream.tell()
+    try:
+        checksum.update_from_stream(csum, stream, start, size)
+        return csum.intdigest()
+
+    finally:
+        # yes, this does execute even though a return statement
+        # exists within the try
+        stream.seek(stream_pos, 0)
+
+
+def _checksum_range(params, idx, stream):
+    """Return the ``(start, size)`` of the range to checksum from the
+    ``start`` and ``size`` params at ``params[idx]``. If both are zero,
+    the whole file is used.
+    """
     start = 0
-    if len(params) > 1:
-        start = PYVAL(params[1])
+    if len(params) > idx:
+        start = PYVAL(params[idx])
 
     size = 0
-    if len(params) > 2:
-        size = PYVAL(params[2])
+    if len(params) > idx + 1:
+        size = PYVAL(params[idx + 1])
+
+    if start + size == 0:
+        size = stream.size()
 
+    return start, size
+
+
+def _new_checksum(alg, params, idx):
+    """Create a checksum object using the optional ``crcPolynomial`` and
+    ``crcInitValue`` params at ``params[idx]``
+    """
     crc_poly = -1
-    if len(params) > 3:
-        crc_poly = PYVAL(params[3])
+    if len(params) > idx:
+        crc_poly = PYVAL(params[idx])
 
     crc_init = -1
-    if len(params) > 4:
-        crc_init = PYVAL(params[4])
+    if len(params) > idx + 1:
+        crc_init = PYVAL(params[idx + 1])
 
-    stream_pos = stream.tell()
+    return checksum.new(alg, crc_poly, crc_init)
 
-    if start + size == 0:
-        stream.seek(0, 0)
-        data = stream.read()
-    else:
-        stream.seek(start, 0)
-        data = stream.read(size)
-
-    try:
-        return checksum_types[alg](data, crc_init, crc_poly)
 
-    finally:
-        # yes, this does execute even though a return statement
-        # exists within the try
-        stream.seek(stream_pos, 0)
+def _checksum_alg(params, stream, coord, from_array, as_str):
+    """Shared implementation of the ``ChecksumAlg*`` functions. Stores
+    the result in ``params[1]`` and returns its length, or -1 on error.
+    """
+    if len(params) < 3:
+        raise errors.InvalidArguments(
+            coord, "at least 3 arguments", "{} args".format(len(params))
+        )
 
+    alg = PYVAL(params[0])
+    result = params[1]
 
-def _checksum_Adler32(data, crc_init=-1, crc_poly=-1):
-    return zlib.adler32(data)
+    ignore = None
+    if len(params) > 4:
+        ignore = checksum.parse_ignore(PYSTR(params[4]))
 
+    try:
+        csum = _new_checksum(alg, params, 5)
+    except checksum.ChecksumError:
+        return -1
 
-def _crc32(data, crc_init=-1, crc_poly=-1):
-    if crc_init == -1:
-        return binascii.crc32(data)
+    if from_array:
+        data = params[2]._pfp__build()
+        if len(params) > 3:
+            data = data[: PYVAL(params[3])]
+        checksum.update_from_data(csum, data, ignore)
     else:
-        return binascii.crc32(data, crc_init)
+        start, size = _checksum_range(params, 2, stream)
+        stream_pos = stream.tell()
+        try:
+            checksum.update_from_stream(csum, stream, start, size, ignore)
+        finally:
+            stream.seek(stream_pos, 0)
+
+    if as_str:
+        res = utils.binary(csum.hexdigest())
+    else:
+        res = csum.digest()
+
+    result._pfp__set_value(res)
+    return len(res)
 
 
 # int ChecksumAlgArrayStr(
@@ -183,7 +222,9 @@ def ChecksumAlgArrayStr(params, ctxt, scope, stream, coord):
     in the string will be returned, or -1 if an error occurred. See the
     ChecksumAlgStr function for a list of available algorithms.
     """
-    raise NotImplementedError()
+    if params[0]._pfp__interp._generate:
+        return 0
+    return _checksum_alg(params, stream, coord, from_array=True, as_str=True)
 
 
 # int ChecksumAlgArrayBytes(
@@ -207,7 +248,9 @@ def ChecksumAlgArrayBytes(params, ctxt, scope, stream, coord):
     or -1 if an error occurred. See the ChecksumAlgStr function for a
     list of available algorithms.
     """
-    raise NotImplementedError()
+    if params[0]._pfp__interp._generate:
+        return 0
+    return _checksum_alg(params, stream, coord, from_array=True, as_str=False)
 
 
 # int ChecksumAlgStr(
@@ -259,8 +302,9 @@ def ChecksumAlgStr(params, ctxt, scope, stream, coord):
     topic. See the Checksum function above for an explanation of the
     different checksum constants.
     """
-    return 0
-    #raise NotImplementedError()
+    if params[0]._pfp__interp._generate:
+        return 0
+    return _checksum_alg(params, stream, coord, from_array=False, as_str=True)
 
 
 # int ChecksumAlgBytes(
@@ -278,7 +322,9 @@ def ChecksumAlgBytes(params, ctxt, scope, stream, coord):
     the checksum is returned as a byte array in the result argument. The
     return value is the number of bytes returned in the array.
     """
-    raise NotImplementedError()
+    if params[0]._pfp__interp._generate:
+        return 0
+    return _checksum_alg(params, stream, coord, from_array=False, as_str=False)
 
 
 # TCompareResults Compare(
@@ -448,9 +494,6 @@ def ExportFile(params, ctxt, scope, stream, coord):
     raise NotImplementedError()
 
 
-FIND_MATCHES_ITER = None
-FIND_MATCHES_START_OFFSET = 0
-
 FINDMETHOD_NORMAL = 0
 FINDMETHOD_WILDCARDS = 1
 FINDMETHOD_REGEX = 2
@@ -474,20 +517,29 @@ typedef struct {
 )
 
 
-def _find_helper(params, ctxt, scope, stream, coord, interp):
-    global FIND_MATCHES_START_OFFSET
+def _find_data(param):
+    """Return the data to search for (or replace with) of a ``Find*``
+    or ``ReplaceAll`` param
+    """
+    if (
+        isinstance(param, pfp.fields.Array) and param.is_stringable()
+    ) or isinstance(param, pfp.fields.String):
+        return PYSTR(param)  # should correctly do null termination
+    else:
+        return param._pfp__build()
+
 
+def _find_helper(params, ctxt, scope, stream, coord, interp):
+    """Return an iterator of the ``(start, end)`` offsets of the matches
+    of the ``FindAll``/``FindFirst`` params, using the interpreter's
+    search service (see :any:`pfp.search.SearchService`)
+    """
     if len(params) == 0:
         raise errors.InvalidArguments(
             coord, "at least 1 argument", "{} args".format(len(params))
         )
 
-    if (
-        isinstance(params[0], pfp.fields.Array) and params[0].is_stringable()
-    ) or isinstance(params[0], pfp.fields.String):
-        data = PYSTR(params[0])  # should correctly do null termination
-    else:
-        data = params[0]._pfp__build()
+    data = _find_data(params[0])
 
     if len(params) > 1:
         match_case = not not PYVAL(params[1])
@@ -522,7 +574,6 @@ def _find_helper(params, ctxt, scope, stream, coord, interp):
         start = PYVAL(params[6])
     else:
         start = 0
-    FIND_MATCHES_START_OFFSET = start
 
     if len(params) > 7:
         size = PYVAL(params[7])
@@ -534,6 +585,11 @@ def _find_helper(params, ctxt, scope, stream, coord, interp):
     else:
         wildcard_match_length = 24
 
+    search = interp.get_search()
+
+    if method == FINDMETHOD_NORMAL and match_case and not wholeword:
+        return search.find_literal(stream, utils.binary(data), start, size)
+
     regex = re.escape(data)
 
     if method == FINDMETHOD_WILDCARDS:
@@ -548,25 +604,11 @@ def _find_helper(params, ctxt, scope, stream, coord, interp):
     if wholeword:
         regex = "\\b" + regex + "\\b"
 
-    regex = utils.binary(regex)
-
-    stream_bits = stream._bits
-    stream_pos = stream.tell()
-
-    stream.seek(start)
-    if size == 0:
-        search_data = stream.read(stream.size())
-    else:
-        search_data = stream.read(size)
-
-    stream.seek(stream_pos)
-    stream._bits = stream_bits
-
     flags = 0
     if not match_case:
         flags |= re.IGNORECASE
 
-    return re.finditer(regex, search_data, flags)
+    return search.finditer(stream, utils.binary(regex), flags, start, size)
 
 
 # TFindResults FindAll(
@@ -601,24 +643,14 @@ def FindAll(params, ctxt, scope, stream, coord, interp):
 
     The return value is a TFindResults structure. This structure contains a count variable indicating the number of matches, and a start array holding an array of starting positions, plus a size array which holds an array of target lengths. For example, use the following code to find all occurrences of the ASCII string "Test" in a file:
     """
-    matches_iter = _find_helper(params, ctxt, scope, stream, coord, interp)
-    matches = list(matches_iter)
+    matches = list(_find_helper(params, ctxt, scope, stream, coord, interp))
 
     types = interp.get_types()
     res = types.TFindResults()
 
     res.count = len(matches)
-
-    # python3 map doesn't return a list
-    starts = list(
-        map(lambda m: m.start() + FIND_MATCHES_START_OFFSET, matches)
-    )
-
-    res.start = starts
-
-    # python3 map doesn't return a list
-    sizes = list(map(lambda m: m.end() - m.start(), matches))
-    res.size = sizes
+    res.start = [start for start, end in matches]
+    res.size = [end - start for start, end in matches]
 
     return res
 
@@ -641,21 +673,19 @@ def FindFirst(params, ctxt, scope, stream, coord, interp):
     return value is the position of the first occurrence of the target
     found. A negative number is returned if the value could not be found.
     """
-    global FIND_MATCHES_ITER
-    FIND_MATCHES_ITER = _find_helper(
-        params, ctxt, scope, stream, coord, interp
-    )
+    search = interp.get_search()
+    search.matches = _find_helper(params, ctxt, scope, stream, coord, interp)
 
     try:
-        first = six.next(FIND_MATCHES_ITER)
-        return first.start() + FIND_MATCHES_START_OFFSET
+        start, end = six.next(search.matches)
+        return start
     except StopIteration as e:
         return -1
 
 
 # int64 FindNext( int dir=1 )
-@native(name="FindNext", ret=pfp.fields.Int64)
-def FindNext(params, ctxt, scope, stream, coord):
+@native(name="FindNext", ret=pfp.fields.Int64, send_interp=True)
+def FindNext(params, ctxt, scope, stream, coord, interp):
     """
     This function returns the position of the next occurrence of the
     target value specified with the FindFirst function. If dir is 1, the
@@ -663,7 +693,8 @@ def FindNext(params, ctxt, scope, stream, coord):
     return value is the address of the found data, or -1 if the target
     is not found.
     """
-    if FIND_MATCHES_ITER is None:
+    search = interp.get_search()
+    if search.matches is None:
         raise errors.InvalidState()
 
     direction = 1
@@ -671,7 +702,7 @@ def FindNext(params, ctxt, scope, stream, coord):
         direction = PYVAL(params[0])
 
     if direction != 1:
-        # TODO maybe instead of storing the iterator in FIND_MATCHES_ITER,
+        # TODO maybe instead of storing the iterator of matches,
         # we should go ahead and find _all the matches in the file and store them
         # in a list, keeping track of the idx of the current match.
         #
@@ -679,8 +710,8 @@ def FindNext(params, ctxt, scope, stream, coord):
         raise NotImplementedError("Reverse searching is not yet implemented")
 
     try:
-        next_match = six.next(FIND_MATCHES_ITER)
-        return next_match.start() + FIND_MATCHES_START_OFFSET
+        start, end = six.next(search.matches)
+        return start
     except StopIteration as e:
         return -1
 
@@ -835,8 +866,8 @@ def HexOperation(params, ctxt, scope, stream, coord):
 
 
 # int64 Histogram( int64 start, int64 size, int64 result[256] )
-@native(name="Histogram", ret=pfp.fields.Int64)
-def Histogram(params, ctxt, scope, stream, coord):
+@native(name="Histogram", ret=pfp.fields.Int64, send_interp=True)
+def Histogram(params, ctxt, scope, stream, coord, interp):
     """
     Counts the number of bytes of each value in the file from 0 up to
     255. The bytes are counting starting from address start and continuing
@@ -845,7 +876,45 @@ def Histogram(params, ctxt, scope, stream, coord):
     values found in the given range of data. The return value is the
     total number of bytes read.
     """
-    raise NotImplementedError()
+    if interp._generate:
+        return 0
+    if len(params) != 3:
+        raise errors.InvalidArguments(
+            coord, "3 arguments", "{} args".format(len(params))
+        )
+
+    result = params[2]
+    if not isinstance(result, pfp.fields.Array):
+        raise errors.InvalidArguments(
+            coord, "an array", result.__class__.__name__
+        )
+
+    start, size = _checksum_range(params, 0, stream)
+    counter = _ByteCounter()
+
+    stream_pos = stream.tell()
+    try:
+        checksum.update_from_stream(counter, stream, start, size)
+    finally:
+        stream.seek(stream_pos, 0)
+
+    result._pfp__set_value([counter.counts[x] for x in six.moves.range(256)])
+    return counter.total
+
+
+class _ByteCounter(object):
+    """Counts the values of the bytes it is updated with. Has the same
+    ``update`` method as the checksums in :any:`pfp.checksum` so that it
+    can be used with :any:`pfp.checksum.update_from_stream`.
+    """
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.total = 0
+
+    def update(self, data):
+        self.counts.update(bytearray(data))
+        self.total += len(data)
 
 
 # int ImportFile( int type, char filename[], int wordaddresses=false, int defaultByteValue=-1 , coord)
@@ -978,8 +1047,8 @@ def OpenProcessByName(params, ctxt, scope, stream, coord):
 #    int64 size=0,
 #    int padwithzeros=false,
 #    int wildcardMatchLength=24 )
-@native(name="ReplaceAll", ret=pfp.fields.Int)
-def ReplaceAll(params, ctxt, scope, stream, coord):
+@native(name="ReplaceAll", ret=pfp.fields.Int, send_interp=True)
+def ReplaceAll(params, ctxt, scope, stream, coord, interp):
     """
     This function converts the arguments finddata and replacedata into
     a set of bytes, and then finds all occurrences of the find bytes
@@ -991,4 +1060,67 @@ def ReplaceAll(params, ctxt, scope, stream, coord):
     the same length as the find data. The return value is the number of
     replacements made.
     """
-    raise NotImplementedError()
+    if interp._generate:
+        return 0
+    if len(params) < 2:
+        raise errors.InvalidArguments(
+            coord, "at least 2 arguments", "{} args".format(len(params))
+        )
+
+    replace_data = utils.binary(_find_data(params[1]))
+
+    pad_with_zeros = False
+    if len(params) > 9:
+        pad_with_zeros = not not PYVAL(params[9])
+
+    # the FindAll params, without replacedata and padwithzeros
+    find_params = params[0:1] + params[2:9] + params[10:11]
+    matches = list(
+        _find_helper(find_params, ctxt, scope, stream, coord, interp)
+    )
+    if len(matches) == 0:
+        return 0
+
+    buf = interp.get_search().buffer(stream)
+
+    replacements = []
+    new_size = len(buf)
+    for start, end in matches:
+        replacement = replace_data
+        if pad_with_zeros and len(replacement) < end - start:
+            replacement += b"\x00" * (end - start - len(replacement))
+        replacements.append(replacement)
+        new_size += len(replacement) - (end - start)
+
+    # the input of the caller (e.g. a file opened with "rb", or a str) is
+    # never modified, the rest of the template reads a copy of it with the
+    # replacements. The copy shrinks (or grows) if the replacement data is
+    # shorter (or longer) than the matches. It is written one chunk at a
+    # time, into a temporary file if it is large.
+    if new_size > REPLACE_ALL_MEMORY_SIZE:
+        new_stream = tempfile.TemporaryFile()
+    else:
+        new_stream = six.BytesIO()
+
+    last_end = 0
+    for (start, end), replacement in zip(matches, replacements):
+        _write_range(new_stream, buf, last_end, start)
+        new_stream.write(replacement)
+        last_end = end
+    _write_range(new_stream, buf, last_end, len(buf))
+
+    stream.replace_stream(new_stream)
+    return len(matches)
+
+
+REPLACE_ALL_MEMORY_SIZE = 0x1000000
+"""The maximum size of the data with the replacements of ``ReplaceAll``
+that is kept in memory. Larger data is written to a temporary file."""
+
+
+def _write_range(dest, buf, start, end, chunk_size=checksum.CHUNK_SIZE):
+    """Write ``buf[start:end]`` to the stream ``dest``, at most
+    ``chunk_size`` bytes at a time
+    """
+    for offset in six.moves.range(start, end, chunk_size):
+        dest.write(buf[offset : min(end, offset + chunk_size)])
@@ -1,9 +1,27 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+"""
+This module contains the packer native functions. Packers compress and
+decompress data through streaming compressor/decompressor objects, one
+chunk at a time, instead of concatenating their input and operating on it
+all at once.
+
+When a packer is used as the ``packer``/``unpack`` of a packed field, the
+packed data is not decompressed up front: the ``packtype`` is parsed from a
+:any:`DecompressingStream`, which only decompresses as much data as is read
+from it.
+"""
+
+import bz2
 import zlib
 import six
 
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
 from pfp.native import native
 import pfp.fields
 from pfp.dbg import PfpDbg
@@ -11,13 +29,317 @@ import pfp.utils as utils
 import pfp.errors as errors
 
 
+CHUNK_SIZE = 0x10000
+"""The number of input bytes that are fed to a compressor/decompressor
+at a time"""
+
+
+class Codec(object):
+    """A compression format that can be streamed. Subclasses create new
+    compressor and decompressor objects with the interface of
+    ``zlib.compressobj`` and ``zlib.decompressobj`` (``bz2`` and ``lzma``
+    decompressors have no ``flush`` method).
+    """
+
+    def compressobj(self):
+        raise NotImplementedError()
+
+    def decompressobj(self):
+        raise NotImplementedError()
+
+    def decompress(self, decompressor, data, max_length):
+        """Decompress at most ``max_length`` bytes of output from ``data``.
+        Empty ``data`` continues decompressing previously given input.
+
+        :returns: A tuple of (output, the input that wasn't consumed yet)
+        """
+        return decompressor.decompress(data, max_length), utils.binary("")
+
+
+class ZlibCodec(Codec):
+    """zlib-based formats. ``wbits`` selects the format: ``15`` for
+    zlib, ``-15`` for raw deflate (e.g. PNG IDAT data after the zlib header,
+    ZIP entries), ``31`` for gzip.
+    """
+
+    def __init__(self, wbits=zlib.MAX_WBITS):
+        self.wbits = wbits
+
+    def compressobj(self):
+        return zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, self.wbits
+        )
+
+    def decompressobj(self):
+        return zlib.decompressobj(self.wbits)
+
+    def decompress(self, decompressor, data, max_length):
+        res = decompressor.decompress(data, max_length)
+        return res, decompressor.unconsumed_tail
+
+
+class Bz2Codec(Codec):
+    def compressobj(self):
+        return bz2.BZ2Compressor()
+
+    def decompressobj(self):
+        return bz2.BZ2Decompressor()
+
+    def decompress(self, decompressor, data, max_length):
+        # max_length (and needs_input) were added in Python 3.5
+        if hasattr(decompressor, "needs_input"):
+            return super(Bz2Codec, self).decompress(
+                decompressor, data, max_length
+            )
+
+        # older decompressors can't limit their output, so each chunk of
+        # input is decompressed at once
+        if len(data) == 0:
+            return utils.binary(""), utils.binary("")
+        try:
+            return decompressor.decompress(data), utils.binary("")
+        except EOFError:
+            # the end of the compressed data was already reached
+            return utils.binary(""), utils.binary("")
+
+
+class LzmaCodec(Codec):
+    """xz/lzma data. Decompression detects the container format."""
+
+    def compressobj(self):
+        self._check()
+        return lzma.LZMACompressor()
+
+    def decompressobj(self):
+        self._check()
+        return lzma.LZMADecompressor()
+
+    def _check(self):
+        if lzma is None:
+            raise errors.PfpError("the lzma module is not available")
+
+
+ZLIB = ZlibCodec(zlib.MAX_WBITS)
+DEFLATE = ZlibCodec(-zlib.MAX_WBITS)
+BZ2 = Bz2Codec()
+LZMA = LzmaCodec()
+
+
+def _chunks(params, chunk_size=CHUNK_SIZE):
+    """Yield the build output of all params (fields or ``bytes``) in chunks
+    of at most ``chunk_size`` bytes, without concatenating them
+    """
+    for param in params:
+        if isinstance(param, pfp.fields.Field):
+            data = param._pfp__build()
+        else:
+            data = utils.binary(param)
+
+        view = memoryview(data)
+        for offset in six.moves.range(0, len(view), chunk_size):
+            yield view[offset : offset + chunk_size]
+
+
+def _decompress_chunk(decompressor, chunk):
+    """Decompress a chunk of input, returning ``None`` if the end of the
+    compressed data has already been reached
+    """
+    if getattr(decompressor, "eof", False):
+        return None
+    return decompressor.decompress(chunk)
+
+
+def _flush(decompressor):
+    flush = getattr(decompressor, "flush", None)
+    if flush is None:
+        return utils.binary("")
+    return flush()
+
+
+def compress(codec, params):
+    """Compress the build output of all ``params`` with ``codec``
+
+    :returns: bytes
+    """
+    compressor = codec.compressobj()
+    res = [compressor.compress(chunk) for chunk in _chunks(params)]
+    res.append(compressor.flush())
+    return utils.binary("").join(res)
+
+
+def decompress(codec, params):
+    """Decompress the build output of all ``params`` with ``codec``
+
+    :returns: bytes
+    """
+    decompressor = codec.decompressobj()
+    res = []
+    for chunk in _chunks(params):
+        data = _decompress_chunk(decompressor, chunk)
+        if data is None:
+            break
+        res.append(data)
+    res.append(_flush(decompressor))
+    return utils.binary("").join(res)
+
+
+class DecompressingStream(object):
+    """A read-only, seekable stream of decompressed data. The compressed
+    data is only decompressed as far as the stream has been read from or
+    seeked to, at most ``chunk_size`` bytes of output at a time. Seeking
+    relative to the end of the stream (or calling :any:`getvalue`)
+    decompresses all of the remaining data.
+
+    Truncated compressed data is not an error: the stream ends with the
+    data that could be decompressed.
+    """
+
+    def __init__(self, codec, data, chunk_size=CHUNK_SIZE, max_size=None):
+        """
+        :param Codec codec: The compression format of ``data``
+        :param bytes data: The compressed data
+        :param int chunk_size: The number of bytes to decompress at a time
+        :param int max_size: If set, :any:`pfp.errors.UnpackLimitExceeded` is raised once more than ``max_size`` bytes have been decompressed
+        """
+        self._codec = codec
+        self._decompressor = codec.decompressobj()
+        self._input = memoryview(utils.binary(data))
+        self._input_pos = 0
+        self._pending = utils.binary("")
+        self._output = bytearray()
+        self._pos = 0
+        self._done = False
+        self._chunk_size = chunk_size
+        self._max_size = max_size
+        self.closed = False
+
+    def _fill(self, size=None):
+        """Decompress until at least ``size`` bytes of output are available,
+        or all of the data if ``size`` is ``None``
+        """
+        decompressor = self._decompressor
+        while not self._done and (size is None or len(self._output) < size):
+            if len(self._pending) == 0 and getattr(
+                decompressor, "needs_input", True
+            ):
+                if self._input_pos >= len(self._input):
+                    self._finish()
+                    break
+                self._pending = self._input[
+                    self._input_pos : self._input_pos + self._chunk_size
+                ]
+                self._input_pos += len(self._pending)
+
+            data, self._pending = self._codec.decompress(
+                decompressor, self._pending, self._chunk_size
+            )
+            self._output += data
+            self._check_size()
+
+            if getattr(decompressor, "eof", False):
+                self._finish()
+
+    def _check_size(self):
+        if self._max_size is not None and len(self._output) > self._max_size:
+            raise errors.UnpackLimitExceeded(
+                "unpacked data is larger than {} bytes".format(self._max_size)
+            )
+
+    def _finish(self):
+        self._output += _flush(self._decompressor)
+        self._check_size()
+        self._done = True
+        # the compressed data is no longer needed
+        self._input = None
+        self._pending = None
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            self._fill()
+            end = len(self._output)
+        else:
+            end = self._pos + size
+            self._fill(end)
+
+        res = bytes(self._output[self._pos : end])
+        self._pos += len(res)
+        return res
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self._pos
+        elif whence == 2:
+            self._fill()
+            pos += len(self._output)
+        self._pos = max(0, pos)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def getvalue(self):
+        """Return all of the decompressed data"""
+        self._fill()
+        return bytes(self._output)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def write(self, data):
+        raise IOError("DecompressingStream is read-only")
+
+    def close(self):
+        self.closed = True
+
+
+def streaming(codec):
+    """Mark a packer/unpack native function as decompressing ``codec`` data,
+    allowing packed fields to be parsed lazily from a
+    :any:`DecompressingStream` instead of calling the function (see
+    :any:`pfp.fields.Field._pfp__unpack_data`). Must be applied before
+    (below) the ``native`` decorator.
+    """
+
+    def streaming_decorator(func):
+        func.stream_codec = codec
+        return func
+
+    return streaming_decorator
+
+
+def _packer(codec, params, coord):
+    if len(params) <= 1:
+        raise errors.InvalidArguments(
+            coord, "{} args".format(len(params)), "at least two arguments"
+        )
+
+    if params[0]:
+        return compress(codec, params[1:])
+    else:
+        return decompress(codec, params[1:])
+
+
+def _check_params(params, coord):
+    if len(params) == 0:
+        raise errors.InvalidArguments(
+            coord, "{} args".format(len(params)), "at least one argument"
+        )
+
+
 @native(name="PackerGZip", ret=pfp.fields.Array)
+@streaming(ZLIB)
 def packer_gzip(params, ctxt, scope, stream, coord):
     """``PackerGZip`` - implements both unpacking and packing. Can be used
     as the ``packer`` for a field. When packing, concats the build output
     of all params and gzip-compresses the result. When unpacking, concats
     the build output of all params and gzip-decompresses the result.
-    
+
     Example:
 
         The code below specifies that the ``data`` field is gzipped
@@ -31,16 +353,7 @@ def packer_gzip(params, ctxt, scope, stream, coord):
     :data: The data to operate on
     :returns: An array
     """
-    if len(params) <= 1:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "at least two arguments"
-        )
-
-    # to gzip it (pack it)
-    if params[0]:
-        return pack_gzip(params[1:], ctxt, scope, stream, coord)
-    else:
-        return unpack_gzip(params[1:], ctxt, scope, stream, coord)
+    return _packer(ZLIB, params, coord)
 
 
 @native(name="PackGZip", ret=pfp.fields.Array)
@@ -52,22 +365,12 @@ def pack_gzip(params, ctxt, scope, stream, coord):
 
         char data[0x100]<pack=PackGZip, ...>;
     """
-    if len(params) == 0:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "at least one argument"
-        )
-
-    built = utils.binary("")
-    for param in params:
-        if isinstance(param, pfp.fields.Field):
-            built += param._pfp__build()
-        else:
-            built += param
-
-    return zlib.compress(built)
+    _check_params(params, coord)
+    return compress(ZLIB, params)
 
 
 @native(name="UnpackGZip", ret=pfp.fields.Array)
+@streaming(ZLIB)
 def unpack_gzip(params, ctxt, scope, stream, coord):
     """``UnpackGZip`` - Concats the build output of all params and gunzips the
     resulting data, returning a char array.
@@ -76,16 +379,117 @@ def unpack_gzip(params, ctxt, scope, stream, coord):
 
         char data[0x100]<pack=UnpackGZip, ...>;
     """
-    if len(params) == 0:
-        raise errors.InvalidArguments(
-            coord, "{} args".format(len(params)), "at least one argument"
-        )
+    _check_params(params, coord)
+    return decompress(ZLIB, params)
+
+
+@native(name="PackerZlib", ret=pfp.fields.Array)
+@streaming(ZLIB)
+def packer_zlib(params, ctxt, scope, stream, coord):
+    """``PackerZlib`` - the same as :any:`packer_gzip`, zlib-compresses
+    (or decompresses) the build output of all params.
+
+    Example: ::
+
+        char data[0x100]<packer=PackerZlib, packtype=PACK_TYPE>;
+    """
+    return _packer(ZLIB, params, coord)
+
+
+@native(name="PackZlib", ret=pfp.fields.Array)
+def pack_zlib(params, ctxt, scope, stream, coord):
+    """``PackZlib`` - zlib-compresses the build output of all params"""
+    _check_params(params, coord)
+    return compress(ZLIB, params)
+
+
+@native(name="UnpackZlib", ret=pfp.fields.Array)
+@streaming(ZLIB)
+def unpack_zlib(params, ctxt, scope, stream, coord):
+    """``UnpackZlib`` - zlib-decompresses the build output of all params"""
+    _check_params(params, coord)
+    return decompress(ZLIB, params)
+
+
+@native(name="PackerDeflate", ret=pfp.fields.Array)
+@streaming(DEFLATE)
+def packer_deflate(params, ctxt, scope, stream, coord):
+    """``PackerDeflate`` - compresses (or decompresses) raw deflate data,
+    without a zlib header or checksum, as used by ZIP entries.
+
+    Example: ::
+
+        uchar data[compressedSize]<packer=PackerDeflate, packtype=PACK_TYPE>;
+    """
+    return _packer(DEFLATE, params, coord)
+
+
+@native(name="PackDeflate", ret=pfp.fields.Array)
+def pack_deflate(params, ctxt, scope, stream, coord):
+    """``PackDeflate`` - raw-deflates the build output of all params"""
+    _check_params(params, coord)
+    return compress(DEFLATE, params)
+
+
+@native(name="UnpackDeflate", ret=pfp.fields.Array)
+@streaming(DEFLATE)
+def unpack_deflate(params, ctxt, scope, stream, coord):
+    """``UnpackDeflate`` - inflates the raw deflate build output of all params"""
+    _check_params(params, coord)
+    return decompress(DEFLATE, params)
+
+
+@native(name="PackerBz2", ret=pfp.fields.Array)
+@streaming(BZ2)
+def packer_bz2(params, ctxt, scope, stream, coord):
+    """``PackerBz2`` - bzip2-compresses (or decompresses) the build output
+    of all params.
+
+    Example: ::
+
+        uchar data[size]<packer=PackerBz2, packtype=PACK_TYPE>;
+    """
+    return _packer(BZ2, params, coord)
+
+
+@native(name="PackBz2", ret=pfp.fields.Array)
+def pack_bz2(params, ctxt, scope, stream, coord):
+    """``PackBz2`` - bzip2-compresses the build output of all params"""
+    _check_params(params, coord)
+    return compress(BZ2, params)
+
+
+@native(name="UnpackBz2", ret=pfp.fields.Array)
+@streaming(BZ2)
+def unpack_bz2(params, ctxt, scope, stream, coord):
+    """``UnpackBz2`` - bzip2-decompresses the build output of all params"""
+    _check_params(params, coord)
+    return decompress(BZ2, params)
+
+
+@native(name="PackerLzma", ret=pfp.fields.Array)
+@streaming(LZMA)
+def packer_lzma(params, ctxt, scope, stream, coord):
+    """``PackerLzma`` - xz-compresses (or decompresses xz/lzma data from)
+    the build output of all params.
+
+    Example: ::
+
+        uchar data[size]<packer=PackerLzma, packtype=PACK_TYPE>;
+    """
+    return _packer(LZMA, params, coord)
+
+
+@native(name="PackLzma", ret=pfp.fields.Array)
+def pack_lzma(params, ctxt, scope, stream, coord):
+    """``PackLzma`` - xz-compresses the build output of all params"""
+    _check_params(params, coord)
+    return compress(LZMA, params)
 
-    built = utils.binary("")
-    for param in params:
-        if isinstance(param, pfp.fields.Field):
-            built += param._pfp__build()
-        else:
-            built += param
 
-    return zlib.decompress(built)
+@native(name="UnpackLzma", ret=pfp.fields.Array)
+@streaming(LZMA)
+def unpack_lzma(params, ctxt, scope, stream, coord):
+    """``UnpackLzma`` - decompresses the xz/lzma build output of all params"""
+    _check_params(params, coord)
+    return decompress(LZMA, params)
@@ -1,11 +1,10 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
-import binascii
-import zlib
 import six
 
 from pfp.native import native
+import pfp.checksum as checksum
 import pfp.fields
 from pfp.dbg import PfpDbg
 import pfp.utils as utils
@@ -30,6 +29,7 @@ def watch_length(params, ctxt, scope, stream, coord):
 
     to_update = params[0]
 
+    # widths are cached on each field (see Field._pfp__width)
     total_size = 0
     for param in params[1:]:
         total_size += param._pfp__width()
@@ -55,9 +55,34 @@ def watch_crc(params, ctxt, scope, stream, coord):
         )
 
     to_update = params[0]
+    to_update._pfp__set_value(_combined(params[1:], "crc32"))
 
-    total_data = utils.binary("")
-    for param in params[1:]:
-        total_data += param._pfp__build()
 
-    to_update._pfp__set_value(binascii.crc32(total_data))
+@native(name="WatchAdler32", ret=pfp.fields.Void)
+def watch_adler(params, ctxt, scope, stream, coord):
+    """WatchAdler32 - Watch the total adler32 of the params.
+
+    Example:
+        The code below uses the ``WatchAdler32`` update function to update
+        the ``adler`` field to the adler32 of the ``data`` field ::
+
+            char data[16];
+            uint adler<watch=data, update=WatchAdler32>;
+    """
+    if len(params) <= 1:
+        raise errors.InvalidArguments(
+            coord, "{} args".format(len(params)), "at least two arguments"
+        )
+
+    to_update = params[0]
+    to_update._pfp__set_value(_combined(params[1:], "adler32"))
+
+
+def _combined(params, kind):
+    """Return the checksum ``kind`` of the concatenated data of the params.
+    The cached checksum of each param (see ``Field._pfp__summary``) is
+    combined instead of building and hashing all of the data again.
+    """
+    return checksum.combine_summaries(
+        kind, [param._pfp__summary(kind) for param in params]
+    )[1]
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+This module contains an opt-in profiler of templates. When a
+:any:`TemplateProfiler` is set on an interpreter (see
+:any:`pfp.interp.PfpInterp.set_profiler`), every AST node handled while
+parsing is timed and attributed to its template source line, its node type
+and the struct type it is handled in: ::
+
+    interp = pfp.create_interp(
+        template_file="bmp.bt", generate=False, cpp_output=os.devnull
+    )
+    profiler = pfp.profiler.TemplateProfiler()
+    interp.set_profiler(profiler)
+    with open("input.bmp", "rb") as f:
+        interp.parse(pfp.bitwrap.BitwrappedStream(f, generate=False))
+
+    print(profiler.report())
+    with open("parse.folded", "w") as f:
+        profiler.write_folded(f)
+
+The folded stacks can be rendered with ``flamegraph.pl`` or speedscope.
+Each stack frame is a template line (``file:line``) or a struct type
+(``struct NAME``), and the value of each stack is the time spent in it in
+microseconds.
+"""
+
+import collections
+import os
+import tempfile
+import timeit
+
+import pfp.fields as fields
+
+
+class Stats(object):
+    """The accumulated statistics of one line, node type or struct type"""
+
+    __slots__ = ("count", "seconds", "self_seconds", "bytes")
+
+    def __init__(self):
+        self.count = 0
+        """The number of handled nodes (the number of instances for struct
+        types)"""
+        self.seconds = 0.0
+        """The cumulative time, including nested nodes. Time spent in
+        nested nodes with the same key (e.g. the nodes of a line, or
+        recursive structs) is only counted once."""
+        self.self_seconds = 0.0
+        """The time spent in the nodes themselves, excluding nested nodes"""
+        self.bytes = 0
+        """The number of bytes the nodes themselves consumed from the
+        input stream, excluding nested nodes"""
+
+
+class _Frame(object):
+    __slots__ = (
+        "keys",
+        "label",
+        "path",
+        "ctxt",
+        "stream",
+        "start",
+        "pos",
+        "child_seconds",
+        "child_bytes",
+    )
+
+
+class TemplateProfiler(object):
+    """Accumulates the time and the consumed bytes of the AST nodes that an
+    interpreter handles. One profiler can be used for several parses.
+    """
+
+    def __init__(self, clock=timeit.default_timer):
+        """
+        :param function clock: Returns the current time in seconds
+        """
+        self.clock = clock
+
+        self.lines = collections.defaultdict(Stats)
+        """``(filename, line)`` -> :any:`Stats`"""
+        self.node_types = collections.defaultdict(Stats)
+        """AST node type name -> :any:`Stats`"""
+        self.structs = collections.defaultdict(Stats)
+        """struct/union type name -> :any:`Stats`. Nodes that are not
+        handled within a struct are attributed to ``Dom``."""
+        self.folded = collections.defaultdict(float)
+        """tuple of stack frames -> self seconds"""
+
+        self.sources = {}
+        """filename -> list of source lines, for the report"""
+
+        self._stack = []
+        # key -> number of frames on the stack with that key
+        self._active = collections.defaultdict(int)
+        self._tmpdir = tempfile.gettempdir()
+
+    def _filename(self, interp, coord_file):
+        if coord_file == interp._template_coord_file:
+            filename = os.path.basename(interp._orig_filename or "<template>")
+            if filename not in self.sources:
+                self.sources[filename] = interp._template_lines
+            return filename
+        if coord_file is None:
+            return "?"
+        # the predefines are preprocessed from temporary files
+        if os.path.dirname(coord_file) == self._tmpdir:
+            return "<predefines>"
+        return coord_file
+
+    def enter(self, interp, node, ctxt, stream):
+        """Start timing ``node``, called by the interpreter before the node
+        is handled
+        """
+        parent = self._stack[-1] if len(self._stack) > 0 else None
+
+        coord = node.coord
+        if coord is not None and coord.line > 0:
+            line_key = (self._filename(interp, coord.file), coord.line)
+        elif parent is not None:
+            # nodes without a source line belong to the line of their parent
+            line_key = parent.keys[0][1]
+        else:
+            # the root FileAST
+            line_key = (self._filename(interp, interp._template_coord_file), 0)
+        if ctxt is None:
+            struct_name = "Dom"
+        else:
+            struct_name = ctxt.__class__.__name__
+
+        frame = _Frame()
+        frame.keys = (
+            (self.lines, line_key),
+            (self.node_types, node.__class__.__name__),
+            (self.structs, struct_name),
+        )
+        frame.ctxt = ctxt
+
+        path = () if parent is None else parent.path
+        new_struct = (
+            parent is not None
+            and ctxt is not parent.ctxt
+            and isinstance(ctxt, fields.Struct)
+            and not isinstance(ctxt, fields.Dom)
+        )
+        if new_struct:
+            path = path + ("struct " + struct_name,)
+        if new_struct or parent is None:
+            self.structs[struct_name].count += 1
+        label = line_key[0]
+        if line_key[1] > 0:
+            label = "{}:{}".format(*line_key)
+        if parent is None or parent.label != label:
+            path = path + (label,)
+        frame.label = label
+        frame.path = path
+
+        self.lines[line_key].count += 1
+        self.node_types[frame.keys[1][1]].count += 1
+        for _, key in frame.keys:
+            self._active[key] += 1
+
+        # tell() has side effects when generating
+        frame.stream = stream
+        frame.pos = None
+        if stream is not None and not stream._generate:
+            frame.pos = stream.tell()
+        frame.child_seconds = 0.0
+        frame.child_bytes = 0
+
+        self._stack.append(frame)
+        frame.start = self.clock()
+
+    def exit(self):
+        """Stop timing the current node, called by the interpreter after the
+        node was handled (or raised)
+        """
+        end = self.clock()
+        frame = self._stack.pop()
+        seconds = end - frame.start
+        self_seconds = seconds - frame.child_seconds
+
+        consumed = 0
+        if frame.pos is not None:
+            consumed = frame.stream.tell() - frame.pos
+        self_bytes = consumed - frame.child_bytes
+
+        for stats_dict, key in frame.keys:
+            stats = stats_dict[key]
+            stats.self_seconds += self_seconds
+            stats.bytes += self_bytes
+            self._active[key] -= 1
+            if self._active[key] == 0:
+                stats.seconds += seconds
+        self.folded[frame.path] += self_seconds
+
+        if len(self._stack) > 0:
+            parent = self._stack[-1]
+            # exclude the time of the profiler itself
+            parent.child_seconds += self.clock() - frame.start
+            if frame.stream is parent.stream:
+                parent.child_bytes += consumed
+
+    def total_seconds(self):
+        """Return the total profiled time"""
+        return sum(self.folded.values())
+
+    def _source(self, line_key):
+        lines = self.sources.get(line_key[0])
+        if lines is None or not (0 < line_key[1] <= len(lines)):
+            return ""
+        return lines[line_key[1] - 1].strip()
+
+    def report(self, limit=20, sort="seconds"):
+        """Return a flat text report of the top ``limit`` lines, node types
+        and struct types
+
+        :param str sort: The :any:`Stats` attribute to sort by
+            (``"seconds"``, ``"self_seconds"``, ``"count"`` or ``"bytes"``)
+        """
+        total = self.total_seconds() or 1.0
+        header = "{:>10} {:>10} {:>10} {:>6} {:>10}  {}".format(
+            "count", "cum s", "self s", "self%", "bytes", "{}"
+        )
+
+        res = []
+        for title, stats_dict, describe in (
+            (
+                "line",
+                self.lines,
+                lambda key: "{}:{}  {}".format(key[0], key[1], self._source(key)),
+            ),
+            ("node type", self.node_types, str),
+            ("struct", self.structs, str),
+        ):
+            res.append(header.format(title))
+            items = sorted(
+                stats_dict.items(),
+                key=lambda item: getattr(item[1], sort),
+                reverse=True,
+            )
+            for key, stats in items[:limit]:
+                res.append(
+                    "{:>10} {:>10.4f} {:>10.4f} {:>5.1f}% {:>10}  {}".format(
+                        stats.count,
+                        stats.seconds,
+                        stats.self_seconds,
+                        100.0 * stats.self_seconds / total,
+                        stats.bytes,
+                        describe(key),
+                    )
+                )
+            res.append("")
+
+        return "\n".join(res)
+
+    def write_folded(self, stream):
+        """Write the folded stacks (one ``frame;frame;frame value`` line per
+        stack, with the value in microseconds) to the text ``stream``
+        """
+        for path, seconds in sorted(self.folded.items()):
+            micros = int(round(seconds * 1e6))
+            if micros > 0:
+                stream.write("{} {}\n".format(";".join(path), micros))
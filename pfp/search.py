@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+This module contains the search service used by the ``Find*`` functions
+(see :any:`pfp.native.compat_tools`). Each interpreter owns one
+:any:`SearchService` (see :any:`pfp.interp.PfpInterp.get_search`), which
+caches the searchable data of each stream and the compiled patterns, and
+holds the state of ``FindFirst``/``FindNext``.
+"""
+
+import collections
+import io
+import mmap
+import re
+
+import six
+
+import pfp.utils as utils
+
+
+class AhoCorasick(object):
+    """An Aho-Corasick automaton that finds all occurrences of a set of
+    literal needles in a single pass over the data.
+
+    Example: ::
+
+        ac = AhoCorasick([b"PK\\x01\\x02", b"PK\\x05\\x06"])
+        for offset, needle_idx in ac.finditer(data):
+            ...
+    """
+
+    def __init__(self, needles):
+        """
+        :param list needles: A list of non-empty ``bytes`` needles
+        """
+        self.needles = [utils.binary(x) for x in needles]
+
+        # state 0 is the root
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for idx, needle in enumerate(self.needles):
+            state = 0
+            for byte in bytearray(needle):
+                next_state = self._goto[state].get(byte)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][byte] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(idx)
+
+        # breadth-first computation of the failure links
+        queue = collections.deque(self._goto[0].values())
+        while len(queue) > 0:
+            state = queue.popleft()
+            for byte, next_state in six.iteritems(self._goto[state]):
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail != 0 and byte not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(byte, 0)
+                self._out[next_state] = (
+                    self._out[next_state] + self._out[self._fail[next_state]]
+                )
+
+    def finditer(self, data, start=0, end=None):
+        """Yield ``(offset, needle_idx)`` for every (possibly overlapping)
+        occurrence of the needles in ``data[start:end]``, ordered by the
+        end of the match.
+        """
+        if end is None:
+            end = len(data)
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        lengths = [len(x) for x in self.needles]
+
+        state = 0
+        pos = start
+        for byte in bytearray(data[start:end]):
+            while state != 0 and byte not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(byte, 0)
+            pos += 1
+            for idx in out[state]:
+                yield pos - lengths[idx], idx
+
+
+class SearchService(object):
+    """Searches the data of streams. The searchable data of each stream is
+    read once (or memory mapped when the stream is backed by a file), and
+    reused until the stream is written to or the service is closed.
+    Compiled patterns are kept in a small LRU cache.
+    """
+
+    PATTERN_CACHE_SIZE = 64
+    """The maximum number of compiled patterns to keep"""
+
+    AHO_CORASICK_MIN_NEEDLES = 8
+    """Below this number of needles, each needle is searched for separately
+    with the (C implemented) ``find`` method of the buffer"""
+
+    def __init__(self):
+        # id(stream) -> (stream, write_count, buffer)
+        self._buffers = {}
+        self._patterns = collections.OrderedDict()
+        self._automatons = collections.OrderedDict()
+
+        self.matches = None
+        """The iterator of the matches of the last ``FindFirst`` call"""
+
+    # --------------------
+    # caches
+    # --------------------
+
+    def buffer(self, stream):
+        """Return the searchable data of ``stream`` as a ``bytes`` or
+        ``mmap`` object. The position of the stream is not changed.
+        """
+        key = id(stream)
+        write_count = getattr(stream, "write_count", 0)
+
+        entry = self._buffers.get(key)
+        if entry is not None and entry[0] is stream and entry[1] == write_count:
+            return entry[2]
+
+        res = self._read_buffer(getattr(stream, "_stream", stream))
+        self._buffers[key] = (stream, write_count, res)
+        return res
+
+    def close(self):
+        """Drop the cached data of all streams (closing memory maps) and the
+        ``FindFirst``/``FindNext`` state. The compiled patterns are kept.
+        """
+        for stream, write_count, buf in six.itervalues(self._buffers):
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+        self._buffers = {}
+        self.matches = None
+
+    def _read_buffer(self, raw):
+        try:
+            fileno = raw.fileno()
+        except (AttributeError, ValueError, io.UnsupportedOperation):
+            fileno = None
+        if fileno is not None:
+            try:
+                return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            except (ValueError, EnvironmentError):
+                # empty files and non-regular files can't be mapped
+                pass
+
+        if hasattr(raw, "getvalue"):
+            return utils.binary(raw.getvalue())
+
+        pos = raw.tell()
+        raw.seek(0, 0)
+        res = utils.binary(raw.read())
+        raw.seek(pos, 0)
+        return res
+
+    def _cached(self, cache, key, create):
+        res = cache.get(key)
+        if res is None:
+            res = cache[key] = create()
+            if len(cache) > self.PATTERN_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            # most recently used items are at the end
+            del cache[key]
+            cache[key] = res
+        return res
+
+    def compile(self, regex, flags=0):
+        """Return the compiled ``regex`` (``bytes``), using the pattern cache
+        """
+        regex = utils.binary(regex)
+        return self._cached(
+            self._patterns, (regex, flags), lambda: re.compile(regex, flags)
+        )
+
+    # --------------------
+    # searching
+    # --------------------
+
+    def _bounds(self, buf, start, size):
+        end = len(buf) if size == 0 else min(len(buf), start + size)
+        return start, end
+
+    def finditer(self, stream, regex, flags=0, start=0, size=0):
+        """Yield the ``(start, end)`` offsets of the non-overlapping matches
+        of ``regex`` in ``size`` bytes of the stream, starting at ``start``.
+        If ``size`` is zero, the stream is searched until the end.
+        """
+        buf = self.buffer(stream)
+        start, end = self._bounds(buf, start, size)
+        for match in self.compile(regex, flags).finditer(buf, start, end):
+            yield match.start(), match.end()
+
+    def find_literal(self, stream, needle, start=0, size=0):
+        """Yield the ``(start, end)`` offsets of the non-overlapping
+        occurrences of the ``needle`` bytes. Equivalent to :any:`finditer`
+        with an escaped needle, but does not use the regex engine.
+        """
+        buf = self.buffer(stream)
+        start, end = self._bounds(buf, start, size)
+        needle = utils.binary(needle)
+        if len(needle) == 0:
+            return
+
+        pos = buf.find(needle, start, end)
+        while pos != -1:
+            yield pos, pos + len(needle)
+            pos = buf.find(needle, pos + len(needle), end)
+
+    def find_literals(self, stream, needles, start=0, size=0):
+        """Return a list of ``(offset, needle_idx)`` tuples of all (possibly
+        overlapping) occurrences of any of the literal ``needles``, sorted by
+        offset. Large batches of needles are searched for with a single pass
+        of an :any:`AhoCorasick` automaton.
+        """
+        buf = self.buffer(stream)
+        start, end = self._bounds(buf, start, size)
+        needles = tuple(utils.binary(x) for x in needles)
+
+        if len(needles) < self.AHO_CORASICK_MIN_NEEDLES:
+            res = []
+            for idx, needle in enumerate(needles):
+                if len(needle) == 0:
+                    continue
+                pos = buf.find(needle, start, end)
+                while pos != -1:
+                    res.append((pos, idx))
+                    pos = buf.find(needle, pos + 1, end)
+        else:
+            automaton = self._cached(
+                self._automatons,
+                needles,
+                lambda: AhoCorasick([x for x in needles if len(x) > 0]),
+            )
+            # indices are relative to the non-empty needles
+            idx_map = [idx for idx, x in enumerate(needles) if len(x) > 0]
+            res = [
+                (offset, idx_map[idx])
+                for offset, idx in automaton.finditer(buf, start, end)
+            ]
+
+        res.sort()
+        return res
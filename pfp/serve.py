@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+This module implements ``pfp serve``, a long-running parse server for
+clients that would otherwise start a new pfp process per file. Templates
+are loaded once with :any:`pfp.create_interp` and kept in a bounded LRU
+cache (see :any:`TemplateCache`), so a request only pays for parsing its
+data.
+
+Requests and responses are JSON objects, one per line, read from and
+written to stdin/stdout or the connections of a Unix socket. Every request
+has an ``op`` and may have an ``id``, which is copied into its response.
+With more than one job, requests are handled concurrently by a pool of
+worker processes and responses may be written out of order. ::
+
+    {"id": 1, "op": "parse", "template_file": "png.bt", "data_file": "in.png"}
+    {"id": 1, "ok": true, "error": null, "records": [{"path": "sig", ...}, ...]}
+
+The input data of a request is given as ``data_file`` (a path) or ``data``
+(base64). Template-based ops take ``template_file`` or ``template`` (the
+template contents). Ops:
+
+* ``ping`` - returns ``{"ok": true}``
+* ``parse`` - returns the fields of the DOM as ``records`` (see
+  :any:`pfp.export.json_record`), or as ``text`` (the output of
+  ``_pfp__show``) if ``format`` is ``"text"``. Takes ``keep_successful``
+  and ``leaves_only`` options.
+* ``build`` - sets the fields in ``set`` (a dict of field path to value)
+  and returns the rebuilt data (base64) as ``data``
+* ``mutate`` - returns ``num`` (default 10) mutations of the data (base64)
+  as ``mutations``, created with the ``strat`` strategy (default
+  ``"basic"``). ``at_once``, ``seed`` (default ``0``) and ``start`` (see
+  :any:`pfp.fuzz.mutate`) make the mutations reproducible.
+"""
+
+import base64
+import collections
+import json
+import multiprocessing
+import os
+import re
+import signal
+import sys
+import threading
+
+import six
+
+import pfp
+import pfp.bitwrap as bitwrap
+import pfp.export
+import pfp.fields as fields
+import pfp.fuzz
+import pfp.fuzz.rand as rand
+import pfp.utils as utils
+
+
+class ServeError(Exception):
+    """An invalid request"""
+
+
+class TemplateCache(object):
+    """A least-recently-used cache of interpreters with preloaded templates.
+    Template files are reloaded when their modification time changes.
+    """
+
+    def __init__(self, max_size=16):
+        """
+        :param int max_size: The maximum number of loaded templates to keep
+        """
+        self.max_size = max_size
+        self._interps = collections.OrderedDict()
+
+    def get(self, template_file=None, template=None):
+        """Return an interpreter with the template loaded
+
+        :param str template_file: The template path
+        :param str template: The template contents, if no path is given
+        """
+        if template_file is not None:
+            template_file = os.path.abspath(os.path.expanduser(template_file))
+            key = ("file", template_file, os.stat(template_file).st_mtime)
+        elif template is not None:
+            key = ("template", template)
+        else:
+            raise ServeError("No template specified")
+
+        interp = self._interps.pop(key, None)
+        if interp is None:
+            interp = pfp.create_interp(
+                template_file=template_file,
+                template=template,
+                generate=False,
+                cpp_output=os.devnull,
+            )
+            if len(self._interps) >= self.max_size:
+                self._interps.popitem(last=False)
+
+        # most recently used interpreters are at the end
+        self._interps[key] = interp
+        return interp
+
+    def __len__(self):
+        return len(self._interps)
+
+
+def _encode(data):
+    return utils.string(base64.b64encode(bytes(data)))
+
+
+def _decode(data):
+    return base64.b64decode(utils.binary(data))
+
+
+# matches one part of a field path, e.g. "name" or "[2]"
+_PATH_PART = re.compile(r"\.?([^.\[\]]+)|\[(\d+)\]")
+
+
+def resolve_path(dom, path):
+    """Return the field of ``dom`` at the dotted ``path``, in the format of
+    the paths of :any:`pfp.export.iter_records` (e.g. ``chunks[2].length``)
+    """
+    field = dom
+    pos = 0
+    while pos < len(path):
+        match = _PATH_PART.match(path, pos)
+        if match is None:
+            raise ServeError("Invalid field path {!r}".format(path))
+        name, idx = match.groups()
+
+        if name is not None:
+            if not isinstance(field, fields.Struct) or name not in field._pfp__children_map:
+                raise ServeError("No field {!r} in {!r}".format(name, path))
+            field = field._pfp__children_map[name]
+        else:
+            if not isinstance(field, fields.Array) or int(idx) >= len(field):
+                raise ServeError("No item [{}] in {!r}".format(idx, path))
+            field = field[int(idx)]
+        pos = match.end()
+    return field
+
+
+class RequestHandler(object):
+    """Handles single requests (see the module documentation) using its
+    own :any:`TemplateCache`. Each worker process has one handler.
+    """
+
+    def __init__(self, max_templates=16):
+        self.cache = TemplateCache(max_templates)
+
+    def handle(self, request):
+        """Handle the ``request`` dict and return the response dict. Errors
+        are returned as ``{"ok": false, "error": "..."}`` responses.
+        """
+        res = {"id": request.get("id")}
+        try:
+            handler = getattr(self, "_op_" + str(request.get("op")), None)
+            if handler is None:
+                raise ServeError("Unknown op {!r}".format(request.get("op")))
+            res["ok"] = True
+            res.update(handler(request))
+        except Exception as e:
+            res["ok"] = False
+            res["error"] = "{}: {}".format(e.__class__.__name__, e)
+        return res
+
+    def _parse(self, request, keep_successful=False):
+        interp = self.cache.get(
+            template_file=request.get("template_file"),
+            template=request.get("template"),
+        )
+
+        if "data_file" in request:
+            with open(os.path.expanduser(request["data_file"]), "rb") as f:
+                data = f.read()
+        elif "data" in request:
+            data = _decode(request["data"])
+        else:
+            raise ServeError("No input data specified")
+
+        return interp.parse(
+            bitwrap.BitwrappedStream(six.BytesIO(data), generate=False),
+            orig_filename=request.get("template_file", "string"),
+            keep_successful=keep_successful,
+            printf=False,
+        )
+
+    def _op_ping(self, request):
+        return {}
+
+    def _op_parse(self, request):
+        dom = self._parse(request, request.get("keep_successful", False))
+        res = {"error": None}
+        if dom._pfp__error is not None:
+            res["error"] = "{}: {}".format(
+                dom._pfp__error.__class__.__name__, dom._pfp__error
+            )
+
+        if request.get("format", "records") == "text":
+            res["text"] = dom._pfp__show()
+        else:
+            res["records"] = [
+                pfp.export.json_record(record)
+                for record in pfp.export.iter_records(
+                    dom, leaves_only=request.get("leaves_only", False)
+                )
+            ]
+        return res
+
+    def _op_build(self, request):
+        dom = self._parse(request)
+        for path, value in six.iteritems(request.get("set", {})):
+            field = resolve_path(dom, path)
+            if isinstance(value, six.string_types):
+                value = utils.binary(value)
+            field._pfp__set_value(value)
+        return {"data": _encode(dom._pfp__build())}
+
+    def _op_mutate(self, request):
+        dom = self._parse(request)
+        # always reseed, the mutations must not depend on the seeds of
+        # earlier requests
+        rand.seed(request.get("seed", 0))
+
+        mutations = []
+        for mutated in pfp.fuzz.mutate(
+            dom,
+            request.get("strat", "basic"),
+            num=request.get("num", 10),
+            at_once=request.get("at_once", 1),
+            start=request.get("start"),
+        ):
+            mutations.append(_encode(mutated._pfp__build()))
+        return {"mutations": mutations}
+
+
+# the handler of a worker process, see _init_worker
+_HANDLER = None
+
+
+def _init_worker(max_templates):
+    global _HANDLER
+    _HANDLER = RequestHandler(max_templates)
+
+
+def _handle(request):
+    return _HANDLER.handle(request)
+
+
+class Server(object):
+    """Dispatches requests to a :any:`RequestHandler` in this process, or
+    to a pool of worker processes
+    """
+
+    def __init__(self, jobs=1, max_templates=16):
+        """
+        :param int jobs: The number of worker processes. With ``1``, requests
+            are handled one at a time in this process.
+        :param int max_templates: The maximum number of loaded templates
+            per process
+        """
+        self._lock = threading.Lock()
+        self._handler = None
+        self._pool = None
+        if jobs <= 1:
+            self._handler = RequestHandler(max_templates)
+        else:
+            self._pool = multiprocessing.Pool(
+                jobs, initializer=_init_worker, initargs=(max_templates,)
+            )
+
+    def submit(self, line, callback):
+        """Handle a request line, calling ``callback`` with the response
+        dict when it is done. ``callback`` may be called from another thread.
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ServeError("Requests must be JSON objects")
+        except ValueError as e:
+            callback({"id": None, "ok": False, "error": "Invalid JSON: {}".format(e)})
+            return
+        except ServeError as e:
+            callback({"id": None, "ok": False, "error": str(e)})
+            return
+
+        if self._pool is None:
+            with self._lock:
+                res = self._handler.handle(request)
+            callback(res)
+        else:
+            self._pool.apply_async(_handle, (request,), callback=callback)
+
+    def close(self):
+        """Wait for all submitted requests to complete"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+
+class _ResponseWriter(object):
+    """Writes the responses of one client, one JSON object per line, and
+    keeps track of the requests that are still being handled
+    """
+
+    def __init__(self, outstream, binary=False):
+        self._outstream = outstream
+        self._binary = binary
+        self._pending = 0
+        self._cond = threading.Condition()
+
+    def submit(self, server, line):
+        """Submit a request line of this client to ``server``"""
+        with self._cond:
+            self._pending += 1
+        server.submit(line, self.write)
+
+    def write(self, response):
+        line = json.dumps(response, separators=(",", ":")) + "\n"
+        if self._binary:
+            line = line.encode("utf-8")
+        with self._cond:
+            try:
+                self._outstream.write(line)
+                self._outstream.flush()
+            except (IOError, OSError, ValueError):
+                # the client went away, its responses are dropped
+                pass
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def wait(self):
+        """Wait until all submitted requests have been responded to"""
+        with self._cond:
+            while self._pending > 0:
+                self._cond.wait()
+
+
+def serve_stream(server, instream, outstream):
+    """Handle the request lines of ``instream`` until it is closed, writing
+    the responses to ``outstream``
+    """
+    writer = _ResponseWriter(outstream)
+    for line in iter(instream.readline, ""):
+        if line.strip() == "":
+            continue
+        writer.submit(server, line)
+    server.close()
+
+
+def serve_socket(server, path):
+    """Accept connections on the Unix socket at ``path`` until interrupted.
+    Each connection is a stream of request lines, handled like
+    :any:`serve_stream`.
+    """
+
+    class _ConnectionHandler(six.moves.socketserver.StreamRequestHandler):
+        def handle(self):
+            writer = _ResponseWriter(self.wfile, binary=True)
+            for line in iter(self.rfile.readline, b""):
+                if line.strip() == b"":
+                    continue
+                writer.submit(server, utils.string(line))
+            # the connection is closed when this returns
+            writer.wait()
+
+    class _UnixServer(
+        six.moves.socketserver.ThreadingMixIn,
+        six.moves.socketserver.UnixStreamServer,
+    ):
+        daemon_threads = True
+
+    if os.path.exists(path):
+        os.unlink(path)
+    unix_server = _UnixServer(path, _ConnectionHandler)
+    try:
+        unix_server.serve_forever()
+    finally:
+        unix_server.server_close()
+        os.unlink(path)
+        server.close()
+
+
+def main(argv):
+    """Run ``pfp serve``
+
+    :param list argv: The arguments after ``serve``
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        "pfp serve",
+        description="Parse, build and mutate data with preloaded templates. "
+        "Requests are read as JSON lines from stdin (or a Unix socket), see "
+        "pfp.serve",
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Listen on this Unix socket instead of stdin/stdout",
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="The number of worker processes that handle requests",
+    )
+    parser.add_argument(
+        "--max-templates",
+        type=int,
+        default=16,
+        help="The maximum number of loaded templates per worker process",
+    )
+    args = parser.parse_args(argv)
+
+    server = Server(jobs=args.jobs, max_templates=args.max_templates)
+    if args.socket is not None:
+        # remove the socket when terminated
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            serve_socket(server, args.socket)
+        except KeyboardInterrupt:
+            pass
+    else:
+        serve_stream(server, sys.stdin, sys.stdout)
+    return 0
@@ -241,6 +241,31 @@ class TestArrays(utils.PfpTestCase):
         self.assertEqual(dom.chars[2], ord("C"))
         self.assertEqual(dom.chars[3], ord("D"))
 
+    def test_numeric_raw_array_writes(self):
+        dom = self._test_parse_build(
+            "\x01\x00\x02\x00\x03\x00",
+            """
+                LittleEndian();
+                ushort vals[3];
+            """,
+            generate=False,
+        )
+        self.assertEqual(dom.vals[1], 2)
+        self.assertIs(dom.vals[1], dom.vals[1])
+        self.assertEqual(dom.vals[-1], 3)
+
+        dom.vals[1] = 0x1234
+        dom.vals[2]._pfp__set_value(0x10000 + 5)
+        self.assertEqual(dom.vals[1], 0x1234)
+        self.assertEqual(dom.vals[2], 5)
+        self.assertEqual(
+            dom.vals.raw_data, pfp.utils.binary("\x01\x00\x34\x12\x05\x00")
+        )
+        self.assertEqual(len(dom.vals), 3)
+
+        with self.assertRaises(IndexError):
+            dom.vals[3]
+
     def test_implicit_single_item_array1(self):
         dom = self._test_parse_build(
             "\x01",
@@ -497,6 +497,28 @@ class TestBasic(utils.PfpTestCase):
             stdout="5",
         )
 
+    def test_unary_sizeof_struct_changed(self):
+        dom = self._test_parse_build(
+            "\x02ab\x01c",
+            """
+                typedef struct {
+                    uchar len;
+                    char data[len];
+                } item;
+
+                item items[2];
+                Printf("%d", sizeof(items));
+            """,
+            stdout="5",
+            generate=False,
+        )
+        # the cached widths must be invalidated up the parent chain
+        dom.items[0].data = pfp.utils.binary("abcd")
+        self.assertEqual(dom.items[0]._pfp__width(), 5)
+        self.assertEqual(dom.items._pfp__width(), 7)
+        self.assertEqual(dom._pfp__width(), 7)
+        self.assertEqual(dom._pfp__build(), pfp.utils.binary("\x02abcd\x01c"))
+
     def test_unary_sizeof_atomic_type(self):
         dom = self._test_parse_build(
             "",
@@ -641,6 +663,20 @@ class TestBasic(utils.PfpTestCase):
             """,
         )
 
+    def test_predefines_parsed_once(self):
+        parser = pfp.interp.create_parser()
+        # TFindResults is a typedef of the predefines
+        template = "TFindResults results; local int color = cRed;"
+
+        interp1 = pfp.interp.PfpInterp(parser=parser, generate=False)
+        ast1 = interp1._parse_string(template)
+        interp2 = pfp.interp.PfpInterp(parser=parser, generate=False)
+        ast2 = interp2._parse_string(template)
+
+        self.assertEqual(len(ast1.ext), len(ast2.ext))
+        self.assertIs(ast1.ext[0], ast2.ext[0])
+        self.assertEqual(ast2.ext[-2].name, "results")
+
 
 class TestByRef(utils.PfpTestCase):
     def setUp(self):
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pfp
+import pfp.batch
+import utils
+
+
+TEMPLATE = """
+    uchar count;
+    if (count > 2) {
+        // not defined, so parsing fails for this input
+        TooManyValues();
+    }
+    ushort values[count];
+"""
+
+
+class TestBatch(utils.PfpTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.tmpdir, "inputs")
+        os.makedirs(os.path.join(self.input_dir, "sub"))
+
+        inputs = {
+            "a": b"\x01\x02\x00",
+            "sub/b": b"\x02\x03\x00\x04\x00",
+            # too many values for the template
+            "sub/c": b"\x03\x05\x00",
+        }
+        for name, data in inputs.items():
+            with open(os.path.join(self.input_dir, name), "wb") as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_collect_inputs(self):
+        paths = pfp.batch.collect_inputs(self.input_dir)
+        names = [os.path.relpath(x, self.input_dir) for x in paths]
+        self.assertEqual(names, ["a", os.path.join("sub", "b"), os.path.join("sub", "c")])
+
+        filelist = os.path.join(self.tmpdir, "filelist")
+        with open(filelist, "w") as f:
+            f.write("# comment\n{}\n\n{}\n".format(paths[2], paths[0]))
+        self.assertEqual(
+            pfp.batch.collect_inputs("@" + filelist), [paths[2], paths[0]]
+        )
+
+    def test_run(self):
+        output_dir = os.path.join(self.tmpdir, "out")
+        runner = pfp.batch.BatchRunner(
+            template=TEMPLATE, output_format="ndjson", output_dir=output_dir
+        )
+        results = list(runner.run(pfp.batch.collect_inputs(self.input_dir)))
+        results = dict(
+            (os.path.relpath(x["path"], self.input_dir), x) for x in results
+        )
+
+        self.assertTrue(results["a"]["ok"])
+        self.assertTrue(results[os.path.join("sub", "b")]["ok"])
+        self.assertFalse(results[os.path.join("sub", "c")]["ok"])
+        self.assertIsNotNone(results[os.path.join("sub", "c")]["error"])
+
+        with open(os.path.join(output_dir, "sub", "b.ndjson"), "r") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(
+            [(x["path"], x["value"]) for x in records],
+            [("count", 2), ("values", "\x03\x00\x04\x00")],
+        )
+
+        summary = runner.summary()
+        self.assertEqual(summary["files"], 3)
+        self.assertEqual(summary["ok"], 2)
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(summary["bytes"], 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pfp
+import pfp.bench
+import utils
+
+
+class TestBench(utils.PfpTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.templates_dir = os.path.join(self.tmpdir, "templates")
+        self.testcases_dir = os.path.join(self.tmpdir, "testcases")
+        os.makedirs(self.templates_dir)
+        os.makedirs(os.path.join(self.testcases_dir, "fmt"))
+
+        for name in ["fmt.bt", "fmt-orig.bt", "other.bt"]:
+            with open(os.path.join(self.templates_dir, name), "w") as f:
+                f.write("uchar count; ushort values[count];")
+        for name, data in [("a", b"\x01\x02\x00"), ("b", b"\x02\x03\x00\x04\x00")]:
+            with open(os.path.join(self.testcases_dir, "fmt", name), "wb") as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_find_corpus(self):
+        corpus = pfp.bench.find_corpus(self.templates_dir, self.testcases_dir)
+        # other.bt has no seed files
+        self.assertEqual([x[0] for x in corpus], ["fmt-orig", "fmt"])
+        self.assertEqual(
+            [os.path.basename(x) for x in corpus[0][2]], ["a", "b"]
+        )
+
+        corpus = pfp.bench.find_corpus(
+            self.templates_dir, self.testcases_dir, "*-orig"
+        )
+        self.assertEqual([x[0] for x in corpus], ["fmt-orig"])
+
+    def test_bench_template(self):
+        name, template_path, inputs = pfp.bench.find_corpus(
+            self.templates_dir, self.testcases_dir
+        )[0]
+        res = pfp.bench.bench_template(
+            template_path, inputs, repeat=1, mutations=2
+        )
+        self.assertEqual(res["inputs"], 2)
+        self.assertEqual(res["bytes"], 8)
+        self.assertEqual(res["errors"], 0)
+        for metric, higher_is_better in pfp.bench.METRICS:
+            self.assertIn(metric, res)
+        self.assertGreater(res["parse_mb_per_second"], 0)
+        self.assertGreater(res["mutate_per_second"], 0)
+
+    def test_compare(self):
+        baseline = {"fmt": {"parse_mb_per_second": 10.0, "peak_memory_bytes": 100}}
+        current = {
+            "fmt": {"parse_mb_per_second": 7.0, "peak_memory_bytes": 110},
+            "new": {"parse_mb_per_second": 1.0},
+        }
+        rows, regressions = pfp.bench.compare(baseline, current, threshold=0.2)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(
+            [(x[0], x[1]) for x in regressions], [("fmt", "parse_mb_per_second")]
+        )
+
+        rows, regressions = pfp.bench.compare(baseline, current, threshold=0.05)
+        self.assertEqual(len(regressions), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
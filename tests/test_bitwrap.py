@@ -194,5 +194,25 @@ class TestBitwrap(unittest.TestCase):
         self.assertEqual(bitwrapped.tell_bits(), 3)
 
 
+    def test_peek(self):
+        stream = six.BytesIO(pfp.utils.binary("abcdefgh"))
+        bitwrapped = BitwrappedStream(stream, generate=False)
+        bitwrapped.read(2)
+
+        self.assertEqual(bitwrapped.peek(4, 2), b"ef")
+        self.assertEqual(bitwrapped.peek(0, 3), b"abc")
+        self.assertEqual(bitwrapped.peek(6, 4), b"gh")
+        self.assertEqual(bitwrapped.tell(), 2)
+
+        # lookahead reads don't consume any bytes
+        self.assertEqual(len(bitwrapped.unconsumed_ranges()), 0)
+        self.assertEqual(len(bitwrapped.range_set), 1)
+
+        # writes invalidate the read-ahead window
+        bitwrapped.write(b"XY")
+        self.assertEqual(bitwrapped.peek(2, 4), b"XYef")
+        self.assertEqual(bitwrapped.tell(), 4)
+
+
 if __name__ == "__main__":
     unittest.main()
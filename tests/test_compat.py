@@ -4,11 +4,13 @@
 import os
 import six
 import sys
+import tempfile
 import unittest
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import pfp
+import pfp.bitwrap
 import pfp.fields
 import pfp.interp
 import pfp.utils
@@ -155,6 +157,20 @@ class TestCompatIO(utils.PfpTestCase):
             stdout="ab9798",
         )
 
+    def test_read_bytes_pos(self):
+        dom = self._test_parse_build(
+            "ab\x00\x01cd",
+            """
+                local uchar data[2];
+                ReadBytes(data, 4, 2);
+                Printf(data);
+                Printf("%d,", ReadUShort(2));
+                Printf("%d", FTell());
+            """,
+            stdout="cd256,0",
+            generate=False,
+        )
+
     def test_seek1(self):
         dom = self._test_parse_build(
             "\x01\x02ABCD\x03\x04",
@@ -336,6 +352,34 @@ class TestCompatString(utils.PfpTestCase):
             stdout="abbaabcd",
         )
 
+    def test_memcpy_offsets(self):
+        dom = self._test_parse_build(
+            "abcd",
+            """
+            uchar bytes[4];
+            local uchar local_bytes[4] = "wxyz";
+            Memcpy(local_bytes, bytes, 2, 1, 2);
+
+            Printf(local_bytes);
+            """,
+            # the string literal includes its null terminator
+            stdout="wcdz\x00",
+            generate=False,
+        )
+
+    def test_memset(self):
+        dom = self._test_parse_build(
+            "abcd",
+            """
+            uchar bytes[4];
+            Memset(bytes, 'A', 3);
+
+            Printf(bytes);
+            """,
+            stdout="AAAd",
+            generate=False,
+        )
+
     def test_strchr1(self):
         dom = self._test_parse_build(
             "",
@@ -673,6 +717,94 @@ class TestCompatTools(utils.PfpTestCase):
             predefines=True,
         )
 
+    def test_find_all_literal_with_size(self):
+        dom = self._test_parse_build(
+            "abcd HELLO abcd HELLO abcd HELLO abcd",
+            """
+                local TFindResults results = FindAll(
+                    "HELLO", 1, 0, FINDMETHOD_NORMAL, 0.0, 1, 6, 27
+                );
+                Printf("count:%d", results.count);
+                local int i;
+                for(i = 0; i < results.count; i++) {
+                    Printf("start-size:%d-%d", results.start[i], results.size[i]);
+                }
+                Printf("first:%d", FindFirst("abcd"));
+            """,
+            stdout="count:2start-size:16-5start-size:27-5first:0",
+            predefines=True,
+            generate=False,
+        )
+
+    def test_search_data_dropped_after_parse(self):
+        interp = pfp.create_interp(
+            template='FindFirst("HELLO");', generate=False, cpp_output=os.devnull
+        )
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(pfp.utils.binary("abcd HELLO abcd"))
+            f.flush()
+            with open(f.name, "rb") as stream:
+                interp.parse(
+                    pfp.bitwrap.BitwrappedStream(stream, generate=False)
+                )
+
+        # the memory map of the input is not kept by the reused interpreter
+        search = interp.get_search()
+        self.assertEqual(search._buffers, {})
+        self.assertIsNone(search.matches)
+
+    def test_histogram(self):
+        dom = self._test_parse_build(
+            "abcd HELLO abcd",
+            """
+                local int64 counts[256];
+                Printf("total:%d,", Histogram(0, 0, counts));
+                Printf("%d,%d,%d", counts['a'], counts[' '], counts['L']);
+                Printf(",total:%d,", Histogram(5, 5, counts));
+                Printf("%d,%d", counts['a'], counts['L']);
+            """,
+            stdout="total:15,2,2,2,total:5,0,2",
+            predefines=True,
+            generate=False,
+        )
+
+    def test_replace_all(self):
+        dom = self._test_parse_build(
+            "abcd HELLO abcd HELLO abcd",
+            """
+                Printf("count:%d,", ReplaceAll("HELLO", "hi"));
+                Printf("size:%d,", FileSize());
+                Printf("first:%d", FindFirst("hi"));
+            """,
+            stdout="count:2,size:20,first:5",
+            predefines=True,
+            generate=False,
+        )
+
+    def test_replace_all_read_only_file(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(pfp.utils.binary("abcd HELLO abcd HELLO abcd"))
+            f.flush()
+            interp = pfp.create_interp(
+                template="""
+                    ReplaceAll("HELLO", "hi");
+                    uchar data[FileSize()];
+                """,
+                generate=False,
+                cpp_output=os.devnull,
+            )
+            with open(f.name, "rb") as stream:
+                dom = interp.parse(
+                    pfp.bitwrap.BitwrappedStream(stream, generate=False),
+                    predefines=True,
+                )
+            with open(f.name, "rb") as stream:
+                orig_data = stream.read()
+
+        # the file of the caller is not modified
+        self.assertEqual(orig_data, pfp.utils.binary("abcd HELLO abcd HELLO abcd"))
+        self.assertEqual(dom.data, pfp.utils.binary("abcd hi abcd hi abcd"))
+
     def test_find_first_next(self):
         dom = self._test_parse_build(
             "abcd HELLO defg HELLO hijk HELLO",
@@ -27,3 +27,73 @@ class TestCompat(utils.PfpTestCase):
             # Required for CHECKSUM_ADLER32 to be found
             predefines=True,
         )
+
+    def test_crc32(self):
+        dom = self._test_parse_build(
+            "123456789",
+            """
+                char data[9];
+                Printf("%X", Checksum(CHECKSUM_CRC32, 0, 9));
+            """,
+            stdout="CBF43926",
+            predefines=True,
+            generate=False,
+        )
+
+    def test_crc_custom_poly(self):
+        dom = self._test_parse_build(
+            "123456789",
+            """
+                char data[9];
+                Printf("%X,", Checksum(CHECKSUM_CRC16));
+                Printf("%X,", Checksum(CHECKSUM_CRCCCITT));
+                Printf("%X,", Checksum(CHECKSUM_CRC8));
+                Printf("%X", Checksum(CHECKSUM_CRC16, 0, 0, 0x1021, 0));
+            """,
+            stdout="BB3D,29B1,F4,2189",
+            predefines=True,
+            generate=False,
+        )
+
+    def test_sums(self):
+        dom = self._test_parse_build(
+            "\x01\x02\x03\x04\xff",
+            """
+                uchar data[5];
+                Printf("%d,", Checksum(CHECKSUM_BYTE));
+                Printf("%d,", Checksum(CHECKSUM_SUM8));
+                Printf("%X,", Checksum(CHECKSUM_SHORT_LE, 0, 4));
+                Printf("%X", Checksum(CHECKSUM_SHORT_BE, 0, 4));
+            """,
+            stdout="265,9,604,406",
+            predefines=True,
+            generate=False,
+        )
+
+    def test_checksum_alg_str(self):
+        dom = self._test_parse_build(
+            "abc",
+            """
+                char data[3];
+                char result[];
+                local int res = ChecksumAlgStr(CHECKSUM_MD5, result, 0, 3);
+                Printf("%d,%s", res, result);
+            """,
+            stdout="32,900150983CD24FB0D6963F7D28E17F72",
+            predefines=True,
+            generate=False,
+        )
+
+    def test_checksum_alg_array_bytes(self):
+        dom = self._test_parse_build(
+            "abcdX",
+            """
+                uchar data[5];
+                uchar result[4];
+                local int res = ChecksumAlgArrayBytes(CHECKSUM_CRC32, result, data, 4, "1-1");
+                Printf("%d,%02X%02X%02X%02X", res, result[0], result[1], result[2], result[3]);
+            """,
+            stdout="4,B25BE520",
+            predefines=True,
+            generate=False,
+        )
@@ -45,5 +45,35 @@ class TestCompatStrings(utils.PfpTestCase):
         )
 
 
+    def test_char_array_natives(self):
+        dom = self._test_parse_build(
+            "",
+            """
+                local char s[6];
+                Printf("%d,", Strlen(s));
+                Strcpy(s, "hello");
+                Printf("%d,%d,%d,", Strcmp(s, "hello"), Strchr(s, 'l'), Strlen(s));
+                Printf("%d,%d,", ToUpper('q'), Stricmp(s, "HELLO"));
+                Printf("%d,%d", Strstr("abcdef", "cd"), Strstr("abc", "x"));
+            """,
+            stdout="0,0,2,5,81,0,2,-1",
+            generate=False,
+        )
+
+    def test_string_parse_chunks(self):
+        dom = self._test_parse_build(
+            "abc\x00" + "x" * 0x1100 + "\x00d\x00",
+            """
+                string a;
+                string b;
+                string c;
+            """,
+            generate=False,
+        )
+        self.assertEqual(dom.a, b"abc")
+        self.assertEqual(len(dom.b), 0x1100)
+        self.assertEqual(dom.c, b"d")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import os
+import shutil
+import six
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pfp
+import pfp.__main__
+import pfp.export
+import utils
+
+
+TEMPLATE = """
+    typedef struct {
+        uchar a;
+        ushort b;
+    } EV;
+
+    EV ev[2];
+    string s;
+    uchar raw[2];
+"""
+
+DATA = "\x01\x02\x00\x03\x04\x00abc\x00\x07\x08"
+
+
+class TestExport(utils.PfpTestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _test_dom(self):
+        return self._test_parse_build(DATA, TEMPLATE, generate=False)
+
+    def test_records(self):
+        dom = self._test_dom()
+        records = list(pfp.export.iter_records(dom))
+        self.assertEqual(
+            [tuple(record) for record in records],
+            [
+                ("ev", 0, 6, "EV[]", None),
+                ("ev[0]", 0, 3, "EV", None),
+                ("ev[0].a", 0, 1, "UChar", 1),
+                ("ev[0].b", 1, 2, "UShort", 2),
+                ("ev[1]", 3, 3, "EV", None),
+                ("ev[1].a", 3, 1, "UChar", 3),
+                ("ev[1].b", 4, 2, "UShort", 4),
+                ("s", 6, 4, "String", pfp.utils.binary("abc")),
+                ("raw", 10, 2, "UChar[]", pfp.utils.binary("\x07\x08")),
+            ],
+        )
+
+    def test_ndjson_leaves(self):
+        dom = self._test_dom()
+        output = six.StringIO()
+        count = pfp.export.write_ndjson(dom, output, leaves_only=True)
+        lines = output.getvalue().splitlines()
+
+        self.assertEqual(count, 6)
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(
+            json.loads(lines[0]),
+            {
+                "path": "ev[0].a",
+                "offset": 0,
+                "width": 1,
+                "type": "UChar",
+                "value": 1,
+            },
+        )
+        self.assertEqual(json.loads(lines[-1])["value"], "\x07\x08")
+
+    def test_split_columns(self):
+        dom = self._test_dom()
+        columns = pfp.export.to_columns(
+            dom, leaves_only=True, split_values=True
+        )
+        self.assertEqual(
+            list(columns.keys()),
+            ["path", "offset", "width", "type"]
+            + list(pfp.export.SPLIT_VALUE_COLUMNS),
+        )
+        self.assertEqual(columns["offset"], [0, 1, 3, 4, 6, 10])
+        self.assertEqual(columns["int_value"], [1, 2, 3, 4, None, None])
+        self.assertEqual(columns["bytes_value"][4], pfp.utils.binary("abc"))
+
+    def test_cli_ndjson(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            template_path = os.path.join(tmpdir, "test.bt")
+            with open(template_path, "w") as f:
+                f.write("LittleEndian();" + TEMPLATE)
+            input_path = os.path.join(tmpdir, "input")
+            with open(input_path, "wb") as f:
+                f.write(pfp.utils.binary(DATA))
+
+            output = sys.stdout = six.StringIO()
+            try:
+                pfp.__main__.main(
+                    [
+                        "pfp",
+                        "-t",
+                        template_path,
+                        "-f",
+                        "ndjson",
+                        "--leaves-only",
+                        input_path,
+                    ]
+                )
+            finally:
+                sys.stdout = sys.__stdout__
+
+            records = [json.loads(x) for x in output.getvalue().splitlines()]
+            self.assertEqual(
+                [x["path"] for x in records],
+                ["ev[0].a", "ev[0].b", "ev[1].a", "ev[1].b", "s", "raw"],
+            )
+            self.assertEqual(records[3]["value"], 4)
+
+            # no C++ code is generated over the template (sys.argv[2])
+            with open(template_path, "r") as f:
+                self.assertEqual(f.read(), "LittleEndian();" + TEMPLATE)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -122,6 +122,30 @@ class TestFunctions(utils.PfpTestCase):
             stdout="555",
         )
 
+    def test_native_func_typed_params(self):
+        def func(params, ctxt, scope, stream, coord):
+            return "{}:{}:{}".format(*params)
+
+        interp = pfp.interp.PfpInterp()
+        interp.add_native(
+            name="typed_func",
+            func=func,
+            ret=pfp.fields.String,
+            params=[str, int, (int, 7)],
+        )
+
+        dom = self._test_parse_build(
+            "",
+            """
+            local uchar a = 3;
+            Printf(typed_func("hello", a));
+            Printf(",");
+            Printf(typed_func("hello", a, 4));
+            """,
+            stdout="hello:3:7,hello:3:4",
+            generate=False,
+        )
+
     def test_lazy_type_checking(self):
         dom = self._test_parse_build(
             "\x0a",
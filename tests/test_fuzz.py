@@ -19,6 +19,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 import pfp
 import pfp.fields
 import pfp.fuzz
+import pfp.fuzz.feedback
+import pfp.fuzz.seeds
+import pfp.fuzz.strats
 import pfp.interp
 import pfp.utils
 
@@ -79,6 +82,238 @@ class TestPfpFuzz(unittest.TestCase):
                 # yield_changed = True
                 self.assertFalse(isinstance(mutated, tuple))
 
+    def test_fuzz_counter_mode_reproducible(self):
+        template = """
+            typedef struct {
+                char a;
+                char b;
+                char c;
+                int d;
+            } ROOT;
+            ROOT root;
+        """
+        data = "abcdddd"
+        dom = pfp.parse(template=template, data=data, generate=False)
+        pfp.fuzz.rand.seed(1337)
+
+        full_run = [
+            mutated._pfp__build()
+            for mutated in pfp.fuzz.mutate(
+                dom, "basic", at_once=2, start=0, stop=20
+            )
+        ]
+        self.assertEqual(len(full_run), 20)
+
+        # replaying a single index should not depend on the mutations
+        # before it
+        for idx in [0, 7, 19]:
+            replayed = [
+                mutated._pfp__build()
+                for mutated in pfp.fuzz.mutate(
+                    dom, "basic", at_once=2, start=idx, stop=idx + 1
+                )
+            ]
+            self.assertEqual(replayed, [full_run[idx]])
+
+        # splitting the range across "workers" yields the same mutations
+        first_half = [
+            mutated._pfp__build()
+            for mutated in pfp.fuzz.mutate(dom, "basic", at_once=2, start=0, num=10)
+        ]
+        second_half = [
+            mutated._pfp__build()
+            for mutated in pfp.fuzz.mutate(dom, "basic", at_once=2, start=10, num=10)
+        ]
+        self.assertEqual(first_half + second_half, full_run)
+
+    def test_rand_index_seed(self):
+        self.assertEqual(
+            pfp.fuzz.rand.index_seed(1, 100), pfp.fuzz.rand.index_seed(1, 100)
+        )
+        self.assertNotEqual(
+            pfp.fuzz.rand.index_seed(1, 100), pfp.fuzz.rand.index_seed(2, 100)
+        )
+
+        pfp.fuzz.rand.seed_index(5, base=1)
+        first = [pfp.fuzz.rand.randint(0, 0xffff) for x in range(10)]
+        pfp.fuzz.rand.seed_index(6, base=1)
+        pfp.fuzz.rand.seed_index(5, base=1)
+        second = [pfp.fuzz.rand.randint(0, 0xffff) for x in range(10)]
+        self.assertEqual(first, second)
+
+    def test_fuzz_feedback_biases_fields(self):
+        template = """
+            typedef struct {
+                char a;
+                char b;
+                char c;
+                char d;
+            } ROOT;
+            ROOT root;
+        """
+        data = "abcd"
+        dom = pfp.parse(template=template, data=data, generate=False)
+        pfp.fuzz.rand.seed(1)
+
+        def feedback(mutated):
+            # only changes to b lead to "new behavior"
+            return set(["b={}".format(mutated.root.b._pfp__value)])
+
+        scheduler = pfp.fuzz.feedback.FeedbackScheduler()
+        counts = {}
+        for mutated, changed in pfp.fuzz.mutate(
+            dom, "basic", num=300, yield_changed=True,
+            feedback=feedback, scheduler=scheduler,
+        ):
+            for field in changed:
+                counts[field._pfp__name] = counts.get(field._pfp__name, 0) + 1
+
+        self.assertGreater(counts["b"], counts["a"] + counts["c"] + counts["d"])
+        self.assertGreater(scheduler.field_stats["root.b"][1], 0)
+
+    def test_feedback_rewards(self):
+        scheduler = pfp.fuzz.feedback.FeedbackScheduler()
+        # coverage bitmaps
+        self.assertEqual(scheduler.reward(b"\x00\x01\x05"), 2)
+        self.assertEqual(scheduler.reward(bytearray(b"\x03\x01\x00")), 1)
+        self.assertEqual(scheduler.reward(b"\x00\x00\x00"), 0)
+        # sets of edges
+        self.assertEqual(scheduler.reward(set([1, 2, 3])), 3)
+        self.assertEqual(scheduler.reward(set([3, 4])), 1)
+        # scores
+        self.assertEqual(scheduler.reward(10), 10)
+        self.assertEqual(scheduler.reward(None), 0)
+
+    def test_feedback_save_load(self):
+        import tempfile
+
+        scheduler = pfp.fuzz.feedback.FeedbackScheduler()
+        scheduler.field_stats["root.a"] = [10, 3]
+        scheduler.strat_stats["Int"] = [10, 3]
+        scheduler.reward(set([1, 2]))
+        scheduler.add_to_corpus(b"hello", 3, ["root.a"])
+
+        tmp_dir = tempfile.mkdtemp()
+        index_path = os.path.join(tmp_dir, "index.json")
+        scheduler.save(index_path)
+
+        loaded = pfp.fuzz.feedback.FeedbackScheduler.load(index_path)
+        self.assertEqual(loaded.field_stats, scheduler.field_stats)
+        self.assertEqual(loaded.strat_stats, scheduler.strat_stats)
+        self.assertEqual(loaded.corpus, scheduler.corpus)
+        self.assertEqual(loaded.reward(set([1, 2])), 0)
+
+    def test_leaf_index(self):
+        template = """
+            typedef struct {
+                uint length;
+                char type[4];
+            } CHUNK;
+
+            typedef struct {
+                CHUNK chunks[2];
+                uchar tail;
+            } ROOT;
+            ROOT root;
+        """
+        data = pfp.utils.binary(
+            "\x01\x00\x00\x00IHDR\x02\x00\x00\x00IDATZ"
+        )
+        dom = pfp.parse(template=template, data=six.BytesIO(data), generate=False)
+
+        leaves = dom._pfp__leaves()
+        self.assertIs(leaves, dom._pfp__leaves())
+        self.assertEqual(
+            [x._pfp__path() for x in pfp.fuzz.strats.StratGroup().which(dom)],
+            [x._pfp__path() for x in leaves],
+        )
+
+        index = dom._pfp__leaf_index()
+        lengths = index.query(path="CHUNK.length")
+        self.assertEqual([x for x in lengths], [1, 2])
+        self.assertEqual(index.query(path="CHUNK.*"), index.query(path="root.chunks*"))
+        self.assertEqual(len(index.query(cls=pfp.fields.UInt)), 2)
+        self.assertEqual(len(index.query(cls="UChar")), 1)
+
+        # adding a child invalidates the cached leaves of all parents
+        dom._pfp__add_child("extra", pfp.fields.Char())
+        self.assertIsNot(leaves, dom._pfp__leaves())
+        self.assertIsNot(index, dom._pfp__leaf_index())
+        self.assertEqual(len(dom._pfp__leaves()), len(leaves) + 1)
+
+    def test_undo_log(self):
+        template = """
+            typedef struct {
+                uint length<watch=data, update=WatchLength>;
+                uchar data[length];
+                char a;
+            } ROOT;
+            ROOT root;
+        """
+        data = pfp.utils.binary("\x04\x00\x00\x00abcdX")
+        dom = pfp.parse(template=template, data=six.BytesIO(data), generate=False)
+
+        undo = pfp.fields.UndoLog()
+        with undo.recording():
+            dom.root.a = 0x41
+            dom.root.a = 0x42
+            dom.root.data = b"abcdef"
+        # watchers are recorded too, each field only once
+        self.assertEqual(len(undo), 3)
+        self.assertEqual(dom._pfp__build(), b"\x06\x00\x00\x00abcdefB")
+
+        undo.rollback()
+        self.assertEqual(len(undo), 0)
+        self.assertEqual(dom._pfp__build(), data)
+
+        for mutated in pfp.fuzz.mutate(dom, "basic", num=20, at_once=2):
+            pass
+        self.assertEqual(dom._pfp__build(), data)
+
+    def test_seed_index(self):
+        import tempfile
+
+        template = """
+            typedef struct {
+                uint length<watch=data, update=WatchLength>;
+                uchar data[length];
+                char a;
+                short b;
+            } ROOT;
+            ROOT root;
+        """
+        data = pfp.utils.binary("\x04\x00\x00\x00abcdXYY")
+        index = pfp.fuzz.seeds.SeedIndex(tempfile.mkdtemp())
+
+        leaves, from_index = index.leaf_fields(template, data)
+        self.assertFalse(from_index)
+        self.assertIsNotNone(index.get_layout(template, data))
+
+        cached_leaves, from_index = index.leaf_fields(template, data)
+        self.assertTrue(from_index)
+        self.assertEqual(
+            [x._pfp__offset for x in leaves],
+            [x._pfp__offset for x in cached_leaves],
+        )
+        self.assertEqual(
+            [x._pfp__build() for x in leaves],
+            [x._pfp__build() for x in cached_leaves],
+        )
+
+        # watchers are recreated as well
+        cached_leaves[1]._pfp__set_value(b"abcdef")
+        self.assertEqual(cached_leaves[0], 6)
+
+        pfp.fuzz.rand.seed(1)
+        from_parse = list(
+            pfp.fuzz.changeset_mutate(
+                None, "basic", num=20, fields_to_modify=leaves, base_data=data
+            )
+        )
+        pfp.fuzz.rand.seed(1)
+        from_cache = list(index.changeset_mutate(template, data, "basic", num=20))
+        self.assertEqual(from_parse, from_cache)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pfp
+import pfp.fields
+import pfp.interp
+
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+
+class TestGenerate(unittest.TestCase):
+    def setUp(self):
+        self._start_endian = pfp.fields.NumberBase.endian
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        pfp.fields.NumberBase.endian = self._start_endian
+        shutil.rmtree(self.tmpdir)
+
+    def _generate(self, template_path):
+        """Generate the C++ code of the template, like ffcompile does, and
+        return it
+        """
+        cpp_path = os.path.join(self.tmpdir, "out.cpp")
+        interp = pfp.interp.PfpInterp(
+            parser=pfp.PARSER, generate=True, cpp_output=cpp_path
+        )
+        try:
+            pfp.parse(
+                data="", template_file=template_path, interp=interp, generate=True
+            )
+        except SystemExit as e:
+            # the interpreter exits once the code has been generated
+            if e.code not in (None, 0):
+                raise
+        with open(cpp_path) as f:
+            return f.read()
+
+    def test_generate_templates(self):
+        template_paths = sorted(glob.glob(os.path.join(TEMPLATES_DIR, "*.bt")))
+        self.assertGreater(len(template_paths), 0)
+
+        failed = []
+        for template_path in template_paths:
+            name = os.path.basename(template_path)
+            try:
+                cpp = self._generate(template_path)
+            except Exception as e:
+                failed.append("{}: {!r}".format(name, e))
+                continue
+            if "generate_file" not in cpp:
+                failed.append("{}: no generated code".format(name))
+
+        self.assertEqual(failed, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@
 
 import binascii
 import os
+import six
 import struct
 import sys
 import unittest
@@ -10,6 +11,7 @@ import unittest
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import pfp
+import pfp.bitwrap
 import pfp.errors
 from pfp.fields import *
 import pfp.utils
@@ -131,6 +133,34 @@ class TestMetadata(utils.PfpTestCase):
         self.assertEqual(dom.main_struct.b, 50)
         self.assertEqual(dom.main_struct.c, 55)
 
+    def test_metadata_watch_crc_incremental(self):
+        dom = self._test_parse_build(
+            "\x00\x00\x00\x00\x00\x00\x00\x00abcdef",
+            """
+                typedef struct {
+                    uchar a;
+                    uchar b[2];
+                } item;
+
+                uint crc<watch=items, update=WatchCrc32>;
+                uint length<watch=items, update=WatchLength>;
+                item items[2];
+            """,
+            generate=False,
+        )
+        dom.items[0].a = 0x61
+        data = dom.items._pfp__build()
+        self.assertEqual(dom.crc, binascii.crc32(data) & 0xFFFFFFFF)
+        self.assertEqual(dom.length, 6)
+
+        dom.items[1].b[0] = 0x41
+        data = dom.items._pfp__build()
+        self.assertEqual(data, pfp.utils.binary("abcdAf"))
+        self.assertEqual(dom.crc, binascii.crc32(data) & 0xFFFFFFFF)
+
+        # the summaries of unchanged items are still cached
+        self.assertIsNotNone(dom.items[0]._pfp__summary_cache)
+
     def test_metadata_complex(self):
         def crc32(params, ctxt, scope, stream, coord):
             data = pfp.utils.binary("").join(
@@ -212,6 +242,125 @@ class TestMetadata(utils.PfpTestCase):
             b"x\x9cc```e```\x02\x00\x00#\x00\x08",
         )
 
+    def test_metadata_packer_deflate(self):
+        dom = self._test_parse_build(
+            "yoyoyo\x00\x0ac```d```\x02\x00",
+            """
+                BigEndian();
+                typedef struct {
+                    int a;
+                    int b;
+                } PACKED_DATA;
+
+                typedef struct {
+                    string type;
+                    uchar length;
+                    char data[length] <packtype=PACKED_DATA, packer=PackerDeflate>;
+                } MAIN;
+                MAIN main_struct;
+            """,
+            generate=False,
+        )
+
+        self.assertEqual(dom.main_struct.data._.a, 1)
+        self.assertEqual(dom.main_struct.data._.b, 2)
+
+        dom.main_struct.data._.a = 5
+
+        self.assertEqual(
+            dom.main_struct.data._pfp__build(), b"c```e```\x02\x00",
+        )
+
+    def test_metadata_packer_lazy(self):
+        dom = self._test_parse_build(
+            "yoyoyo\x00\x10x\x9cc```d```\x02\x00\x00\x0f\x00\x04",
+            """
+                BigEndian();
+                typedef struct {
+                    int a;
+                    int b;
+                } PACKED_DATA;
+
+                typedef struct {
+                    string type;
+                    uchar length;
+                    char data[length] <packtype=PACKED_DATA, packer=PackerGZip>;
+                } MAIN;
+                MAIN main_struct;
+            """,
+            generate=False,
+        )
+
+        self.assertIsNone(dom.main_struct.data._pfp__unpacked)
+        self.assertEqual(dom.main_struct.data._.a, 1)
+        self.assertIsNotNone(dom.main_struct.data._pfp__unpacked)
+        self.assertEqual(dom.main_struct.data._.b, 2)
+
+    def test_metadata_packer_lazy_settings(self):
+        # the packed data is unpacked with the endianness in effect when the
+        # field was parsed, not when it is accessed
+        dom = self._test_parse_build(
+            "yoyoyo\x00\x10x\x9cc```d```\x02\x00\x00\x0f\x00\x04",
+            """
+                BigEndian();
+                typedef struct {
+                    int a;
+                    int b;
+                } PACKED_DATA;
+
+                typedef struct {
+                    string type;
+                    uchar length;
+                    char data[length] <packtype=PACKED_DATA, packer=PackerGZip>;
+                } MAIN;
+                MAIN main_struct;
+                LittleEndian();
+            """,
+            generate=False,
+        )
+
+        self.assertIsNone(dom.main_struct.data._pfp__unpacked)
+        self.assertEqual(dom.main_struct.data._.a, 1)
+        self.assertEqual(dom.main_struct.data._.b, 2)
+        self.assertEqual(pfp.fields.NumberBase.endian, pfp.fields.LITTLE_ENDIAN)
+
+    def test_metadata_packer_unpack_cache_per_parse(self):
+        interp = pfp.create_interp(
+            template="""
+                BigEndian();
+                typedef struct {
+                    int a;
+                    int b;
+                } PACKED_DATA;
+
+                typedef struct {
+                    uchar length;
+                    char data[length] <packtype=PACKED_DATA, packer=PackerGZip>;
+                } MAIN;
+                MAIN main_struct;
+            """,
+            generate=False,
+            cpp_output=os.devnull,
+        )
+        data = b"\x10x\x9cc```d```\x02\x00\x00\x0f\x00\x04"
+        dom1 = interp.parse(pfp.bitwrap.BitwrappedStream(
+            six.BytesIO(data), generate=False
+        ))
+        self.assertEqual(dom1.main_struct.data._.a, 1)
+        cache1 = interp.get_unpack_cache()
+        self.assertEqual(len(cache1), 1)
+
+        dom2 = interp.parse(pfp.bitwrap.BitwrappedStream(
+            six.BytesIO(data), generate=False
+        ))
+        self.assertEqual(len(interp.get_unpack_cache()), 0)
+        # the fields of the first DOM are not tracked by the new cache
+        dom1.main_struct.data._pfp__evict_unpacked()
+        self.assertEqual(dom1.main_struct.data._.b, 2)
+        self.assertEqual(len(interp.get_unpack_cache()), 0)
+        self.assertEqual(dom2.main_struct.data._.b, 2)
+        self.assertEqual(len(interp.get_unpack_cache()), 1)
+
     # def test_metadata_packer_interpd(self):
     # dom = self._test_parse_build(
     # "\x08AaAbAcAd",
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import six
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pfp
+import pfp.bitwrap
+import pfp.profiler
+import utils
+
+
+TEMPLATE = """typedef struct {
+    uchar type;
+    uchar length;
+    uchar data[length];
+} CHUNK;
+
+int last_type() {
+    return chunks[count - 1].type;
+}
+
+uchar count;
+CHUNK chunks[count];
+while (!FEof()) {
+    uchar trailer;
+    if (trailer == 0) {
+        break;
+    }
+}
+Printf("%d", last_type());
+"""
+
+DATA = b"\x02\x01\x02ab\x07\x01z\x05\x00\x09"
+
+
+class FakeClock(object):
+    """A clock that advances by one second every time it is read"""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+class TestProfiler(utils.PfpTestCase):
+    def setUp(self):
+        self.profiler = pfp.profiler.TemplateProfiler(clock=FakeClock())
+        self.interp = pfp.create_interp(
+            template=TEMPLATE, generate=False, cpp_output=os.devnull
+        )
+        self.interp.set_profiler(self.profiler)
+
+    def tearDown(self):
+        pass
+
+    def _parse(self):
+        return self.interp.parse(
+            pfp.bitwrap.BitwrappedStream(six.BytesIO(DATA), generate=False),
+            printf=False,
+        )
+
+    def test_line_stats(self):
+        self._parse()
+        # break and return raise exceptions, which must not leave
+        # frames behind
+        self.assertEqual(self.profiler._stack, [])
+
+        lines = self.profiler.lines
+        self.assertEqual(lines[("<template>", 2)].bytes, 2)
+        self.assertEqual(lines[("<template>", 4)].bytes, 3)
+        self.assertEqual(lines[("<template>", 11)].bytes, 1)
+        self.assertEqual(lines[("<template>", 14)].bytes, 2)
+        # the loop breaks before the last byte
+        self.assertEqual(
+            sum(x.bytes for x in lines.values()), len(DATA) - 1
+        )
+        self.assertIn(("<template>", 8), lines)
+        self.assertIn(("<template>", 16), lines)
+
+        # the clock is read when a node is entered, when it exits, and
+        # once more to exclude the time of the profiler from the parent of
+        # the node
+        nodes = sum(x.count for x in self.profiler.node_types.values())
+        self.assertEqual(self.profiler.total_seconds(), 2 * nodes - 1)
+        self.assertEqual(lines[("<template>", 0)].seconds, 3 * nodes - 2)
+        self.assertEqual(
+            sum(x.self_seconds for x in lines.values()), 2 * nodes - 1
+        )
+
+    def test_struct_and_node_stats(self):
+        self._parse()
+        structs = self.profiler.structs
+        self.assertEqual(structs["CHUNK"].count, 2)
+        self.assertEqual(structs["CHUNK"].bytes, 7)
+        self.assertEqual(structs["Dom"].count, 1)
+        self.assertEqual(structs["Dom"].bytes, 3)
+        self.assertEqual(self.profiler.node_types["StructDecls"].count, 2)
+        self.assertEqual(self.profiler.node_types["Break"].count, 1)
+        self.assertEqual(self.profiler.node_types["Return"].count, 1)
+
+        report = self.profiler.report(sort="bytes")
+        self.assertIn("uchar data[length];", report)
+        self.assertIn("CHUNK", report)
+
+    def test_folded(self):
+        self._parse()
+        self._parse()
+        out = six.StringIO()
+        self.profiler.write_folded(out)
+
+        stacks = {}
+        for line in out.getvalue().splitlines():
+            stack, value = line.rsplit(" ", 1)
+            stacks[stack] = int(value)
+        self.assertIn(
+            "<template>;<template>:12;struct CHUNK;<template>:4", stacks
+        )
+        for stack in stacks:
+            self.assertTrue(stack.startswith("<template>"))
+        self.assertEqual(self.profiler.structs["CHUNK"].count, 4)
+
+    def test_disabled(self):
+        self.interp.set_profiler(None)
+        self.assertIsNone(self.interp.get_profiler())
+        self._parse()
+        self.assertEqual(len(self.profiler.lines), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import base64
+import json
+import os
+import six
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pfp
+import pfp.serve
+import pfp.utils
+import utils
+
+
+TEMPLATE = """
+    typedef struct {
+        uchar type;
+        uchar length;
+        uchar data[length];
+    } CHUNK;
+
+    uchar count;
+    CHUNK chunks[count];
+"""
+
+DATA = b"\x02\x01\x02ab\x07\x01z"
+
+
+def _b64(data):
+    return pfp.utils.string(base64.b64encode(data))
+
+
+class TestServe(utils.PfpTestCase):
+    def setUp(self):
+        self.handler = pfp.serve.RequestHandler()
+
+    def tearDown(self):
+        pass
+
+    def _request(self, **request):
+        request.setdefault("template", TEMPLATE)
+        request.setdefault("data", _b64(DATA))
+        return self.handler.handle(request)
+
+    def test_parse(self):
+        res = self._request(id=3, op="parse", leaves_only=True)
+        self.assertEqual(res["id"], 3)
+        self.assertTrue(res["ok"])
+        self.assertEqual(
+            [(x["path"], x["value"]) for x in res["records"]],
+            [
+                ("count", 2),
+                ("chunks[0].type", 1),
+                ("chunks[0].length", 2),
+                ("chunks[0].data", "ab"),
+                ("chunks[1].type", 7),
+                ("chunks[1].length", 1),
+                ("chunks[1].data", "z"),
+            ],
+        )
+
+    def test_build(self):
+        res = self._request(
+            op="build", set={"chunks[1].type": 9, "chunks[0].data": "cd"}
+        )
+        self.assertTrue(res["ok"])
+        self.assertEqual(
+            base64.b64decode(res["data"]), b"\x02\x01\x02cd\x09\x01z"
+        )
+
+    def test_mutate(self):
+        res1 = self._request(op="mutate", num=3, seed=5, start=0)
+        res2 = self._request(op="mutate", num=3, seed=5, start=0)
+        self.assertTrue(res1["ok"])
+        self.assertEqual(len(res1["mutations"]), 3)
+        self.assertEqual(res1["mutations"], res2["mutations"])
+
+        # requests without a seed use the default seed, not the seed of
+        # the previous request
+        res3 = self._request(op="mutate", num=3, start=0)
+        self._request(op="mutate", num=3, seed=6, start=0)
+        res4 = self._request(op="mutate", num=3, start=0)
+        self.assertEqual(res3["mutations"], res4["mutations"])
+        self.assertNotEqual(res1["mutations"], res3["mutations"])
+
+    def test_errors(self):
+        res = self._request(op="nope")
+        self.assertFalse(res["ok"])
+        self.assertIn("nope", res["error"])
+
+        res = self._request(op="build", set={"chunks[5].type": 1})
+        self.assertFalse(res["ok"])
+
+    def test_template_cache(self):
+        cache = pfp.serve.TemplateCache(max_size=2)
+        interp1 = cache.get(template="uchar a;")
+        self.assertIs(cache.get(template="uchar a;"), interp1)
+
+        cache.get(template="uchar b;")
+        # the least recently used template is evicted
+        cache.get(template="uchar a;")
+        cache.get(template="uchar c;")
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get(template="uchar a;"), interp1)
+
+    def test_serve_stream(self):
+        requests = [
+            {"id": 1, "op": "ping"},
+            {"id": 2, "op": "parse", "template": "uchar a;", "data": _b64(b"\x05")},
+        ]
+        instream = six.StringIO(
+            "".join(json.dumps(x) + "\n" for x in requests) + "{bad\n"
+        )
+        outstream = six.StringIO()
+        pfp.serve.serve_stream(pfp.serve.Server(), instream, outstream)
+
+        responses = [json.loads(x) for x in outstream.getvalue().splitlines()]
+        self.assertEqual([x["id"] for x in responses], [1, 2, None])
+        self.assertEqual(responses[1]["records"][0]["value"], 5)
+        self.assertFalse(responses[2]["ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
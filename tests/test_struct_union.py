@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import pfp
 import pfp.fields
+import pfp.fuzz
 import pfp.interp
 import pfp.utils
 
@@ -345,6 +346,89 @@ class TestStructUnion(utils.PfpTestCase):
         self.assertEqual(dom.test.onion.chars.c, ord("c"))
         self.assertEqual(dom.test.onion.chars.d, ord("d"))
 
+    def test_union_update(self):
+        dom = self._test_parse_build(
+            "\x01\x02\x03\x04",
+            """
+                typedef struct {
+                    ushort lo;
+                    ushort hi;
+                } HALVES;
+
+                typedef union {
+                    uint whole;
+                    uchar parts[4];
+                    HALVES halves;
+                    uchar first;
+                } ONION;
+
+                ONION onion;
+            """,
+            generate=False,
+        )
+        onion = dom.onion
+
+        onion.whole = 0x11223344
+        self.assertEqual(onion.parts, "\x44\x33\x22\x11")
+        self.assertEqual(onion.halves.lo, 0x3344)
+        self.assertEqual(onion.halves.hi, 0x1122)
+        self.assertEqual(onion.first, 0x44)
+
+        # every write is seen by the other children, not only the first
+        onion.halves.hi = 0xAABB
+        self.assertEqual(onion.whole, 0xAABB3344)
+        self.assertEqual(onion.parts, "\x44\x33\xbb\xaa")
+
+        onion.parts[0] = 0x55
+        self.assertEqual(onion.whole, 0xAABB3355)
+        self.assertEqual(onion.halves.lo, 0x3355)
+        self.assertEqual(onion.first, 0x55)
+
+        self.assertEqual(
+            dom._pfp__build(), pfp.utils.binary("\x55\x33\xbb\xaa")
+        )
+
+    def test_union_mutate_rollback(self):
+        dom = self._test_parse_build(
+            "\x01\x02\x03\x04\x05\x06\x07\x08",
+            """
+                typedef struct {
+                    ushort lo;
+                    ushort hi;
+                } HALVES;
+
+                typedef struct {
+                    uchar a;
+                    uchar b;
+                } PAIR;
+
+                typedef union {
+                    uint whole;
+                    uchar parts[4];
+                    HALVES halves;
+                    PAIR pairs[2];
+                } ONION;
+
+                ONION onion;
+                uint after;
+            """,
+            generate=False,
+        )
+        orig_data = dom._pfp__build()
+        orig_show = dom._pfp__show()
+
+        for _ in pfp.fuzz.mutate(dom, "basic", num=50):
+            pass
+
+        # the members that were decoded again after a mutation of another
+        # member are rolled back too
+        self.assertEqual(dom.onion.whole, 0x04030201)
+        self.assertEqual(dom.onion.halves.lo, 0x0201)
+        self.assertEqual(dom.onion.halves.hi, 0x0403)
+        self.assertEqual(dom.onion.pairs[1].b, 0x04)
+        self.assertEqual(dom._pfp__show(), orig_show)
+        self.assertEqual(dom._pfp__build(), orig_data)
+
     def test_union_offset1(self):
         dom = self._test_parse_build(
             "abcd",
@@ -381,6 +465,86 @@ class TestStructUnion(utils.PfpTestCase):
         )
         self.assertEqual(dom.test.union_test._pfp__offset, 2)
 
+    def test_struct_union_build(self):
+        dom = self._test_parse_build(
+            "\x01\x00abc\x00\x02\x03\x04\x05",
+            """
+                typedef union {
+                    uint whole;
+                    uchar parts[4];
+                } ONION;
+
+                typedef struct {
+                    ushort a;
+                    string name;
+                    ONION onion;
+                } TEST;
+
+                TEST test;
+            """,
+            generate=False,
+        )
+        dom.test.a = 0x1234
+        dom.test.name = "hello"
+        self.assertEqual(
+            dom._pfp__build(save_offset=True),
+            pfp.utils.binary("\x34\x12hello\x00\x02\x03\x04\x05"),
+        )
+        self.assertEqual(dom.test.onion._pfp__offset, 8)
+        self.assertEqual(dom.test.onion.parts._pfp__offset, 8)
+
+    def test_incremental_build(self):
+        dom = self._test_parse_build(
+            "\x01\x00ab\x00cd\x00\x02\x03",
+            """
+                typedef struct {
+                    ushort a;
+                    string first;
+                    string second;
+                } TEST;
+
+                TEST test;
+                uchar b[2];
+            """,
+            generate=False,
+        )
+        dom._pfp__build()
+
+        # only the changed field is written again
+        dom.test.a = 0x1234
+        self.assertEqual(
+            dom._pfp__build(),
+            pfp.utils.binary("\x34\x12ab\x00cd\x00\x02\x03"),
+        )
+
+        # the second string moves, the size of the output stays the same
+        dom.test.first = "abc"
+        dom.test.second = "d"
+        self.assertEqual(
+            dom._pfp__build(),
+            pfp.utils.binary("\x34\x12abc\x00d\x00\x02\x03"),
+        )
+
+        # the size of the output changes
+        dom.test.second = "defg"
+        dom.b[1] = 4
+        self.assertEqual(
+            dom._pfp__build(),
+            pfp.utils.binary("\x34\x12abc\x00defg\x00\x02\x04"),
+        )
+
+        # the kept buffer matches a fresh build after every mutation, and
+        # after the mutations are rolled back
+        for mutated in pfp.fuzz.mutate(dom, "basic", num=50):
+            self.assertEqual(
+                mutated._pfp__build(), mutated._pfp__build_buffer()
+            )
+        self.assertEqual(
+            dom._pfp__build(),
+            pfp.utils.binary("\x34\x12abc\x00defg\x00\x02\x04"),
+        )
+        self.assertEqual(dom._pfp__build(), dom._pfp__build_buffer())
+
     def test_auto_increment_field_names(self):
         # when a field is declared multiple times with the same name, but
         # not consecutively, the fields should get a sequential number assigned
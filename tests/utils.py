@@ -61,6 +61,7 @@ class PfpTestCase(unittest.TestCase):
         predefines=False,
         _stream=True,
         printf=True,
+        generate=True,
     ):
         if stdout is not None:
             fake_stdout = sys.stdout = six.StringIO()
@@ -72,7 +73,12 @@ class PfpTestCase(unittest.TestCase):
         template = "LittleEndian();" + template
 
         dom = pfp.parse(
-            data, template, debug=debug, predefines=predefines, printf=printf
+            data,
+            template,
+            debug=debug,
+            predefines=predefines,
+            printf=printf,
+            generate=generate,
         )
 
         if stdout is not None: